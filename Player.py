@@ -2,16 +2,44 @@
 # ==== SECTION 1: IMPORTS & CONFIGURATION ====
 # ==============================================================================
 
+import argparse
+import asyncio
+import bisect
+import csv
+import functools
+import heapq
+import io
+import itertools
 import json
 import logging
+import gc
+import hashlib
+import math
+import mmap
+import multiprocessing
 import re
 import os
+import pickle
+import queue
+import secrets
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, OrderedDict, deque
 from pathlib import Path
 from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import (
+    Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+)
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.request import HTTPXRequest
 from telegram.ext import (
-    Application, MessageHandler, CommandHandler, CallbackQueryHandler,
-    filters, ContextTypes, ConversationHandler
+    Application, MessageHandler, CommandHandler, CallbackQueryHandler, InlineQueryHandler,
+    filters, ContextTypes, ConversationHandler, Updater, BaseRateLimiter
 )
 
 # --- CONFIGURATION ---
@@ -24,17 +52,106 @@ DB_FILE = "songs.json"
 USERS_FILE = "users.json"
 MISSING_FILE = "missing_songs.json"
 CONFIG_FILE = "config.json"
+SQLITE_FILE = "bot_data.db"
+LEDGER_FILE = "points_ledger.log"
+LEDGER_SNAPSHOT_FILE = "points_snapshot.json"
+BROADCAST_FILE = "broadcast_job.json"
+BROADCAST_RECIPIENTS_FILE = "broadcast_recipients.json"
+STATS_FILE = "stats.json"
+CATALOG_SNAPSHOT_FILE = "catalog.snapshot"
+PAYMENTS_FILE = "payments.json"
+
+# --- STORAGE SETTINGS ---
+STORAGE_BACKEND = "sqlite"  # "sqlite" (row-level updates) ya "json" (purani poori-file JSON)
+FLUSH_INTERVAL_SECONDS = 5  # Dirty data itne seconds mein disk par jaata hai
+FLUSH_BATCH_SIZE = 500      # Itne changes jama hote hi interval ka wait kiye bina flush
+LEDGER_COMPACT_EVERY = 10000  # Itni ledger entries ke baad naya balance snapshot
+STATS_HOURS = 48            # Hourly stats buckets kitne ghante tak rehte hain
+STATS_DAYS = 90             # Daily stats buckets kitne din tak rehte hain
+CATALOG_SNAPSHOT_CHUNK = 20000  # Snapshot ke dict/list itne items ke pickle frames mein bante hain
 
 # --- BOT SETTINGS ---
 FREE_POINTS_ON_START = 10
 SONG_PRICE_POINTS = 1
 DAILY_POINTS_GIFT = 1   # Roz milne wale free points
+MATCH_WORD_RATIO = 0.6  # Query ke kitne words song mein hone chahiye
+PHONETIC_MATCH_WEIGHT = 0.9         # Same phonetic key wala word ("galla" ~ "gallan") kitna gina jaaye
+PHONETIC_EXPANSIONS = 5             # Ek query word ke zyada se zyada itne sound-alike words
+PREFERRED_FORMATS = ('mp3', 'm4a', 'aac', 'ogg', 'flac', 'wav')    # Duplicate uploads mein search isi order se copy dikhata hai
+FORMAT_SIZE_FACTOR = {'flac': 4.0, 'wav': 10.0}     # Ek minute audio mp3 ke muqable kitna bada hota hai
+LONG_UPLOAD_MB = 25                 # mp3 ke hisaab se isse badi file (jukebox, mix) normal copy ke group mein nahi jaati
+VERSION_WORDS = frozenset({         # Filename mein ho to alag version hai (brackets parse_song_info hata deta hai)
+    'remix', 'lofi', 'live', 'unplugged', 'reprise', 'acoustic', 'slowed', 'reverb', 'instrumental', 'karaoke',
+    'cover', 'mashup', 'extended', 'jukebox', 'female', 'male', 'sad', 'version', 'edit', 'mix', 'dj', '8d',
+})
+SEARCH_RESULT_LIMIT = 50            # Top-k results jo /search pages mein dikhte hain
+SEARCH_PAGE_SIZE = 5                # Ek page par kitne songs
+SEARCH_HANDLE_TTL_SECONDS = 1800    # Search result pages kitni der tak next/prev ho sakte hain
+SEARCH_CACHE_SIZE = 5000            # Kitni alag queries ke results cache mein rahenge
+SEARCH_CACHE_TTL_SECONDS = 600      # Cached result kitni der tak valid hai
+MISSING_TOP_N = 500                 # /missing mein kitne top requested gaane
+MISSING_PAGE_SIZE = 25              # /missing ke ek page par kitne (4096 chars se kam)
+MISSING_CLUSTER_CANDIDATES = 200    # Nayi request ko zyada se zyada itne clusters se milate hain
+INLINE_RESULTS_PER_PAGE = 20        # Inline query ke ek answer mein kitne suggestions (max 50)
+INLINE_CACHE_SECONDS = 30           # Telegram apni taraf inline answers itni der cache karta hai
 PAYMENT_OPTIONS = {
     2: 10,
     5: 20,
     10: 35,
     20: 60
 }
+POINTS_FOR_AMOUNT = {amount: points for points, amount in PAYMENT_OPTIONS.items()}   # /submit ke amount se plan
+PAYMENT_PAGE_SIZE = 8               # /payments ke ek page par kitni submissions (har ek ke approve/reject buttons)
+
+# --- BROADCAST SETTINGS ---
+BROADCAST_CONCURRENCY = 20        # Ek saath kitne sends chal sakte hain
+BROADCAST_RATE_PER_SECOND = 25    # Telegram ka global limit ~30 messages/second hai
+BROADCAST_PROGRESS_SECONDS = 10   # Itne seconds mein checkpoint + admin ko progress update
+
+# --- OUTBOUND SEND SETTINGS ---
+GLOBAL_SEND_RATE = 30       # Saare chats mila kar messages/second (Telegram ~30); 0 = koi global limit nahi
+CHAT_SEND_RATE = 1.0        # Ek private chat mein messages/second (Telegram ~1)
+GROUP_SEND_RATE = 20 / 60   # Group/channel mein messages/second (Telegram ~20/minute)
+CHAT_SEND_BURST = 1         # Itne messages ek chat mein bina ruke ja sakte hain (edits is limit se bahar hain)
+SEND_LANE_RATES = {'bulk': BROADCAST_RATE_PER_SECOND}   # Lane ki apni upper limit (messages/second)
+SEND_MAX_RETRIES = 3        # RetryAfter ke baad wahi request itni baar dobara bheji jaati hai
+
+# --- INBOUND THROTTLE SETTINGS ---
+# kind -> (ek user ke updates/second, ek user ka burst, saare users mila kar updates/second; 0 = koi global limit nahi)
+THROTTLE_LIMITS = {
+    'search': (0.5, 5, 100),                    # /search: index lookup aur ranking
+    'inline': (2, 10, 200),                     # Inline mode mein har keystroke ek query hai
+    'download': (0.5, 5, GLOBAL_SEND_RATE),     # Har download ek copy_message; outbound limit se zyada lena bekaar
+    'submit': (1 / 30, 3, 0),
+    'default': (2, 20, 0),                      # Baaki commands aur buttons
+}
+THROTTLE_NOTICE_SECONDS = 10    # Throttled user ko "slow down" itne seconds mein ek hi baar
+
+# --- BULK IMPORT SETTINGS ---
+IMPORT_CHUNK_SIZE = 5000    # Ek worker process ko ek baar mein kitni entries
+IMPORT_WORKERS = os.cpu_count() or 1
+
+# --- CONCURRENCY SETTINGS ---
+CONCURRENT_UPDATES = 64     # Kitne updates ek saath process ho sakte hain (worker limit)
+USER_LOCK_SHARDS = 1024     # Per-user locks itne shards mein bante hain
+
+# --- SERVING SETTINGS ---
+RUN_MODE = "polling"                    # "polling" ya "webhook"
+BOT_API_URL = "https://api.telegram.org"  # Offline testing ke liye fake_telegram.py ka URL
+WEBHOOK_URL = ""                        # Public HTTPS base URL, e.g. "https://bot.example.com"
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "telegram"               # Telegram updates WEBHOOK_URL/WEBHOOK_PATH par POST karega
+WEBHOOK_SECRET = ""                     # X-Telegram-Bot-Api-Secret-Token check (khali = band)
+WEBHOOK_MAX_CONNECTIONS = 100           # Telegram ek saath kitne webhook requests bhej sakta hai
+SHARD_PROCESSES = 1                     # >1: front process updates ko itne worker processes mein baant-ta hai
+SHARD_CALL_TIMEOUT = 30                 # Doosre shard ki call ka jawab itne seconds mein na aaye to error
+
+# --- METRICS SETTINGS ---
+METRICS_HOST = "127.0.0.1"  # Prometheus /metrics sirf local machine par
+METRICS_PORT = 9108         # None karne par HTTP endpoint band
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
 
 # --- CONVERSATION HANDLER STATES ---
 WAITING_QR_PHOTO = 1
@@ -52,6 +169,157 @@ logger = logging.getLogger(__name__)
 # ==== SECTION 2: HELPER & DATABASE FUNCTIONS ====
 # ==============================================================================
 
+class Histogram:
+    """Prometheus-style fixed buckets wala histogram; p50/p99 buckets se interpolate hote hain."""
+
+    def __init__(self, buckets):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)     # Aakhri slot +Inf ke liye
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count: return 0.0
+        target, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= target and n:
+                if i == len(self.bounds): return self.bounds[-1]
+                low = self.bounds[i - 1] if i else 0.0
+                return low + (self.bounds[i] - low) * (target - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+class Metrics:
+    """Process ke histograms, counters aur gauges; labels `name{key="value"}` jaisa series key banate hain.
+
+    Storage threads (write_file_atomic) se bhi update hota hai, isliye ek chhota lock hai.
+    """
+
+    def __init__(self):
+        self.histograms = {}    # (name, labels) -> Histogram
+        self.counters = {}      # (name, labels) -> number
+        self.gauges = {}        # (name, labels) -> current value
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None: histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self.gauges[key] = value
+
+    def series(self, name):
+        """Ek histogram ke saare label sets: [(labels dict, Histogram)]."""
+        with self._lock: return [(dict(labels), h) for (n, labels), h in self.histograms.items() if n == name]
+
+    def counter_series(self, name):
+        """Ek counter ke saare label sets: [(labels dict, value)]."""
+        with self._lock: return [(dict(labels), value) for (n, labels), value in self.counters.items() if n == name]
+
+    def gauge_series(self, name):
+        """Ek gauge ke saare label sets: [(labels dict, value)]."""
+        with self._lock: return [(dict(labels), value) for (n, labels), value in self.gauges.items() if n == name]
+
+    @staticmethod
+    def _labels(labels):
+        if not labels: return ""
+        pairs = []
+        for key, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            pairs.append(f'{key}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def prometheus_text(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed: lines.append(f"# TYPE {name} histogram"); typed.add(name)
+                cumulative = 0
+                for bound, n in zip(list(h.bounds) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{self._labels(labels)} {h.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed: lines.append(f"# TYPE {name} counter"); typed.add(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                if name not in typed: lines.append(f"# TYPE {name} gauge"); typed.add(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# --- PROCESS SHARDS ---
+# Multi-process mode (`--processes N`) mein har worker process users ka ek shard own karta hai:
+# unke records, points ledger, locks aur search pages. Admins aur channel ingest hamesha shard 0
+# par hain, isliye global cheezein (missing requests, config, broadcasts) bhi wahin rehti hain.
+# Doosre shard ke user ya global data ko chhoone wala kaam `call_shard` se owner shard par chalta hai.
+SHARD_INDEX = 0         # Yeh process kaunsa shard hai
+SHARD_COUNT = 1         # Kul worker processes (1 = purana single-process mode)
+SHARD_LINK = None       # Worker mein front process se pipe (ShardLink)
+SHARD_CALLS = {}        # naam -> function jo doosre shards `call_shard` se chala sakte hain
+SHARD_TASKS = set()     # Chalti hui shard calls (task ka reference rakhna zaroori hai)
+
+def user_shard(user_id):
+    """User kis shard ka hai: admins shard 0 par, baaki user_id % SHARD_COUNT."""
+    user_id = int(user_id)
+    return 0 if user_id in ADMIN_IDS else user_id % SHARD_COUNT
+
+def owns_user(user_id):
+    return SHARD_COUNT == 1 or user_shard(user_id) == SHARD_INDEX
+
+def shard_file(filename):
+    """Per-process file ka naam: shard 0 purana naam rakhta hai, baaki "name.shardN.ext"."""
+    if not SHARD_INDEX: return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.shard{SHARD_INDEX}{ext}"
+
+def shard_call(func):
+    """Function ko `call_shard` ke liye (naam se) register karta hai."""
+    SHARD_CALLS[func.__name__] = func
+    return func
+
+async def run_shard_call(name, args):
+    result = SHARD_CALLS[name](*args)
+    return await result if asyncio.iscoroutine(result) else result
+
+async def call_shard(shard, name, *args):
+    """`SHARD_CALLS[name](*args)` us shard par chala kar result deta hai (apna shard ho to yahin)."""
+    if shard == SHARD_INDEX or SHARD_LINK is None: return await run_shard_call(name, args)
+    return await SHARD_LINK.call(shard, name, args)
+
+def notify_shard(shard, name, *args):
+    """`call_shard` jaisa, lekin result ka intezaar nahi (fire-and-forget)."""
+    if shard == SHARD_INDEX or SHARD_LINK is None:
+        task = asyncio.get_running_loop().create_task(run_shard_call(name, args))
+        SHARD_TASKS.add(task)
+        task.add_done_callback(SHARD_TASKS.discard)
+    else:
+        SHARD_LINK.send(('call', None, SHARD_INDEX, shard, name, args))
+
+def notify_other_shards(name, *args):
+    for shard in range(SHARD_COUNT):
+        if shard != SHARD_INDEX: notify_shard(shard, name, *args)
+
+
 def load_db(filename):
     """JSON database file ko load karta hai."""
     try:
@@ -63,23 +331,1136 @@ def load_db(filename):
         logger.error(f"JSON file {filename} mein error hai.")
         return {}
 
+def write_file_atomic(filename, text):
+    """Text (ya bytes) ko temp file mein likh kar fsync + rename karta hai, taaki crash mein adhi file na bache."""
+    started = time.perf_counter()
+    tmp_name = f"{filename}.tmp"
+    with (open(tmp_name, "wb") if isinstance(text, bytes) else open(tmp_name, "w", encoding='utf-8')) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    os.replace(tmp_name, filename)
+    file_label = os.path.basename(filename)
+    METRICS.observe("disk_write_seconds", time.perf_counter() - started, file=file_label)
+    METRICS.inc("disk_write_bytes_total", written, file=file_label)
+
 def save_db(data, filename):
     """Data ko JSON database file mein save karta hai."""
-    with open(filename, "w", encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    write_file_atomic(filename, json.dumps(data, indent=4, ensure_ascii=False))
+
+
+# --- COMPACT RECORDS ---
+# Lakhon songs/users par har record ka apna dict (hash table + har record mein repeat hoti keys)
+# RSS ka sabse bada hissa tha. Records ab __slots__ objects hain jo dict jaisa interface
+# (`r['key']`, `.get()`, `in`, `.update()`, `.items()`) dete hain, isliye handlers nahi badle.
+
+class Record:
+    """Dict jaisa compact record: known keys slots mein, kabhi-kabhar wali baaki keys `extra` dict mein.
+
+    Jo slot set nahi hua woh key "nahi hai" maana jaata hai (dict jaisa KeyError / `.get` default).
+    `INTERNED` fields (artist, format jaisi baar-baar repeat hone wali strings) `sys.intern` se
+    ek hi copy share karti hain. JSON ke liye `to_dict()` use karo.
+    """
+
+    __slots__ = ('extra',)
+    FIELDS = ()
+    INTERNED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set, cls._interned_set = frozenset(cls.FIELDS), frozenset(cls.INTERNED)
+
+    def __init__(self, data=(), **kwargs):
+        self.extra = None
+        self.update(data, **kwargs)
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try: return getattr(self, key)
+            except AttributeError: raise KeyError(key) from None
+        if self.extra and key in self.extra: return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            if key in self._interned_set and type(value) is str: value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None: self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set:
+            try: delattr(self, key)
+            except AttributeError: raise KeyError(key) from None
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+            if not self.extra: self.extra = None
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._field_set: return hasattr(self, key)
+        return bool(self.extra) and key in self.extra
+
+    def get(self, key, default=None):
+        try: return self[key]
+        except KeyError: return default
+
+    def pop(self, key, *default):
+        try: value = self[key]
+        except KeyError:
+            if default: return default[0]
+            raise
+        del self[key]
+        return value
+
+    def update(self, data=(), **kwargs):
+        for key, value in (data.items() if hasattr(data, 'items') else data): self[key] = value
+        for key, value in kwargs.items(): self[key] = value
+
+    def keys(self):
+        keys = [field for field in self.FIELDS if hasattr(self, field)]
+        if self.extra: keys.extend(self.extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)): return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        # Pickle (catalog snapshot, import process pool) ke baad strings dobara intern hoti hain.
+        self.extra = None
+        self.update(state)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SongRecord(Record):
+    """SONG_DB ka ek song (parse_song_info ka output + message_id)."""
+    __slots__ = FIELDS = ('message_id', 'song_title', 'artist', 'format', 'size_mb', 'original_filename')
+    INTERNED = ('artist', 'format')
+
+
+class UserRecord(Record):
+    """USERS_DB ka ek user."""
+    __slots__ = FIELDS = ('username', 'first_name', 'points', 'total_downloaded', 'total_purchased',
+                          'total_spent', 'join_date', 'last_daily_claim', 'blocked')
+
+
+class UserTable:
+    """USERS_DB: user_id -> UserRecord. Bahar ids pehle jaise strings hain, andar int keys rehti hain
+    (lakhon "123456789" jaisi string keys int se lagbhag dugni jagah leti hain)."""
+
+    def __init__(self, users=None):
+        self.loaded = {}    # int user_id -> UserRecord
+        for user_id, record in (users or {}).items(): self[user_id] = record
+
+    def peek(self, user_id):
+        """Sirf memory mein pada record (storage se load kiye bina)."""
+        return self.loaded.get(int(user_id))
+
+    def get(self, user_id, default=None):
+        record = self.loaded.get(int(user_id))
+        return default if record is None else record
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __getitem__(self, user_id):
+        record = self.get(user_id)
+        if record is None: raise KeyError(user_id)
+        return record
+
+    def __setitem__(self, user_id, record):
+        self.loaded[int(user_id)] = record if isinstance(record, UserRecord) else UserRecord(record)
+
+    def __len__(self):
+        return len(self.loaded)
+
+    def items(self):
+        return ((str(user_id), record) for user_id, record in list(self.loaded.items()))
+
+    def values(self):
+        return (record for _, record in self.items())
+
+    def __iter__(self):
+        return (user_id for user_id, _ in self.items())
+
+    def to_dict(self):
+        """JSON ke liye purana {user_id: {...}} format."""
+        return {user_id: record.to_dict() for user_id, record in self.items()}
+
+
+class JsonStorage:
+    """Purana storage: poori JSON files, lekin write-behind ke saath (sirf dirty files flush hoti hain)."""
+
+    def __init__(self):
+        self.dirty = set()
+        self.catalog_applied = None     # JSON mein catalog version nahi hota
+
+    def load(self):
+        """(users_data, missing, config) load karta hai."""
+        users_data = load_db(USERS_FILE)
+        users_data['users'] = UserTable(users_data.get('users'))
+        return users_data, load_db(MISSING_FILE), load_db(CONFIG_FILE)
+
+    def load_catalog(self):
+        songs = load_db(DB_FILE)
+        return SongCatalog(songs if isinstance(songs, list) else [])
+
+    def load_payments(self):
+        return load_db(PAYMENTS_FILE).get('payments', [])
+
+    def catalog_version(self):
+        """JSON files ka koi version nahi, isliye binary catalog snapshot use nahi hota."""
+        return None
+
+    def get_meta(self, key):
+        return None
+
+    def set_meta(self, key, value):
+        pass
+
+    def _mark(self, name):
+        self.dirty.add(name)
+        PERSISTENCE.notify()
+
+    def save_user(self, user_id):
+        self._mark('users')
+
+    def save_song(self, song):
+        self._mark('songs')
+
+    def add_missing_request(self, request):
+        self._mark('missing')
+
+    def replace_missing_requests(self, requests):
+        self._mark('missing')
+
+    def save_config(self):
+        self._mark('config')
+
+    def save_payment(self, payment):
+        self._mark('payments')
+
+    def bulk_save_songs(self, songs):
+        """Bulk import ke baad poora catalog ek hi baar likhta hai."""
+        save_db(SONG_DB.to_list(), DB_FILE)
+
+    def take_snapshot(self):
+        """Event loop par chalta hai: dirty stores ki list deta hai aur dirty flags saaf karta hai."""
+        # Records JSON ke liye plain dicts mein yahin (loop par) badalte hain, sirf dirty stores ke.
+        stores = {'users': (lambda: {'users': USERS_DB.to_dict(), 'username_map': dict(USERNAME_MAP)}, USERS_FILE),
+                  'songs': (SONG_DB.to_list, DB_FILE), 'missing': (lambda: MISSING_DB, MISSING_FILE),
+                  'config': (lambda: BOT_CONFIG, CONFIG_FILE), 'payments': (lambda: {'payments': PAYMENTS.to_list()}, PAYMENTS_FILE)}
+        snapshot = [(stores[name][0](), stores[name][1]) for name in sorted(self.dirty)]
+        self.dirty.clear()
+        return snapshot
+
+    def write_snapshot(self, snapshot):
+        """Background thread mein chalta hai: har dirty store ko atomically likhta hai."""
+        for data, filename in snapshot:
+            # Bina indent ke json.dumps C encoder use karta hai jo poora encode GIL pakad kar karta hai,
+            # isliye event loop beech mein data badal nahi sakta.
+            write_file_atomic(filename, json.dumps(data, ensure_ascii=False))
+
+
+class SqliteStorage:
+    """SQLite (WAL mode) storage: har change sirf apni row update karta hai."""
+
+    USER_COLUMNS = ('username', 'first_name', 'points', 'total_downloaded', 'total_purchased',
+                    'total_spent', 'join_date', 'last_daily_claim')
+    SONG_COLUMNS = ('song_title', 'artist', 'format', 'size_mb', 'original_filename')
+    REQUEST_COLUMNS = ('user_id', 'song_name', 'request_date')
+    PAYMENT_COLUMNS = ('user_id', 'amount', 'points', 'status', 'submitted_at', 'decided_at', 'admin_id')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY, username TEXT, first_name TEXT,
+            points INTEGER, total_downloaded INTEGER, total_purchased INTEGER, total_spent REAL,
+            join_date TEXT, last_daily_claim TEXT, extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS username_map (username TEXT PRIMARY KEY, user_id TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS songs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, message_id INTEGER NOT NULL UNIQUE,
+            song_title TEXT, artist TEXT, format TEXT, size_mb REAL, original_filename TEXT, extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS missing_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, song_name TEXT, request_date TEXT, extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS payments (
+            utr TEXT PRIMARY KEY, user_id INTEGER, amount INTEGER, points INTEGER, status TEXT,
+            submitted_at TEXT, decided_at TEXT, admin_id INTEGER, extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, filename):
+        self.conn = sqlite3.connect(filename, check_same_thread=False, timeout=30)    # Shards ek hi file likhte hain
+        self.reader = None      # Lazy user loads ke liye alag connection (flush thread ke writes se alag)
+        self.filename = filename
+        self.dirty_users = set()
+        self.dirty_songs = {}
+        self.request_ops = []
+        self.dirty_payments = {}
+        self.config_dirty = False
+        self.catalog_applied = None     # Catalog version jis tak in-memory catalog mein sab hai (None: pata nahi / stale)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.user_sql = (f"INSERT OR REPLACE INTO users (user_id, {', '.join(self.USER_COLUMNS)}, extra) "
+                         f"VALUES ({', '.join('?' * (len(self.USER_COLUMNS) + 2))})")
+        self.song_sql = (f"INSERT INTO songs (message_id, {', '.join(self.SONG_COLUMNS)}, extra) "
+                         f"VALUES ({', '.join('?' * (len(self.SONG_COLUMNS) + 2))}) "
+                         f"ON CONFLICT(message_id) DO UPDATE SET "
+                         f"{', '.join(f'{c} = excluded.{c}' for c in self.SONG_COLUMNS + ('extra',))}")
+        self.request_sql = "INSERT INTO missing_requests (user_id, song_name, request_date, extra) VALUES (?, ?, ?, ?)"
+        self.payment_sql = (f"INSERT OR REPLACE INTO payments (utr, {', '.join(self.PAYMENT_COLUMNS)}, extra) "
+                            f"VALUES ({', '.join('?' * (len(self.PAYMENT_COLUMNS) + 2))})")
+        self.version_sql = ("INSERT INTO meta (key, value) VALUES ('catalog_version', 1) "
+                            "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    @staticmethod
+    def _to_row(record, columns):
+        """Dict ko known columns aur baaki keys ke `extra` JSON mein baanta hai."""
+        extra = {k: v for k, v in record.items() if k not in columns}
+        return [record.get(c) for c in columns] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+    @staticmethod
+    def _from_row(row, columns):
+        """`_to_row` ka ulta: row ko wapas dict banata hai."""
+        record = {c: v for c, v in zip(columns, row) if v is not None}
+        if row[len(columns)]: record.update(json.loads(row[len(columns)]))
+        return record
+
+    def _user_row(self, user_id, user_data):
+        return [str(user_id)] + self._to_row(user_data, self.USER_COLUMNS)
+
+    def _song_row(self, song):
+        return [song['message_id']] + self._to_row({k: v for k, v in song.items() if k != 'message_id'}, self.SONG_COLUMNS)
+
+    def load(self):
+        """Pehli baar chalne par JSON files import karta hai. Users lazily (pehli access par) aate hain;
+        catalog alag se `load_catalog` / binary snapshot se.
+
+        username_map sirf likha jaata hai (user rows ke saath), isliye use memory mein load nahi karte.
+        """
+        if self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone() is None:
+            self.migrate_from_json()
+        self.reader = sqlite3.connect(self.filename, check_same_thread=False, timeout=30)
+        requests = [self._from_row(row, self.REQUEST_COLUMNS) for row in
+                    self.conn.execute("SELECT user_id, song_name, request_date, extra FROM missing_requests ORDER BY id")]
+        config = {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM config")}
+        return {'users': LazyUserTable(self), 'username_map': {}}, {'requests': requests}, config
+
+    def load_catalog(self):
+        songs = []
+        for row in self.reader.execute(f"SELECT message_id, {', '.join(self.SONG_COLUMNS)}, extra FROM songs ORDER BY seq"):
+            song = SongRecord(self._from_row(row[1:], self.SONG_COLUMNS), message_id=row[0])
+            songs.append(song)
+        return SongCatalog(songs)
+
+    def load_payments(self):
+        """Saari payment submissions (pending aur decided), submission order mein."""
+        return [dict(self._from_row(row[1:], self.PAYMENT_COLUMNS), utr=row[0]) for row in self.conn.execute(
+            f"SELECT utr, {', '.join(self.PAYMENT_COLUMNS)}, extra FROM payments ORDER BY submitted_at")]
+
+    def catalog_version(self):
+        """Songs table ka version: har song write par badhta hai (binary snapshot isi se validate hota hai)."""
+        row = self.reader.execute("SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def load_user(self, user_id):
+        row = self.reader.execute(f"SELECT {', '.join(self.USER_COLUMNS)}, extra FROM users WHERE user_id = ?",
+                                  (user_id,)).fetchone()
+        return None if row is None else UserRecord(self._from_row(row, self.USER_COLUMNS))
+
+    def iter_users(self):
+        """Saare users stream karta hai (user_id, record) - broadcast jaise kabhi-kabhar ke kaam ke liye."""
+        for row in self.reader.execute(f"SELECT user_id, {', '.join(self.USER_COLUMNS)}, extra FROM users"):
+            yield row[0], UserRecord(self._from_row(row[1:], self.USER_COLUMNS))
+
+    def count_users(self):
+        return self.reader.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn: self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        """Connections band karta hai (fork se pehle: SQLite connection fork ke paar use nahi hona chahiye)."""
+        self.conn.close()
+        if self.reader is not None: self.reader.close()
+
+    def migrate_from_json(self):
+        """Purani JSON files ka data ek hi transaction mein SQLite mein import karta hai (sirf ek baar)."""
+        json_storage = JsonStorage()
+        (users_data, missing, config), songs = json_storage.load(), json_storage.load_catalog()
+        users = users_data.get('users', {})
+        with self.conn:
+            self.conn.executemany(self.user_sql, (self._user_row(uid, data) for uid, data in users.items()))
+            self.conn.executemany("INSERT OR REPLACE INTO username_map (username, user_id) VALUES (?, ?)",
+                                  users_data.get('username_map', {}).items())
+            self.conn.executemany(self.song_sql, (self._song_row(song) for song in songs))
+            self.conn.execute(self.version_sql)
+            self.conn.executemany(self.request_sql, (self._to_row(r, self.REQUEST_COLUMNS) for r in missing.get('requests', [])))
+            self.conn.executemany("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
+                                  ((k, json.dumps(v, ensure_ascii=False)) for k, v in config.items()))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),))
+        if users or songs: logger.info(f"📦 Migrated {len(users)} users and {len(songs)} songs from JSON to SQLite.")
+
+    def save_user(self, user_id):
+        self.dirty_users.add(str(user_id))
+        PERSISTENCE.notify()
+
+    def save_song(self, song):
+        self.dirty_songs[song['message_id']] = song
+        PERSISTENCE.notify()
+
+    def add_missing_request(self, request):
+        self.request_ops.append(('add', request))
+        PERSISTENCE.notify()
+
+    def replace_missing_requests(self, requests):
+        self.request_ops = [('replace', list(requests))]
+        PERSISTENCE.notify()
+
+    def save_config(self):
+        self.config_dirty = True
+        PERSISTENCE.notify()
+
+    def save_payment(self, payment):
+        self.dirty_payments[payment['utr']] = payment
+        PERSISTENCE.notify()
+
+    def bulk_save_songs(self, songs):
+        """Bulk import ke saare songs ek transaction mein upsert karta hai."""
+        with self.conn:
+            self.conn.executemany(self.song_sql, (self._song_row(song) for song in songs))
+            version = self._bump_catalog_version()
+        self._applied(version)
+
+    def _bump_catalog_version(self):
+        """Transaction ke andar (write lock ke saath) catalog version badha kar naya version deta hai."""
+        self.conn.execute(self.version_sql)
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()[0])
+
+    def _applied(self, version):
+        """Is process ka song write commit hua. Naya version pichle applied version ke theek baad ka ho tabhi
+        in-memory catalog us version ke barabar hai; beech mein kisi aur process (import CLI) ne songs likhe
+        hon to catalog stale hai aur uska snapshot nahi likha jaata."""
+        if self.catalog_applied is not None:
+            self.catalog_applied = version if version == self.catalog_applied + 1 else None
+
+    def take_snapshot(self):
+        """Event loop par chalta hai: dirty records ko rows mein badal kar dirty state saaf karta hai."""
+        user_rows, username_rows = [], []
+        for user_id in self.dirty_users:
+            user_data = USERS_DB.get(user_id)
+            if user_data is None: continue
+            user_rows.append(self._user_row(user_id, user_data))
+            if user_data.get('username'): username_rows.append((user_data['username'].lower(), user_id))
+        song_rows = [self._song_row(song) for song in self.dirty_songs.values()]
+        request_ops = [(op, [self._to_row(r, self.REQUEST_COLUMNS) for r in (data if op == 'replace' else [data])])
+                       for op, data in self.request_ops]
+        config_rows = [(k, json.dumps(v, ensure_ascii=False)) for k, v in BOT_CONFIG.items()] if self.config_dirty else []
+        payment_rows = [[utr] + self._to_row({k: v for k, v in payment.items() if k != 'utr'}, self.PAYMENT_COLUMNS)
+                        for utr, payment in self.dirty_payments.items()]
+        self.dirty_users, self.dirty_songs, self.request_ops, self.config_dirty = set(), {}, [], False
+        self.dirty_payments = {}
+        return user_rows, username_rows, song_rows, request_ops, config_rows, payment_rows
+
+    def write_snapshot(self, snapshot):
+        """Background thread mein chalta hai: saari rows ek transaction mein likhta hai."""
+        user_rows, username_rows, song_rows, request_ops, config_rows, payment_rows = snapshot
+        version = None
+        with self.conn:
+            self.conn.executemany(self.user_sql, user_rows)
+            self.conn.executemany("INSERT OR REPLACE INTO username_map (username, user_id) VALUES (?, ?)", username_rows)
+            self.conn.executemany(self.song_sql, song_rows)
+            if song_rows: version = self._bump_catalog_version()
+            for op, rows in request_ops:
+                if op == 'replace': self.conn.execute("DELETE FROM missing_requests")
+                self.conn.executemany(self.request_sql, rows)
+            self.conn.executemany("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", config_rows)
+            self.conn.executemany(self.payment_sql, payment_rows)
+        if version is not None: self._applied(version)
+
+
+class LazyUserTable(UserTable):
+    """USERS_DB ka lazy version: user record pehli baar maange jaane par SQLite se aata hai aur phir
+    memory mein rehta hai, isliye startup par poori users table parse nahi hoti.
+
+    Dict jaisa interface (`in`, `[]`, `get`, `items`, `len`) deta hai. `items()`/`values()` baaki
+    users ko bina cache kiye stream karte hain (sirf broadcast jaise kaamon ke liye).
+    """
+
+    def __init__(self, storage):
+        super().__init__()          # self.loaded: jo records badalte aur flush hote hain
+        self.storage = storage
+        self.count = storage.count_users()
+        self.points_source = None   # LEDGER.balances: load hote waqt points ledger se sync hote hain
+
+    def get(self, user_id, default=None):
+        record = self.loaded.get(int(user_id))
+        if record is None:
+            record = self.storage.load_user(str(user_id))
+            if record is None: return default
+            if self.points_source is not None and str(user_id) in self.points_source:
+                record['points'] = self.points_source[str(user_id)]
+            self.loaded[int(user_id)] = record
+        return record
+
+    def __setitem__(self, user_id, record):
+        if user_id not in self: self.count += 1
+        super().__setitem__(user_id, record)
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        loaded = dict(self.loaded)
+        for user_id, record in loaded.items(): yield str(user_id), record
+        for user_id, record in self.storage.iter_users():
+            if int(user_id) not in loaded: yield user_id, record
+
+
+class PersistenceManager:
+    """Write-behind persistence: changes coalesce hote hain aur background task unhe flush karta hai.
+
+    Flush interval (FLUSH_INTERVAL_SECONDS) par ya FLUSH_BATCH_SIZE changes jama hone par hota hai.
+    Snapshot event loop par liya jaata hai, lekin serialization aur disk I/O ek thread mein hote hain.
+    """
+
+    def __init__(self, storage, interval=FLUSH_INTERVAL_SECONDS, batch_size=FLUSH_BATCH_SIZE):
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending = 0
+        self.unwritten = []     # Woh snapshots jinka write fail hua, agle flush mein retry honge
+        self.hooks = []         # Har flush ke baad chalne wale async maintenance kaam
+        self._wakeup = None
+        self._task = None
+        self._lock = None
+
+    def notify(self):
+        """Storage har change par isse bulata hai."""
+        self.pending += 1
+        if self.pending >= self.batch_size and self._wakeup: self._wakeup.set()
+
+    async def flush(self):
+        """Abhi tak ke saare dirty changes disk par likhta hai."""
+        async with self._lock:
+            if self.pending:
+                self.pending = 0
+                self.unwritten.append(self.storage.take_snapshot())
+            while self.unwritten:
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.storage.write_snapshot, self.unwritten[0])
+                except Exception as e:
+                    METRICS.inc("persistence_flush_errors_total")
+                    logger.error(f"Persistence flush failed, will retry: {e}"); return
+                METRICS.observe("persistence_flush_seconds", time.perf_counter() - started)
+                self.unwritten.pop(0)
+
+    def flush_now(self):
+        """Bina event loop ke (scripts ya shutdown ke baad) turant flush karta hai."""
+        if self.pending:
+            self.pending = 0
+            self.unwritten.append(self.storage.take_snapshot())
+        while self.unwritten:
+            self.storage.write_snapshot(self.unwritten[0])
+            self.unwritten.pop(0)
+
+    async def _run(self):
+        while True:
+            try: await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError: pass
+            self._wakeup.clear()
+            await self.flush()
+            for hook in self.hooks:
+                try: await hook()
+                except Exception as e: logger.error(f"Persistence hook {hook.__qualname__} failed: {e}")
+
+    async def start(self, application=None):
+        """Background flush task shuru karta hai (Application ke post_init se)."""
+        self._wakeup, self._lock = asyncio.Event(), asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, application=None):
+        """Background task band karke aakhri flush karta hai (Application ke post_shutdown se)."""
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+        await self.flush()
+
+
+class SongCatalog:
+    """Songs ka catalog, message_id se keyed: upsert/lookup/delete O(1), listing upload order mein."""
+
+    def __init__(self, songs=()):
+        self._songs = {}    # dict insertion order yaad rakhta hai; update par position nahi badalti
+        for song in songs:
+            if 'message_id' in song: self.upsert(song if isinstance(song, SongRecord) else SongRecord(song))
+
+    def __len__(self):
+        return len(self._songs)
+
+    def __iter__(self):
+        return iter(self._songs.values())
+
+    def __contains__(self, msg_id):
+        return msg_id in self._songs
+
+    def get(self, msg_id, default=None):
+        return self._songs.get(msg_id, default)
+
+    def upsert(self, song):
+        """Song daalta ya replace karta hai; naya song tha to True deta hai."""
+        is_new = song['message_id'] not in self._songs
+        self._songs[song['message_id']] = song
+        return is_new
+
+    def remove(self, msg_id):
+        return self._songs.pop(msg_id, None)
+
+    def to_list(self):
+        """Saare songs plain dicts ki list mein (songs.json ke format mein)."""
+        return [song.to_dict() for song in self._songs.values()]
+
 
 # --- LOAD DATABASES & CONFIG ---
-USERS_DATA = load_db(USERS_FILE)
-MISSING_DB = load_db(MISSING_FILE)
-BOT_CONFIG = load_db(CONFIG_FILE)
-SONG_DB = load_db(DB_FILE)
-if not isinstance(SONG_DB, list):
-    SONG_DB = []
-
-if 'users' not in USERS_DATA: USERS_DATA['users'] = {}
-if 'username_map' not in USERS_DATA: USERS_DATA['username_map'] = {}
-USERS_DB = USERS_DATA['users']
-USERNAME_MAP = USERS_DATA['username_map']
+# Import par koi file nahi khulti (tests aur benchmarks working directory mein data na banayein):
+# `open_storage()` main(), CLI commands aur har shard worker mein storage, ledger aur stats kholta hai.
+STORAGE = None
+PERSISTENCE = PersistenceManager(None)
+USERS_DATA, MISSING_DB, BOT_CONFIG = {'users': UserTable(), 'username_map': {}}, {}, {}
+USERS_DB, USERNAME_MAP = USERS_DATA['users'], USERS_DATA['username_map']
+SONG_DB = SongCatalog()     # Asli catalog bot start hone ke baad background mein aata hai (CatalogSnapshot)
+
+def open_storage(reseed=False):
+    """Storage, users, missing requests, payments, points ledger aur stats load karta hai (process mein ek baar).
+
+    `reseed`: process layout badla hai, isliye ledger balances users table se dobara bante hain.
+    """
+    global STORAGE, PERSISTENCE, USERS_DATA, MISSING_DB, BOT_CONFIG, USERS_DB, USERNAME_MAP
+    global LEDGER, STATS, MISSING_REQUESTS, PAYMENTS
+    STORAGE = SqliteStorage(SQLITE_FILE) if STORAGE_BACKEND == "sqlite" else JsonStorage()
+    PERSISTENCE = PersistenceManager(STORAGE)
+    USERS_DATA, MISSING_DB, BOT_CONFIG = STORAGE.load()
+    if 'users' not in USERS_DATA: USERS_DATA['users'] = UserTable()
+    if 'username_map' not in USERS_DATA: USERS_DATA['username_map'] = {}
+    USERS_DB, USERNAME_MAP = USERS_DATA['users'], USERS_DATA['username_map']
+    MISSING_REQUESTS = MissingRequests(MISSING_DB.get('requests', []))
+    PAYMENTS = PaymentQueue(STORAGE.load_payments())
+    LEDGER = PointsLedger(shard_file(LEDGER_FILE), shard_file(LEDGER_SNAPSHOT_FILE))
+    LEDGER.load(USERS_DB)
+    if reseed: LEDGER.reseed(USERS_DB)
+    STATS = BotStats(shard_file(STATS_FILE))
+    STATS.load(USERS_DB, seed=SHARD_INDEX == 0)
+    PERSISTENCE.hooks.extend((LEDGER.compact, STATS.save))
+
+
+class PointsLedger:
+    """Points ka append-only ledger: har credit/debit ek fsync ki hui JSON line hai.
+
+    Balances memory mein rehte hain: startup par aakhri snapshot load hota hai aur uske baad
+    ki log lines (tail) replay hoti hain. Compaction sirf naya snapshot likhta hai; log file
+    audit trail ke liye poori rehti hai, snapshot bas batata hai ki replay kahan se karna hai.
+
+    Group commit: `record` entry ko buffer karke balance turant badal deta hai (event loop par koi
+    disk I/O nahi). User ko jawab dene se pehle caller `await sync()` karta hai; us waqt tak jama
+    saari entries ek hi write + fsync mein thread par jaati hain, aur saath mein wait kar rahe
+    callers wahi fsync share karte hain.
+    """
+
+    def __init__(self, log_file, snapshot_file):
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.balances = {}      # user_id (str) -> points
+        self.seq = 0            # Aakhri entry ka sequence number
+        self.synced_seq = 0     # Is seq tak ki entries disk par fsync ho chuki hain
+        self.entries_since_snapshot = 0
+        self._log = None
+        self._buffer = []       # Record hui lekin abhi likhi nahi gayi lines
+        self._flushing = None   # Chal raha group commit (Task)
+
+    def load(self, users_db):
+        """Snapshot + log tail se balances banata hai aur unhe user records mein sync karta hai."""
+        snapshot = load_db(self.snapshot_file)
+        offset = snapshot.get('offset', 0)
+        if snapshot:
+            self.balances, self.seq = snapshot['balances'], snapshot['seq']
+        else:
+            # Ledger se pehle ke users ke opening balances.
+            self.balances = {uid: data.get('points', 0) for uid, data in users_db.items() if owns_user(uid)}
+            offset = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+
+        replayed = 0
+        with open(self.log_file, "a+b") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"): raise ValueError("incomplete line")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Crash ke waqt adhi likhi line: use kaat do taaki agli entries saaf append hon.
+                    logger.error(f"Ledger {self.log_file} ki aakhri adhoori line hata rahe hain.")
+                    f.truncate(offset)
+                    break
+                self.balances[entry['user_id']] = self.balances.get(entry['user_id'], 0) + entry['delta']
+                self.seq = entry['seq']
+                offset += len(line)
+                replayed += 1
+        self._log = open(self.log_file, "ab", buffering=0)     # Unbuffered: fail hua write buffer mein atka nahi rehta
+        self.synced_seq = self.seq
+        if replayed: logger.info(f"📒 Replayed {replayed} ledger entries after the last snapshot.")
+        if not snapshot: self._write_snapshot(self._snapshot_data())
+        else: self.entries_since_snapshot = replayed
+
+        if isinstance(users_db, LazyUserTable): users_db.points_source = self.balances     # Baaki users load hote waqt sync honge
+        for uid, points in self.balances.items():
+            user_data = users_db.peek(uid)
+            if user_data is not None and user_data.get('points') != points:
+                user_data['points'] = points
+                STORAGE.save_user(uid)
+
+    def reseed(self, users_db):
+        """Process layout (shards ki ginti) badalne par balances users table se dobara banata hai.
+
+        Users doosre shards mein chale gaye hote hain, isliye purane snapshot par bharosa nahi; pichhla
+        layout band hote waqt points users table mein flush kar chuka hota hai. Log file audit ke liye
+        waise hi rehti hai, naya snapshot bas batata hai ki replay yahin se shuru ho.
+        """
+        self.balances = {uid: data.get('points', 0) for uid, data in users_db.items() if owns_user(uid)}
+        self.entries_since_snapshot = 0
+        self._write_snapshot(self._snapshot_data())
+        if isinstance(users_db, LazyUserTable): users_db.points_source = self.balances
+        logger.info(f"📒 Ledger {self.log_file} reseeded with {len(self.balances)} balances for the new process layout.")
+
+    def close(self):
+        """Bachi hui buffered entries (bina event loop ke) likh kar file band karta hai."""
+        if self._log is None: return
+        if self._buffer: self._write("".join(self._buffer))
+        self._buffer, self.synced_seq = [], self.seq
+        self._log.close()
+        self._log = None
+
+    def record(self, user_id, delta, reason, ref=None):
+        """Ek credit/debit buffer mein daal kar naya balance deta hai; durable `await sync()` ke baad hota hai."""
+        user_id = str(user_id)
+        self.seq += 1
+        entry = {'seq': self.seq, 'ts': datetime.now().isoformat(), 'user_id': user_id,
+                 'delta': delta, 'reason': reason, 'ref': ref}
+        self._buffer.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.balances[user_id] = self.balances.get(user_id, 0) + delta
+        self.entries_since_snapshot += 1
+        return self.balances[user_id]
+
+    def _write(self, text):
+        """Lines likh kar fsync karta hai. Fail ho (ENOSPC, EIO) to file pehle ki length par truncate hoti hai,
+        taaki retry mein aadhi likhi line dobara na jude."""
+        start = self._log.seek(0, os.SEEK_END)
+        try:
+            data = memoryview(text.encode('utf-8'))
+            while data: data = data[self._log.write(data):]
+            os.fsync(self._log.fileno())
+        except OSError:
+            try: self._log.truncate(start)
+            except OSError as e: logger.error(f"Could not truncate ledger after a failed write: {e}")
+            raise
+
+    async def _commit(self):
+        """Ek group commit: ab tak buffer hui saari lines ek write + fsync mein (thread par)."""
+        try:
+            lines, seq, self._buffer = self._buffer, self.seq, []
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, "".join(lines))
+            except Exception:
+                # Lines wapas buffer ke aage (order same), synced_seq wahi: agla sync() inhe dobara likhega.
+                METRICS.inc("ledger_write_errors_total")
+                self._buffer[:0] = lines
+                raise
+            self.synced_seq = seq
+            METRICS.observe("ledger_fsync_seconds", time.perf_counter() - started)
+            METRICS.observe("ledger_commit_entries", len(lines), buckets=COUNT_BUCKETS)
+        finally:
+            self._flushing = None
+
+    async def sync(self):
+        """Abhi tak record hui saari entries ke fsync hone tak wait karta hai."""
+        target = self.seq
+        while self.synced_seq < target:
+            # Ek waqt mein ek hi commit (file mein order bana rehta hai); chalte commit ke baad aayi
+            # entries agle commit mein jaati hain, jise uske dauraan aaye saare callers share karte hain.
+            if self._flushing is None: self._flushing = asyncio.get_running_loop().create_task(self._commit())
+            await asyncio.shield(self._flushing)
+
+    def _snapshot_data(self):
+        return {'seq': self.seq, 'offset': self._log.tell(), 'balances': dict(self.balances)}
+
+    def _write_snapshot(self, data):
+        write_file_atomic(self.snapshot_file, json.dumps(data, ensure_ascii=False))
+
+    async def compact(self):
+        """Persistence flush ke baad: buffered entries sync karta hai, aur LEDGER_COMPACT_EVERY entries ke
+        baad naya snapshot likhta hai (disk I/O thread mein)."""
+        await self.sync()
+        if self.entries_since_snapshot < LEDGER_COMPACT_EVERY: return
+        # Snapshot ka offset file ke end par hai, isliye tab hi lo jab koi entry buffer ya raaste mein na ho.
+        while self._buffer or self._flushing: await self.sync()
+        data = self._snapshot_data()
+        self.entries_since_snapshot = 0
+        await asyncio.to_thread(self._write_snapshot, data)
+        logger.info(f"📒 Ledger snapshot written at entry {data['seq']}.")
+
+
+LEDGER = PointsLedger(LEDGER_FILE, LEDGER_SNAPSHOT_FILE)     # open_storage() load karta hai
+
+
+class BotStats:
+    """Events ke running aggregates, taaki /stats users scan na kare.
+
+    All-time totals ek Counter mein hain, aur har event hourly aur daily ring buffers mein bhi
+    ginta hai: `[bucket_id, {event: count}]` slots, jahan slot = bucket_id % size. Purana bucket
+    apne aap overwrite ho jaata hai, isliye memory fixed rehti hai. Pehli baar chalne par totals
+    users ke records se ek baar seed hote hain; uske baad sab kuch STATS_FILE mein flush hota hai.
+    Multi-process mode mein har shard apni file rakhta hai aur /stats unhe `combined()` se jodta hai.
+    """
+
+    def __init__(self, filename, hours=STATS_HOURS, days=STATS_DAYS):
+        self.filename = filename
+        self.totals = Counter()
+        self.hourly = [[None, {}] for _ in range(hours)]
+        self.daily = [[None, {}] for _ in range(days)]
+        self.dirty = False
+
+    @staticmethod
+    def bucket_ids(now=None):
+        now = now or datetime.now()
+        day = now.toordinal()
+        return day * 24 + now.hour, day
+
+    def load(self, users_db, seed=True):
+        data = load_db(self.filename)
+        if data or not seed:
+            self.totals = Counter(data.get('totals', {}))
+            for ring, saved in ((self.hourly, data.get('hourly', [])), (self.daily, data.get('daily', []))):
+                for bucket_id, counts in saved:
+                    if bucket_id is not None: ring[bucket_id % len(ring)] = [bucket_id, counts]
+            return
+        for user_data in users_db.values():
+            self.totals['signup'] += 1
+            self.totals['download'] += user_data.get('total_downloaded', 0)
+            self.totals['points_sold'] += user_data.get('total_purchased', 0)
+            self.totals['revenue'] += user_data.get('total_spent', 0.0)
+        self.dirty = True
+
+    def record(self, event, amount=1):
+        """Event ko totals aur current hour/day buckets mein jodta hai (O(1))."""
+        self.totals[event] += amount
+        for ring, bucket_id in zip((self.hourly, self.daily), self.bucket_ids()):
+            slot = ring[bucket_id % len(ring)]
+            if slot[0] != bucket_id: slot[0], slot[1] = bucket_id, {}
+            slot[1][event] = slot[1].get(event, 0) + amount
+        self.dirty = True
+
+    def _series(self, ring, last_id, event, count):
+        """Aakhri `count` buckets (purane pehle) mein event ki ginti."""
+        values = []
+        for bucket_id in range(last_id - count + 1, last_id + 1):
+            slot = ring[bucket_id % len(ring)]
+            values.append(slot[1].get(event, 0) if slot[0] == bucket_id else 0)
+        return values
+
+    def daily_series(self, event, days):
+        return self._series(self.daily, self.bucket_ids()[1], event, days)
+
+    def hourly_series(self, event, hours):
+        return self._series(self.hourly, self.bucket_ids()[0], event, hours)
+
+    async def save(self):
+        """PERSISTENCE hook: badla hua data atomic write se disk par likhta hai."""
+        if not self.dirty: return
+        self.dirty = False
+        data = json.dumps(self.export())
+        await asyncio.to_thread(write_file_atomic, self.filename, data)
+
+    def export(self):
+        return {'totals': dict(self.totals), 'hourly': self.hourly, 'daily': self.daily}
+
+    @classmethod
+    def combined(cls, exports):
+        """Kai shards ke `export()` jod kar ek BotStats deta hai (/stats ke liye)."""
+        stats = cls(None)
+        for data in exports:
+            stats.totals.update(data['totals'])
+            for ring, saved in ((stats.hourly, data['hourly']), (stats.daily, data['daily'])):
+                for bucket_id, counts in saved:
+                    if bucket_id is None: continue
+                    slot = ring[bucket_id % len(ring)]
+                    if slot[0] != bucket_id:
+                        if slot[0] is not None and slot[0] > bucket_id: continue
+                        slot[0], slot[1] = bucket_id, {}
+                    for event, count in counts.items(): slot[1][event] = slot[1].get(event, 0) + count
+        return stats
+
+
+STATS = BotStats(STATS_FILE)       # open_storage() load karta hai
+
+class TokenBucket:
+    """Simple token bucket rate limiter; RetryAfter aane par poora bucket pause kiya ja sakta hai."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def try_acquire(self, tokens=1):
+        """Token mile to turant le leta hai aur True deta hai, warna False."""
+        now = self._refill()
+        if now < self.paused_until or self.tokens < tokens: return False
+        self.tokens -= tokens
+        return True
+
+    async def acquire(self, tokens=1):
+        """Token milne tak wait karta hai."""
+        while not self.try_acquire(tokens):
+            wait = max(self.paused_until - time.monotonic(), (tokens - self.tokens) / self.rate)
+            await asyncio.sleep(max(wait, 0.001))
+
+    def pause(self, seconds):
+        """Flood control (RetryAfter) ke baad `seconds` tak koi token nahi deta."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def idle(self):
+        """Bucket bhara hua hai aur pause nahi hai, yaani ise bhool jaane se kuch nahi badalta."""
+        return self._refill() >= self.paused_until and self.tokens >= self.capacity
+
+def retry_after_seconds(error):
+    """RetryAfter error se wait time seconds mein nikalta hai."""
+    value = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+class SendScheduler(BaseRateLimiter):
+    """Saare outbound Bot API sends ka central scheduler (ExtBot ka rate_limiter).
+
+    Har send ek lane mein jaata hai: 'interactive' (replies, downloads) > 'notify' > 'bulk',
+    jo `rate_limit_args` se aati hai (default interactive). Pehle chat ka bucket (private ~1/s,
+    group ~20/min), phir lane ka cap (SEND_LANE_RATES), phir global bucket jiska har token sabse
+    oonchi waiting lane ko milta hai; isliye broadcast chalte hue bhi reply ko zyada se zyada ek
+    token ka intezaar karna padta hai. RetryAfter par global aur chat bucket pause hote hain aur
+    wahi request dobara jaati hai.
+    """
+
+    LANES = ('interactive', 'notify', 'bulk')
+    LIMITED_METHODS = ('send', 'copyMessage', 'forwardMessage')    # Naye messages; edits/answers seedhe jaate hain
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, global_rate=GLOBAL_SEND_RATE, lane_rates=SEND_LANE_RATES):
+        # Capacity 1: Telegram har 1 second ki window ginta hai, isliye burst nahi, barabar spacing.
+        self.global_bucket = TokenBucket(global_rate, 1) if global_rate else None
+        self.lane_buckets = {lane: TokenBucket(rate) for lane, rate in lane_rates.items()}
+        self.chat_buckets = {}      # chat_id -> TokenBucket
+        self.waiting = {lane: deque() for lane in self.LANES}   # global token ke liye futures
+        self.wakeup = None
+        self.task = None
+
+    async def initialize(self):
+        self.wakeup = asyncio.Event()
+        if self.global_bucket: self.task = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        task, self.task = self.task, None
+        if task is None: return
+        task.cancel()
+        try: await task
+        except asyncio.CancelledError: pass
+        for lane in self.LANES:     # Shutdown ke baad bache sends bina intezaar ke jaate hain
+            while self.waiting[lane]:
+                future = self.waiting[lane].popleft()
+                if not future.done(): future.set_result(None)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self.chat_buckets = {cid: b for cid, b in self.chat_buckets.items() if not b.idle()}
+            rate = GROUP_SEND_RATE if str(chat_id).startswith(('-', '@')) else CHAT_SEND_RATE
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, CHAT_SEND_BURST)
+        return bucket
+
+    def _next_lane(self):
+        for lane in self.LANES:
+            waiting = self.waiting[lane]
+            while waiting and waiting[0].done(): waiting.popleft()     # Cancel ho chuke callers
+            if waiting: return lane
+        return None
+
+    async def _dispatch(self):
+        """Global bucket ka har token sabse oonchi lane ke sabse purane waiting send ko deta hai."""
+        while True:
+            if self._next_lane() is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            await self.global_bucket.acquire()
+            lane = self._next_lane()    # Token ke intezaar mein oonchi lane ka send aa gaya ho sakta hai
+            if lane is None:
+                self.global_bucket.tokens += 1
+                continue
+            self.waiting[lane].popleft().set_result(None)
+            METRICS.set_gauge("send_queue_depth", len(self.waiting[lane]), lane=lane)
+
+    async def _take_turn(self, lane):
+        if self.task is None: return
+        if not any(self.waiting.values()) and self.global_bucket.try_acquire(): return
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[lane].append(future)
+        METRICS.set_gauge("send_queue_depth", len(self.waiting[lane]), lane=lane)
+        self.wakeup.set()
+        await future
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if not endpoint.startswith(self.LIMITED_METHODS): return await callback(*args, **kwargs)
+        lane = rate_limit_args if rate_limit_args in self.waiting else 'interactive'
+        chat_id = data.get('chat_id')
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            if chat_id is not None: await self._chat_bucket(chat_id).acquire()
+            if lane in self.lane_buckets: await self.lane_buckets[lane].acquire()
+            await self._take_turn(lane)
+            METRICS.observe("send_wait_seconds", time.perf_counter() - started, lane=lane)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                METRICS.inc("send_retry_after_total", lane=lane)
+                if attempt == SEND_MAX_RETRIES: raise
+                seconds = retry_after_seconds(e)
+                if self.global_bucket: self.global_bucket.pause(seconds)
+                if chat_id is not None: self._chat_bucket(chat_id).pause(seconds)
+                logger.warning(f"Flood control on {endpoint} ({lane}), retrying in {seconds:.0f}s.")
+
+class InboundThrottle:
+    """Handlers ke aage ka inbound throttle: har handler callback isse wrap hota hai (`wrap_handlers`).
+
+    Update ek kind mein jaata hai (search, inline, download, submit, default). Pehle user+kind ka
+    bucket, phir kind ka global bucket (saare users mila kar); token na mile to handler chalta hi
+    nahi, koi await bhi nahi, bas user ko THROTTLE_NOTICE_SECONDS mein ek baar "slow down" milta hai
+    (dabaye gaye button ka callback phir bhi har baar answer hota hai).
+    Same user ka same `download_<id>` button pehli download chalte hue dobara dabe to woh tap
+    coalesce hota hai. Admins aur channel posts throttle nahi hote.
+    """
+
+    MAX_USER_BUCKETS = 100000
+
+    def __init__(self, limits=THROTTLE_LIMITS, shards=1):
+        self.limits = limits
+        # Har shard apne users ke updates dekhta hai, isliye global limit shards mein bant-ti hai.
+        self.global_buckets = {kind: TokenBucket(total / shards) for kind, (_, _, total) in limits.items() if total}
+        self.user_buckets = {}      # (user_id, kind) -> TokenBucket
+        self.noticed = {}           # user_id -> aakhri "slow down" ka time
+        self.in_flight = set()      # (user_id, callback data) jo downloads abhi chal rahi hain
+
+    @staticmethod
+    def kind(update):
+        """Update kis kind ka hai (THROTTLE_LIMITS ki key)."""
+        if update.inline_query: return 'inline'
+        if update.callback_query: return 'download' if (update.callback_query.data or "").startswith("download_") else 'default'
+        text = update.message.text if update.message else None
+        if text and text.startswith('/'):
+            command = text.split(maxsplit=1)[0][1:].split('@')[0].lower()
+            if command in ('search', 'submit'): return command
+        return 'default'
+
+    def _user_bucket(self, user_id, kind):
+        bucket = self.user_buckets.get((user_id, kind))
+        if bucket is None:
+            if len(self.user_buckets) >= self.MAX_USER_BUCKETS:
+                self.user_buckets = {key: b for key, b in self.user_buckets.items() if not b.idle()}
+            rate, burst, _ = self.limits[kind]
+            bucket = self.user_buckets[(user_id, kind)] = TokenBucket(rate, burst)
+        return bucket
+
+    def admit(self, user_id, kind):
+        """'passed', 'user_limit' ya 'global_limit'."""
+        bucket = self._user_bucket(user_id, kind)
+        if not bucket.try_acquire(): return 'user_limit'
+        total = self.global_buckets.get(kind)
+        if total is not None and not total.try_acquire():
+            bucket.tokens += 1      # User ki galti nahi, uska token wapas
+            return 'global_limit'
+        return 'passed'
+
+    async def _notify(self, update, user_id, text):
+        """Dropped update ka jawab. Callback query ka answer hamesha jaata hai (warna button ka spinner atka
+        rehta hai); notice text ek user ko THROTTLE_NOTICE_SECONDS mein ek baar."""
+        now = time.monotonic()
+        if now - self.noticed.get(user_id, -THROTTLE_NOTICE_SECONDS) < THROTTLE_NOTICE_SECONDS: text = None
+        else:
+            if len(self.noticed) >= self.MAX_USER_BUCKETS:
+                self.noticed = {uid: t for uid, t in self.noticed.items() if now - t < THROTTLE_NOTICE_SECONDS}
+            self.noticed[user_id] = now
+        try:
+            if update.callback_query: await update.callback_query.answer(text)
+            elif update.message and text: await update.message.reply_text(text)
+        except Exception as e:
+            logger.debug(f"Throttle notice to {user_id} failed: {e}")
+
+    def wrap(self, callback):
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            user = update.effective_user if isinstance(update, Update) else None
+            if user is None or user.id in ADMIN_IDS: return await callback(update, context)
+            kind = self.kind(update)
+            key = (user.id, update.callback_query.data) if kind == 'download' else None
+            outcome = 'coalesced' if key in self.in_flight else self.admit(user.id, kind)
+            METRICS.inc("inbound_updates_total", kind=kind, outcome=outcome)
+            if outcome != 'passed':
+                await self._notify(update, user.id, "⏳ Already sending this song..." if outcome == 'coalesced'
+                                   else "⏳ Too many requests. Please slow down and try again in a few seconds.")
+                return
+            if key is None: return await callback(update, context)
+            self.in_flight.add(key)
+            try: return await callback(update, context)
+            finally: self.in_flight.discard(key)
+        return wrapper
 
 def escape_markdown(text):
     """Telegram Markdown ke special characters se bachata hai."""
@@ -102,99 +1483,1155 @@ def determine_artist_and_song(part1, part2):
     if len(part2) > len(part1) * 1.5: return part2, part1
     return part2, part1 # Default: Artist - Song format
 
-def parse_song_info(filename, file_size_bytes=0):
-    """Filename se song ki jaankari (artist, title, size) nikalta hai."""
-    file_path = Path(filename)
-    file_format = file_path.suffix.lower().replace('.', '') if file_path.suffix else 'unknown'
-    size_mb = round(file_size_bytes / (1024 * 1024), 2) if file_size_bytes > 0 else 0
+AUDIO_EXTENSION_RE = re.compile(r'\.(mp3|m4a|wav|flac|aac|ogg)$', re.IGNORECASE)
+BRACKETS_RE = re.compile(r'\[.*?\]|\(.*?\)|\{.*?\}')
+TRACK_NUMBER_RE = re.compile(r'^\d+\s*[-._]\s*')
+LEADING_NUMBER_RE = re.compile(r'^\d+\s+')
+MULTI_SPACE_RE = re.compile(r'\s{2,}')
+
+def parse_song_info(filename, file_size_bytes=0):
+    """Filename se song ki jaankari (artist, title, size) SongRecord mein nikalta hai."""
+    file_path = Path(filename)
+    file_format = file_path.suffix.lower().replace('.', '') if file_path.suffix else 'unknown'
+    size_mb = round(file_size_bytes / (1024 * 1024), 2) if file_size_bytes > 0 else 0
+
+    clean_name = AUDIO_EXTENSION_RE.sub('', filename)
+    clean_name = os.path.basename(clean_name)
+    clean_name = BRACKETS_RE.sub('', clean_name).strip()
+    clean_name = TRACK_NUMBER_RE.sub('', clean_name).strip()
+    clean_name = LEADING_NUMBER_RE.sub('', clean_name).strip()
+    clean_name = MULTI_SPACE_RE.sub(' ', clean_name).strip()
+
+    separators = [' - ', ' – ', ' — ', ' | ', ' by ']
+    for sep in separators:
+        if sep in clean_name:
+            parts = clean_name.split(sep, 1)
+            if len(parts) == 2:
+                part1, part2 = parts[0].strip(), parts[1].strip()
+                if not part1 or not part2: continue
+                song_title, artist = determine_artist_and_song(part1, part2)
+                return SongRecord(song_title=song_title, artist=artist, format=file_format, size_mb=size_mb, original_filename=os.path.basename(filename))
+    
+    return SongRecord(song_title=clean_name if clean_name else "Unknown Song", artist="Unknown Artist", format=file_format, size_mb=size_mb, original_filename=os.path.basename(filename))
+
+def parse_song_batch(entries):
+    """(message_id, filename, file_size) entries ki list ko song dicts mein badalta hai (process pool ke liye)."""
+    songs = []
+    for msg_id, filename, file_size in entries:
+        song_info = parse_song_info(filename, file_size)
+        song_info['message_id'] = msg_id
+        songs.append(song_info)
+    return songs
+
+# --- CROSS-SCRIPT & PHONETIC KEYS ---
+# Catalog mein Devanagari aur Roman dono titles hain, aur log "dil diyan gallan", "dil diya galla" ya
+# Hindi script, kuch bhi likhte hain. Isliye search ka har text fold_text se ek hi roop mein aata hai
+# (NFKC + Devanagari ka Hinglish jaisa transliteration + lowercase), aur SearchIndex har vocabulary
+# word ki phonetic_key bhi rakhta hai, taaki milti-julti awaaz wale words ek hash lookup se mil jaayein.
+
+DEVANAGARI_RE = re.compile(r'[\u0900-\u097F]+')
+DEVANAGARI_VOWELS = {'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ee', 'उ': 'u', 'ऊ': 'oo', 'ऋ': 'ri', 'ए': 'e', 'ऐ': 'ai',
+                     'ऑ': 'o', 'ओ': 'o', 'औ': 'au'}
+DEVANAGARI_MATRAS = {'ा': 'aa', 'ि': 'i', 'ी': 'ee', 'ु': 'u', 'ू': 'oo', 'ृ': 'ri', 'ॅ': 'e', 'े': 'e', 'ै': 'ai',
+                     'ॉ': 'o', 'ो': 'o', 'ौ': 'au'}
+DEVANAGARI_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n', 'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n', 'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm', 'य': 'y', 'र': 'r', 'ल': 'l', 'ळ': 'l', 'व': 'v',
+    'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h',
+}
+DEVANAGARI_NUKTA = {'क': 'q', 'ख': 'kh', 'ग': 'g', 'ज': 'z', 'ड': 'd', 'ढ': 'rh', 'फ': 'f'}    # क़ ख़ ग़ ज़ ड़ ढ़ फ़
+DEVANAGARI_SIGNS = {'ं': 'n', 'ँ': 'n', 'ः': 'h'}    # Anusvara, chandrabindu, visarga
+NUKTA, VIRAMA = '\u093c', '\u094d'
+WORD_END_VOWELS = {'aa': 'a', 'ee': 'i', 'oo': 'u'}  # Aakhri lambi vowel Hinglish mein chhoti likhi jaati hai: "sajna", "teri"
+
+def _render_devanagari_word(units):
+    """Ek word ke akshar ([consonant, vowel, inherent, sign, base]) ko schwa deletion ke saath Roman mein jodta hai."""
+    last = units[-1]
+    if len(units) > 1 and last[2] and not last[3]: last[1] = ''     # Aakhri 'a' bola nahi jaata: दिल -> dil
+    for i in range(1, len(units) - 1):
+        unit = units[i]
+        # V C(a) C V mein beech ka 'a' bhi gir jaata hai: धड़कन -> dhadkan, केसरिया -> kesriya
+        if unit[2] and not unit[3] and units[i - 1][1] and units[i + 1][0] and units[i + 1][1]: unit[1] = ''
+    if last[1] in WORD_END_VOWELS and not last[3]: last[1] = WORD_END_VOWELS[last[1]]
+    return "".join(unit[0] + unit[1] + unit[3] for unit in units)
+
+def transliterate_devanagari(text):
+    """Devanagari text ko Hinglish jaisi Roman spelling mein likhta hai: "दिल दियां गल्लां" -> "dil diyaan gallaan"."""
+    out, units = [], []
+    for char in text:
+        last = units[-1] if units else None
+        if char in DEVANAGARI_CONSONANTS: units.append([DEVANAGARI_CONSONANTS[char], 'a', True, '', char])
+        elif char in DEVANAGARI_MATRAS:
+            if last and last[2]: last[1], last[2] = DEVANAGARI_MATRAS[char], False
+            else: units.append(['', DEVANAGARI_MATRAS[char], False, '', ''])
+        elif char == VIRAMA:
+            if last: last[1], last[2] = '', False
+        elif char == NUKTA:
+            if last and last[4] in DEVANAGARI_NUKTA: last[0] = DEVANAGARI_NUKTA[last[4]]
+        elif char in DEVANAGARI_SIGNS:
+            if last: last[3] = DEVANAGARI_SIGNS[char]
+            else: units.append(['', '', False, DEVANAGARI_SIGNS[char], ''])
+        elif char in DEVANAGARI_VOWELS: units.append(['', DEVANAGARI_VOWELS[char], False, '', ''])
+        else:
+            # Danda, Devanagari digits, avagraha: word yahin khatam
+            if units: out.append(_render_devanagari_word(units)); units = []
+            if '०' <= char <= '९': out.append(str(ord(char) - ord('०')))
+            elif char in '।॥': out.append(' ')
+    if units: out.append(_render_devanagari_word(units))
+    return "".join(out)
+
+def fold_text(text):
+    """Search ke liye text ka ek roop: NFKC, Devanagari -> Latin, accents hata kar lowercase."""
+    if text.isascii(): return text.lower()
+    text = DEVANAGARI_RE.sub(lambda m: transliterate_devanagari(m.group()), unicodedata.normalize('NFKC', text))
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return text.lower()
+
+# Hinglish spellings ke fark: lambi/chhoti vowels (pyaar/pyar), doubled letters (gallan/galan), aspiration
+# (dhadkan/dadkan), z/j, w/v, q/k, ph/f, aakhri nasal (diyan/diya, hain/hai) aur beech ka 'a' (zindagi/zindgi).
+PHONETIC_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'[^a-z]', ''), (r'ph', 'f'), (r'chh|ch', 'c'), (r'sh', 's'), (r'ck|q', 'k'), (r'x', 'ks'), (r'z', 'j'),
+    (r'w', 'v'), (r'([kgjtdbr])h', r'\1'), (r'ee|ii|iy', 'i'), (r'oo|uu', 'u'), (r'ai|ei', 'e'), (r'au|ou', 'o'),
+    (r'(?<=[aeiou])[nh]$', ''), (r'(.)\1+', r'\1'), (r'(?<=.)a(?=.)', ''),
+)]
+
+@functools.lru_cache(maxsize=65536)
+def phonetic_key(word):
+    """Folded word ki sound-alike key ("gallan", "galla", "gallaan" -> "gla"); 2 letters se chhoti ho to ''."""
+    for pattern, replacement in PHONETIC_RULES: word = pattern.sub(replacement, word)
+    return word if len(word) >= 2 else ''
+
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+def normalize_words(text):
+    """Text ko fold karke (lowercase, Devanagari -> Latin) punctuation hatata hai aur words ki list deta hai."""
+    return PUNCTUATION_RE.sub('', fold_text(text)).split()
+
+def fuzzy_search(query, song_data):
+    """Song ke title aur artist mein search karta hai."""
+    query = fold_text(query).strip()
+    song_name = fold_text(song_data.get('song_title', ''))
+    artist_name = fold_text(song_data.get('artist', ''))
+
+    if query in song_name or query in artist_name: return True
+    
+    query_words = set(normalize_words(query))
+    all_song_words = set(normalize_words(song_name)).union(normalize_words(artist_name))
+    
+    if not query_words: return False
+    return len(query_words.intersection(all_song_words)) / len(query_words) >= MATCH_WORD_RATIO
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance nikalta hai; `max_distance` se zyada ho to max_distance + 1 deta hai."""
+    if abs(len(a) - len(b)) > max_distance: return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance: return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+def allowed_typos(word):
+    """Word ki length ke hisaab se kitni spelling galtiyan maaf hain."""
+    if len(word) <= 2: return 0
+    return 1 if len(word) <= 5 else 2
+
+
+# --- DUPLICATE UPLOADS ---
+def canonical_key(song):
+    """Ek hi gaane ki sab uploads ki common key: title/artist ke words ki phonetic keys + version + lambi file.
+
+    "Dil Diyan Gallan - Atif Aslam.mp3" aur "दिल दियां गल्लां - आतिफ असलम.m4a" dono "dil dia gla|atif aslm||"
+    dete hain, lekin "Dil Diyan Gallan (Lofi) - Atif Aslam.mp3" ki key mein "lofi" bhi hota hai.
+    """
+    title = " ".join(phonetic_key(word) or word for word in normalize_words(song.get('song_title', '')))
+    if not title: return None
+    artist = " ".join(phonetic_key(word) or word for word in normalize_words(song.get('artist', '')))
+    versions = " ".join(sorted(VERSION_WORDS.intersection(normalize_words(song.get('original_filename', '')))))
+    mp3_size = (song.get('size_mb') or 0) / FORMAT_SIZE_FACTOR.get(song.get('format'), 1.0)
+    return f"{title}|{artist}|{versions}|{'long' if mp3_size > LONG_UPLOAD_MB else ''}"
+
+def canonical_digest(key):
+    """Key ka stable 64-bit digest (Python ka hash() har process mein alag hota hai, snapshot mein nahi chalega)."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+def copy_rank(song):
+    """Group mein kaunsi copy dikhe: pasandida format, phir badi file (behtar bitrate), phir pehli upload."""
+    fmt = song.get('format')
+    preference = PREFERRED_FORMATS.index(fmt) if fmt in PREFERRED_FORMATS else len(PREFERRED_FORMATS)
+    return (preference, -(song.get('size_mb') or 0), song['message_id'])
+
+
+class SearchIndex:
+    """Songs ka in-memory inverted index (word -> message_ids), taaki /search poori list scan na kare.
+
+    `fuzzy_search` wali semantics hi follow karta hai: poori query title/artist ka substring ho,
+    ya query ke kam se kam 60% words song mein hon. Fark sirf itna hai ki candidates posting
+    lists se aate hain aur results rank hokar milte hain.
+
+    Jo query word catalog ki vocabulary mein nahi hai ("arjit", "hoo") use trigram index aur
+    edit distance se milte-julte words ("arijit", "ho") mein expand kiya jaata hai. Aise words
+    similarity ke hisaab se kam weight se count hote hain.
+
+    Titles/artists add hote waqt hi fold_text se folded hote hain (Devanagari titles Latin words
+    bante hain), aur har vocabulary word `sounds` (phonetic_key -> words) mein jaata hai. Query word
+    ke sound-alikes ("galla" -> "gallan", "gallaan") isi dict ke ek lookup se milte hain.
+
+    Ek hi gaane ki kai uploads (alag format/size) mein se sirf preferred copy (copy_rank) index
+    hoti hai; baaki `groups` mein uske peeche rehti hain aur SONG_DB se download ho sakti hain.
+    Group `keys` (canonical_key ka digest -> visible copy) ke ek lookup se milta hai, isliye ingest
+    par koi scan nahi hota. Key sirf song se banti hai aur visible copy hamesha group ka copy_rank
+    minimum hai, isliye grouping upload order par depend nahi karti.
+    """
+
+    def __init__(self, songs=()):
+        self.songs = {}         # message_id -> song dict
+        self.order = {}         # message_id -> insertion number (tie-break ke liye)
+        self.terms = {}         # message_id -> (words, pieces, title_lower, artist_lower)
+        self.postings = {}      # normalized word -> {message_id}
+        self.pieces = {}        # raw lowercase piece -> {message_id} (substring match ke liye)
+        self.piece_grams = {}   # piece ka trigram -> {piece}
+        self.word_grams = {}    # padded word ka trigram -> {word} (typo correction ke liye)
+        self.sounds = {}        # phonetic_key -> {word} (sound-alike / cross-script lookup)
+        self.keys = {}          # canonical digest -> visible message_id
+        self.groups = {}        # visible message_id -> [hidden duplicate songs]
+        self.canonical = {}     # hidden message_id -> visible message_id
+        self._next_order = 0
+        for song in songs: self.add(song)
+
+    def __len__(self):
+        return len(self.songs)
+
+    @staticmethod
+    def _trigrams(piece):
+        return {piece[i:i + 3] for i in range(len(piece) - 2)}
+
+    @classmethod
+    def _word_trigrams(cls, word):
+        return cls._trigrams(f" {word} ")
+
+    def _index(self, song, order=None):
+        """Song ke words/pieces postings mein daalta hai (song pehle se index mein nahi hona chahiye)."""
+        msg_id = song['message_id']
+        if order is None:
+            order = self._next_order
+            self._next_order += 1
+
+        title_lower = fold_text(song.get('song_title', ''))
+        artist_lower = sys.intern(fold_text(song.get('artist', '')))
+        # Tuples (sets nahi) aur interned strings: lakhon songs par har set ka hash table bhari padta hai,
+        # aur words/pieces wahi objects rehte hain jo postings ki keys hain.
+        words = tuple(map(sys.intern, set(normalize_words(title_lower)).union(normalize_words(artist_lower))))
+        pieces = tuple(map(sys.intern, set(title_lower.split()).union(artist_lower.split())))
+
+        self.songs[msg_id] = song
+        self.order[msg_id] = order
+        self.terms[msg_id] = (words, pieces, title_lower, artist_lower)
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                for gram in self._word_trigrams(word): self.word_grams.setdefault(gram, set()).add(word)
+                key = phonetic_key(word)
+                if key: self.sounds.setdefault(key, set()).add(word)
+            self.postings[word].add(msg_id)
+        for piece in pieces:
+            if piece not in self.pieces:
+                self.pieces[piece] = set()
+                for gram in self._trigrams(piece): self.piece_grams.setdefault(gram, set()).add(piece)
+            self.pieces[piece].add(msg_id)
+
+    def _unindex(self, msg_id):
+        """Song ke words/pieces postings se nikalta hai."""
+        terms = self.terms.pop(msg_id, None)
+        if terms is None: return
+        self.songs.pop(msg_id, None)
+        self.order.pop(msg_id, None)
+        words, pieces, _, _ = terms
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None: continue
+            ids.discard(msg_id)
+            if not ids:
+                del self.postings[word]
+                for gram in self._word_trigrams(word):
+                    grams = self.word_grams.get(gram)
+                    if grams is not None:
+                        grams.discard(word)
+                        if not grams: del self.word_grams[gram]
+                key = phonetic_key(word)
+                sounds = self.sounds.get(key)
+                if sounds is not None:
+                    sounds.discard(word)
+                    if not sounds: del self.sounds[key]
+        for piece in pieces:
+            ids = self.pieces.get(piece)
+            if ids is None: continue
+            ids.discard(msg_id)
+            if not ids:
+                del self.pieces[piece]
+                for gram in self._trigrams(piece):
+                    grams = self.piece_grams.get(gram)
+                    if grams is not None:
+                        grams.discard(piece)
+                        if not grams: del self.piece_grams[gram]
+
+    def add(self, song):
+        """Song ko index (ya uske duplicate group) mein daalta hai; same message_id pehle se ho to replace karta hai.
+
+        Jin songs ki visibility badli unka {message_id: song (ab dikhta hai) ya None (ab chhupa hai)}
+        deta hai, taaki PrefixIndex bhi wahi songs rakhe.
+        """
+        msg_id = song.get('message_id')
+        if msg_id is None: return {}
+        order = self.order.get(msg_id)
+        changes = self.remove(msg_id)
+        key = canonical_key(song)
+        digest = canonical_digest(key) if key else None
+        match = self.keys.get(digest)    # 64-bit digest: 1M songs par bhi collision ka chance ~1e-8
+        if match is None:
+            self._index(song, order)
+            if key: self.keys[digest] = msg_id
+            changes[msg_id] = song
+        elif copy_rank(song) < copy_rank(self.songs[match]):
+            # Nayi copy behtar hai: purani visible copy apne group samet iske peeche chali jaati hai.
+            copies = self.groups.pop(match, []) + [self.songs[match]]
+            group_order = self.order[match]
+            self._unindex(match)
+            self._index(song, group_order)
+            self.groups[msg_id] = copies
+            for copy in copies: self.canonical[copy['message_id']] = msg_id
+            self.keys[digest] = msg_id
+            changes[match], changes[msg_id] = None, song
+        else:
+            self.groups.setdefault(match, []).append(song)
+            self.canonical[msg_id] = match
+            changes[msg_id] = None
+        return changes
+
+    def remove(self, msg_id):
+        """Song ko index ya uske group se nikalta hai; visible copy hati to group ki agli behtar copy dikhti hai."""
+        visible_id = self.canonical.pop(msg_id, None)
+        if visible_id is not None:
+            copies = [copy for copy in self.groups.pop(visible_id) if copy['message_id'] != msg_id]
+            if copies: self.groups[visible_id] = copies
+            return {}
+        song = self.songs.get(msg_id)
+        if song is None: return {}
+        order = self.order[msg_id]
+        self._unindex(msg_id)
+        changes = {msg_id: None}
+        key = canonical_key(song)
+        digest = canonical_digest(key) if key else None
+        copies = self.groups.pop(msg_id, None)
+        if copies:
+            best = min(copies, key=copy_rank)
+            copies.remove(best)
+            del self.canonical[best['message_id']]
+            self._index(best, order)
+            if copies: self.groups[best['message_id']] = copies
+            for copy in copies: self.canonical[copy['message_id']] = best['message_id']
+            self.keys[digest] = best['message_id']
+            changes[best['message_id']] = best
+        elif self.keys.get(digest) == msg_id:
+            del self.keys[digest]
+        return changes
+
+    def _pieces_matching(self, fragment, test):
+        """Vocabulary ke woh pieces deta hai jin par `test(piece)` sahi ho (trigrams se shortlist karke)."""
+        if len(fragment) < 3: return [p for p in self.pieces if test(p)]
+        shortlist = None
+        for gram in sorted(self._trigrams(fragment), key=lambda g: len(self.piece_grams.get(g, ()))):
+            grams = self.piece_grams.get(gram)
+            if not grams: return []
+            shortlist = set(grams) if shortlist is None else shortlist & grams
+            if not shortlist: return []
+        return [p for p in shortlist if test(p)]
+
+    def _substring_candidates(self, query):
+        """Un songs ke ids jinke title/artist mein poori query substring ho sakti hai."""
+        parts = query.split()
+        if not parts: return set(self.songs)
+        if len(parts) == 1:
+            matched = self._pieces_matching(parts[0], lambda p: parts[0] in p)
+        elif len(parts) > 2:
+            # Beech wale parts poore pieces hone chahiye, unme se sabse chhoti posting list lo.
+            inner = min(parts[1:-1], key=lambda p: len(self.pieces.get(p, ())))
+            matched = [inner] if inner in self.pieces else []
+        elif len(parts[0]) >= len(parts[1]):
+            matched = self._pieces_matching(parts[0], lambda p: p.endswith(parts[0]))
+        else:
+            matched = self._pieces_matching(parts[1], lambda p: p.startswith(parts[1]))
+        candidates = set()
+        for piece in matched: candidates.update(self.pieces[piece])
+        return candidates
+
+    def similar_words(self, word, limit=5):
+        """Vocabulary ke `word` se milte-julte words (word, similarity) best-first deta hai."""
+        max_edits = allowed_typos(word)
+        if not max_edits: return []
+        grams = sorted(self._word_trigrams(word), key=lambda g: len(self.word_grams.get(g, ())))
+        # q-gram lemma: har edit zyada se zyada 3 trigrams todta hai, isliye match ke kam se kam
+        # `len(grams) - 3 * max_edits` trigrams common honge. Woh sabse chhoti lists mein zaroor milega.
+        needed = max(1, len(grams) - 3 * max_edits)
+        shortlist = set()
+        for gram in grams[:len(grams) - needed + 1]: shortlist.update(self.word_grams.get(gram, ()))
+        matches = []
+        for candidate in shortlist:
+            distance = edit_distance(word, candidate, max_edits)
+            if distance <= max_edits:
+                matches.append((candidate, 1 - distance / max(len(word), len(candidate))))
+        matches.sort(key=lambda m: (-m[1], m[0]))
+        return matches[:limit]
+
+    def sound_alikes(self, word):
+        """Vocabulary ke woh words jinki phonetic key `word` jaisi hai (sabse kam edits wale pehle)."""
+        key = phonetic_key(word)
+        alikes = [w for w in self.sounds.get(key, ()) if w != word] if key else []
+        if len(alikes) > PHONETIC_EXPANSIONS:
+            alikes = heapq.nsmallest(PHONETIC_EXPANSIONS, alikes, key=lambda w: (edit_distance(word, w, len(word)), w))
+        return alikes
+
+    def expand_word(self, word):
+        """Query word ko vocabulary words (word, weight) mein badalta hai: khud, sound-alikes, phir typo-matches."""
+        alikes = [(w, PHONETIC_MATCH_WEIGHT) for w in self.sound_alikes(word)]
+        if word in self.postings: return [(word, 1.0)] + alikes
+        best = dict(self.similar_words(word))
+        for w, weight in alikes: best[w] = max(weight, best.get(w, 0))
+        return sorted(best.items(), key=lambda m: (-m[1], m[0]))
+
+    def _overlap_scores(self, query_words, used_words=None):
+        """Un songs ka weighted word-coverage deta hai jinme query ke kam se kam 60% words (ya unke typo-matches) hon."""
+        needed = math.ceil(len(query_words) * MATCH_WORD_RATIO - 1e-9)
+        expanded = [self.expand_word(word) for word in query_words]
+        if used_words is not None: used_words.update(w for expansion in expanded for w, _ in expansion)
+        expansions = sorted(
+            ([(self.postings[w], weight) for w, weight in expansion] for expansion in expanded),
+            key=lambda exp: sum(len(ids) for ids, _ in exp)
+        )
+        # Pigeonhole: har weight <= 1 hai, isliye match sabse chhoti (n - needed + 1) lists mein se kisi mein hoga.
+        candidates = set()
+        for expansion in expansions[:len(expansions) - needed + 1]:
+            for ids, _ in expansion: candidates.update(ids)
+        # Set intersections C mein chalte hain; Python loop sirf asli hits par chalta hai.
+        exact_hits, fuzzy_totals = Counter(), {}
+        for expansion in expansions:
+            credited = set()
+            for ids, weight in expansion:   # expand_word best-first deta hai: har word ka best weight hi gine
+                hits = candidates.intersection(ids)
+                if weight == 1.0 and len(expansion) == 1:
+                    exact_hits.update(hits)
+                    continue
+                hits -= credited
+                credited |= hits
+                for msg_id in hits: fuzzy_totals[msg_id] = fuzzy_totals.get(msg_id, 0) + weight
+        coverage = {}
+        for msg_id in exact_hits.keys() | fuzzy_totals.keys():
+            total = exact_hits.get(msg_id, 0) + fuzzy_totals.get(msg_id, 0)
+            if total / len(query_words) >= MATCH_WORD_RATIO:
+                coverage[msg_id] = total / len(query_words)
+        return coverage
+
+    def search(self, query, limit=None, used_words=None):
+        """Query se match hone wale songs ko best-first order mein deta hai.
+
+        `used_words` set diya ho to usme woh vocabulary words bhar diye jaate hain jinse match
+        hua (typo corrections aur sound-alikes samet); result cache inhi se invalidate hota hai.
+        """
+        started = time.perf_counter()
+        query = fold_text(query).strip()
+        query_words = set(normalize_words(query))
+
+        scores = {}
+        for msg_id in self._substring_candidates(query):
+            _, _, title_lower, artist_lower = self.terms[msg_id]
+            if query in title_lower: scores[msg_id] = 3 if query == title_lower else 2
+            elif query in artist_lower: scores[msg_id] = 1
+        coverage = self._overlap_scores(query_words, used_words) if query_words else {}
+        for msg_id in coverage: scores.setdefault(msg_id, 0)
+        METRICS.observe("search_candidates", len(scores), buckets=COUNT_BUCKETS)
+        if not scores:
+            METRICS.observe("search_seconds", time.perf_counter() - started)
+            return []
+
+        def rank(msg_id):
+            words = self.terms[msg_id][0]
+            matched = coverage.get(msg_id, 0) * len(query_words)
+            precision = matched / len(words) if words else 0
+            return (scores[msg_id], coverage.get(msg_id, 0), precision, -self.order[msg_id])
+
+        if limit is None: best = sorted(scores, key=rank, reverse=True)
+        else: best = heapq.nlargest(limit, scores, key=rank)
+        METRICS.observe("search_seconds", time.perf_counter() - started)
+        return [self.songs[msg_id] for msg_id in best]
+
+
+SEARCH_INDEX = SearchIndex(SONG_DB)
+
+
+class SearchCache:
+    """Normalized query -> ranked message_ids ka bounded LRU + TTL cache.
+
+    Har entry un words par depend karti hai jinse uska result bana (query words aur unke typo
+    corrections). Naya/updated song aane par sirf wahi entries hatti hain jinke words song ke
+    words (ya unke prefixes, jaise "arij" -> "arijit") ya phonetic keys (`sound_dependency`) se
+    milte hain. Baaki rare cases (word ke beech ka substring) TTL se expire ho jaate hain.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl_seconds=SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()    # key -> (expires_at, [message_id], dependency words)
+        self.word_keys = {}             # word -> {key}
+        self.hits = self.misses = self.invalidations = self.evictions = 0
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(normalize_words(query))
+
+    @staticmethod
+    def sound_dependency(word):
+        """Word ki phonetic key ka dependency marker: naya sound-alike word aane par bhi entry hat-ti hai."""
+        key = phonetic_key(word)
+        return f"~{key}" if key else None
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None: self._drop(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, msg_ids, words):
+        if key in self.entries: self._drop(key)
+        self.entries[key] = (time.monotonic() + self.ttl, msg_ids, words)
+        for word in words: self.word_keys.setdefault(word, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, words = self.entries.pop(key)
+        for word in words:
+            keys = self.word_keys.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys: del self.word_keys[word]
+
+    def invalidate_song(self, song):
+        """Song ke words (aur unke prefixes) se judi cached queries hata deta hai."""
+        if not self.entries: return
+        words = set(normalize_words(song.get('song_title', ''))).union(normalize_words(song.get('artist', '')))
+        stale = set()
+        for word in words:
+            for end in range(1, len(word) + 1):
+                stale.update(self.word_keys.get(word[:end], ()))
+            stale.update(self.word_keys.get(self.sound_dependency(word), ()))
+        for key in stale:
+            if key in self.entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.word_keys.clear()
+
+
+SEARCH_CACHE = SearchCache()
+
+def cached_search(query, limit=SEARCH_RESULT_LIMIT):
+    """SEARCH_CACHE se ranked results deta hai; miss par index se search karke cache karta hai.
+
+    Cache entry hamesha poore SEARCH_RESULT_LIMIT ki hoti hai aur `limit` sirf lautate waqt lagta hai,
+    taaki inline ki chhoti query ke baad wahi /search poore results dikhaye.
+    """
+    key = SEARCH_CACHE.normalize(query)
+    if not key: return SEARCH_INDEX.search(query, limit=limit)
+    msg_ids = SEARCH_CACHE.get(key)
+    if msg_ids is None:
+        used_words = set(key.split())
+        used_words.update(filter(None, map(SEARCH_CACHE.sound_dependency, key.split())))
+        msg_ids = [song['message_id'] for song in
+                   SEARCH_INDEX.search(key, limit=max(limit, SEARCH_RESULT_LIMIT), used_words=used_words)]
+        SEARCH_CACHE.put(key, msg_ids, used_words)
+    return [song for song in (SONG_DB.get(msg_id) for msg_id in msg_ids[:limit]) if song is not None]
+
+
+class PrefixIndex:
+    """Inline autocomplete ke liye normalized titles/artists ka sorted-array prefix index.
+
+    Har song ki keys ("title" aur "artist title") `(key, message_id)` tuples ki sorted list
+    mein rehti hain; prefix lookup ek bisect + chhota scan hai. Naye songs pehle `pending` mein
+    jaate hain aur agli query par ek saath merge hote hain, taaki bulk uploads mein har song par
+    poori list shift na ho. Update/remove hue songs ki purani keys query ke time `current` se
+    check hoti hain aur agle merge mein saaf ho jaati hain.
+    """
+
+    def __init__(self, songs=()):
+        self.entries = []       # sorted [(key, message_id)]
+        self.pending = []       # abhi merge nahi hue (key, message_id)
+        self.current = {}       # message_id -> us song ki keys ka tuple
+        self.stale = 0
+        for song in songs: self.add(song)
+
+    @staticmethod
+    def keys_for(song):
+        title = " ".join(normalize_words(song.get('song_title', '')))
+        artist = " ".join(normalize_words(song.get('artist', '')))
+        return tuple(key for key in dict.fromkeys((title, f"{artist} {title}".strip())) if key)
+
+    def add(self, song):
+        msg_id = song['message_id']
+        keys = self.keys_for(song)
+        old = self.current.get(msg_id)
+        if old == keys: return
+        if old: self.stale += len(old)
+        self.current[msg_id] = keys
+        self.pending.extend((key, msg_id) for key in keys)
+
+    def remove(self, msg_id):
+        old = self.current.pop(msg_id, None)
+        if old: self.stale += len(old)
+
+    def _merge(self):
+        if self.stale:
+            live = [entry for entry in self.entries if entry[0] in self.current.get(entry[1], ())]
+            self.stale = 0
+        else:
+            live = self.entries
+        live.extend(entry for entry in self.pending if entry[0] in self.current.get(entry[1], ()))
+        live.sort()     # Timsort: pehle se sorted list + chhota tail, lagbhag linear
+        self.entries, self.pending = live, []
+
+    def search(self, query, limit, offset=0):
+        """Jin songs ki koi key `query` (normalized) se shuru hoti hai, unke message_ids (paged)."""
+        prefix = " ".join(normalize_words(query))
+        if not prefix: return []
+        if self.pending or self.stale > len(self.entries) // 4: self._merge()
+        found, seen = [], set()
+        for i in range(bisect.bisect_left(self.entries, (prefix,)), len(self.entries)):
+            key, msg_id = self.entries[i]
+            if not key.startswith(prefix): break
+            if msg_id in seen or key not in self.current.get(msg_id, ()): continue
+            seen.add(msg_id)
+            if len(seen) > offset: found.append(msg_id)
+            if len(found) >= limit: break
+        return found
+
+    def __len__(self):
+        return len(self.current)
+
+
+PREFIX_INDEX = PrefixIndex(SONG_DB)
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """Snapshot ki classes (SongRecord, SearchIndex, ...) isi module se leta hai, chahe file `python Player.py`
+    (`__main__`) ne likhi ho ya `import Player` wale script ne; warna pickle Player.py ko dobara import karta."""
+
+    def find_class(self, module, name):
+        if module in ('__main__', '__mp_main__', 'Player'): return getattr(sys.modules[__name__], name)
+        return super().find_class(module, name)
+
+
+class CatalogSnapshot:
+    """Catalog, SearchIndex aur PrefixIndex ka binary (pickle) snapshot, taaki restart par index dobara na bane.
+
+    File pickle frames ka sequence hai: pehle header (format + catalog version), phir har object
+    ke attributes, jinme bade dicts/lists CATALOG_SNAPSHOT_CHUNK items ke frames mein bante hain.
+    Saare frames ek hi Pickler/Unpickler memo share karte hain, isliye catalog aur index mein
+    shared song dicts load ke baad bhi ek hi object rehte hain.
+    Load mmap se hota hai aur har frame ek chhota `pickle.load` hai, isliye background thread mein
+    load karte waqt bhi event loop ko GIL milta rehta hai. Snapshot sirf tab maana jaata hai jab
+    uska version storage ke `catalog_version()` se mile; warna catalog SQLite se dobara banta hai.
+    Yeh file bot khud likhta hai aur sirf wahi padhta hai (pickle bahar se aayi file ke liye nahi hai).
+    """
+
+    FORMAT = 4
+    PARTS = ('catalog', 'search_index', 'prefix_index')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.version = None     # Disk wale snapshot ka catalog version
+
+    def _frames(self, version, objects):
+        yield {'format': self.FORMAT, 'version': version}
+        names = {id(obj): name for name, obj in objects.items()}
+        for name, obj in objects.items():
+            yield ('object', name, type(obj))
+            for attr, value in vars(obj).items():
+                if id(value) in names:
+                    yield ('ref', name, attr, names[id(value)])
+                elif isinstance(value, dict) and len(value) > CATALOG_SNAPSHOT_CHUNK:
+                    items = list(value.items())
+                    yield ('attr', name, attr, {})
+                    for start in range(0, len(items), CATALOG_SNAPSHOT_CHUNK):
+                        yield ('dict', name, attr, dict(items[start:start + CATALOG_SNAPSHOT_CHUNK]))
+                elif isinstance(value, list) and len(value) > CATALOG_SNAPSHOT_CHUNK:
+                    yield ('attr', name, attr, [])
+                    for start in range(0, len(value), CATALOG_SNAPSHOT_CHUNK):
+                        yield ('list', name, attr, value[start:start + CATALOG_SNAPSHOT_CHUNK])
+                else:
+                    yield ('attr', name, attr, value)
+
+    def save(self, version, catalog, search_index, prefix_index):
+        """Snapshot likhta hai. Objects is dauraan badalne nahi chahiye (loop par ya unshared objects par chalao)."""
+        objects = dict(zip(self.PARTS, (catalog, search_index, prefix_index)))
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)    # Ek memo: shared song dicts ek hi baar
+        for frame in self._frames(version, objects): pickler.dump(frame)
+        write_file_atomic(self.filename, buffer.getvalue())
+        self.version = version
+
+    def _read(self, version):
+        """Snapshot padh kar (catalog, search_index, prefix_index) deta hai; version na mile to None."""
+        with open(self.filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            unpickler = SnapshotUnpickler(data)
+            header = unpickler.load()
+            if header.get('format') != self.FORMAT or header.get('version') != version: return None
+            objects, refs = {}, []
+            while data.tell() < len(data):
+                kind, name, *rest = unpickler.load()
+                if kind == 'object': objects[name] = rest[0].__new__(rest[0])
+                elif kind == 'ref': refs.append((name, *rest))
+                elif kind == 'attr': setattr(objects[name], rest[0], rest[1])
+                elif kind == 'dict': getattr(objects[name], rest[0]).update(rest[1])
+                elif kind == 'list': getattr(objects[name], rest[0]).extend(rest[1])
+            for name, attr, target in refs: setattr(objects[name], attr, objects[target])
+        return tuple(objects[name] for name in self.PARTS)
+
+    def load(self, storage):
+        """Snapshot (ya stale/missing hone par storage) se catalog aur dono indexes banata hai.
+
+        Version catalog padhne se pehle liya jaata hai: beech mein import ho to catalog naya aur label
+        purana rehta hai, jo agle write par stale pakda jaata hai (ulta nahi).
+        """
+        version = storage.catalog_version()
+        storage.catalog_applied = version
+        if version is not None:
+            try:
+                started = time.perf_counter()
+                loaded = self._read(version)
+                if loaded is not None:
+                    self.version = version
+                    logger.info(f"⚡ Catalog snapshot loaded: {len(loaded[0])} songs in {time.perf_counter() - started:.2f}s.")
+                    return loaded
+                logger.info("Catalog snapshot is out of date, rebuilding the search index.")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Catalog snapshot {self.filename} could not be read ({e}), rebuilding.")
+        started = time.perf_counter()
+        catalog = storage.load_catalog()
+        search_index = SearchIndex(catalog)
+        prefix_index = PrefixIndex(search_index.songs.values())
+        logger.info(f"Catalog index built: {len(catalog)} songs ({len(catalog) - len(search_index)} duplicate uploads "
+                    f"grouped) in {time.perf_counter() - started:.2f}s.")
+        if version is not None: self.save(version, catalog, search_index, prefix_index)
+        return catalog, search_index, prefix_index
+
+
+CATALOG_SNAPSHOT = CatalogSnapshot(CATALOG_SNAPSHOT_FILE)
+CATALOG_READY = asyncio.Event()
+
+def install_catalog(catalog, search_index, prefix_index):
+    """Load hua catalog aur indexes globals mein lagata hai."""
+    global SONG_DB, SEARCH_INDEX, PREFIX_INDEX
+    SONG_DB, SEARCH_INDEX, PREFIX_INDEX = catalog, search_index, prefix_index
+    SEARCH_CACHE.clear()
+    CATALOG_READY.set()
+
+def load_catalog_now():
+    """Scripts (import CLI) ke liye: catalog turant, isi thread mein load karta hai."""
+    if not CATALOG_READY.is_set(): install_catalog(*CATALOG_SNAPSHOT.load(STORAGE))
+
+async def load_catalog_in_background():
+    """Bot ke jawab dena shuru karne ke baad catalog thread mein load karta hai."""
+    gc.disable()    # Lakhon naye objects par baar-baar GC pass load ko kai guna dheema kar deta hai
+    try:
+        loaded = await asyncio.to_thread(CATALOG_SNAPSHOT.load, STORAGE)
+    finally:
+        gc.enable()
+    gc.freeze()     # Catalog lamba jeeta hai; aage ke GC passes use scan na karein
+    install_catalog(*loaded)
+
+async def catalog_ready():
+    """Catalog par depend karne wale handlers isse await karte hain (startup ke pehle kuch pal)."""
+    if not CATALOG_READY.is_set(): await CATALOG_READY.wait()
+
+def save_catalog_snapshot():
+    """Shutdown par: catalog badla ho aur sab kuch flush ho chuka ho to naya snapshot likhta hai (sirf shard 0).
+
+    Snapshot us version ke naam se likhta hai jo in-memory catalog ne khud load/likha hai. Storage us se
+    aage nikal gaya ho (doosre process ka import) to catalog purana hai: snapshot nahi likhte, agla
+    startup SQLite se index banata hai.
+    """
+    if SHARD_INDEX or not CATALOG_READY.is_set() or PERSISTENCE.pending or PERSISTENCE.unwritten: return
+    version = STORAGE.catalog_applied
+    if version is None or version == CATALOG_SNAPSHOT.version: return
+    if version != STORAGE.catalog_version():
+        logger.info("Catalog changed in another process, not writing a stale snapshot."); return
+    CATALOG_SNAPSHOT.save(version, SONG_DB, SEARCH_INDEX, PREFIX_INDEX)
+    logger.info(f"⚡ Catalog snapshot written ({len(SONG_DB)} songs).")
+
+
+# ==============================================================================
+# ==== SECTION 4: CORE BOT HANDLERS & USER DATA ====
+# ==============================================================================
+
+def get_user_data(user_id, username=None):
+    """User ka data laata hai ya naya banata hai."""
+    user_id = str(user_id)
+    if user_id not in USERS_DB:
+        USERS_DB[user_id] = {
+            'points': 0, 'join_date': datetime.now().isoformat(),
+            'username': username, 'total_downloaded': 0, 'total_purchased': 0, 'total_spent': 0.0,
+        }
+        if username: USERNAME_MAP[username.lower()] = user_id
+        if user_id in LEDGER.balances: USERS_DB[user_id]['points'] = LEDGER.balances[user_id]
+        else: change_points(user_id, FREE_POINTS_ON_START, 'signup')
+        STORAGE.save_user(user_id)
+        STATS.record('signup')
+    return USERS_DB[user_id]
+
+def change_points(user_id, delta, reason, ref=None):
+    """Points ledger mein credit/debit likh kar user ka balance update karta hai."""
+    user_id = str(user_id)
+    user_data = get_user_data(user_id)
+    user_data['points'] = LEDGER.record(user_id, delta, reason, ref)
+    STORAGE.save_user(user_id)
+    return user_data['points']
+
+def update_user_data(user_id, **kwargs):
+    """User ke data ko update karta hai."""
+    user_id = str(user_id)
+    user_data = get_user_data(user_id)
+    user_data.update(kwargs)
+    if 'username' in kwargs and kwargs['username']: USERNAME_MAP[kwargs['username'].lower()] = user_id
+    STORAGE.save_user(user_id)
+
+@shard_call
+def mark_user_blocked(user_id):
+    """User ne bot block kar diya: record par flag lagata hai (owner shard par)."""
+    if not owns_user(user_id):
+        notify_shard(user_shard(user_id), 'mark_user_blocked', user_id); return
+    user_data = USERS_DB.get(str(user_id))
+    if user_data is not None and not user_data.get('blocked'):
+        user_data['blocked'] = True
+        STORAGE.save_user(user_id)
+
+
+# --- ATOMIC ACCOUNT OPERATIONS ---
+# Updates ek saath (concurrent_updates) process hote hain, isliye balance padh kar, `await` karke,
+# phir likhne wala koi bhi kaam user ke lock ke andar hona chahiye. Lock shards mein bante hain
+# taaki lakhon users ke liye lakhon Lock objects na banen.
+USER_LOCKS = [asyncio.Lock() for _ in range(USER_LOCK_SHARDS)]
+RESERVED_POINTS = {}    # user_id -> points jo abhi kisi chalti download ke liye rok kar rakhe hain
+
+def user_lock(user_id):
+    """User ke shard ka asyncio lock deta hai."""
+    return USER_LOCKS[int(user_id) % USER_LOCK_SHARDS]
+
+def available_points(user_id):
+    """Balance mein se reserved points ghata kar kharch karne layak points deta hai."""
+    return get_user_data(user_id)['points'] - RESERVED_POINTS.get(str(user_id), 0)
+
+
+class PointsReservation:
+    """Kharch se pehle roke gaye points: kaam hone par commit(), fail hone par rollback()."""
+
+    def __init__(self, user_id, amount, reason, ref=None):
+        self.user_id = str(user_id)
+        self.amount = amount
+        self.reason = reason
+        self.ref = ref
+        self.open = True
+
+    def _release(self):
+        self.open = False
+        left = RESERVED_POINTS.get(self.user_id, 0) - self.amount
+        if left > 0: RESERVED_POINTS[self.user_id] = left
+        else: RESERVED_POINTS.pop(self.user_id, None)
+
+    async def commit(self):
+        """Reserved points ko ledger mein debit karta hai aur naya balance deta hai."""
+        if not self.open: raise RuntimeError("Reservation already closed")
+        async with user_lock(self.user_id):
+            self._release()
+            new_balance = change_points(self.user_id, -self.amount, self.reason, self.ref)
+        await LEDGER.sync()     # fsync lock ke bahar: doosre updates is user ka lock nahi ruk-te
+        return new_balance
+
+    async def rollback(self):
+        """Reserved points wapas available kar deta hai."""
+        if not self.open: return
+        async with user_lock(self.user_id):
+            self._release()
+
+async def reserve_points(user_id, amount, reason, ref=None):
+    """Points kaafi hon to unhe reserve karke PointsReservation deta hai, warna None."""
+    async with user_lock(user_id):
+        if available_points(user_id) < amount: return None
+        RESERVED_POINTS[str(user_id)] = RESERVED_POINTS.get(str(user_id), 0) + amount
+        return PointsReservation(user_id, amount, reason, ref)
+
+def song_from_channel_post(update):
+    """Channel post se SongRecord banata hai; audio/document na ho to None."""
+    if not (update.channel_post and update.channel_post.chat.id == CHANNEL_ID): return None
+    message = update.channel_post
+    audio = message.audio or message.document
+    if not audio or not audio.file_name: return None
+    song_info = parse_song_info(audio.file_name, audio.file_size or 0)
+    song_info['message_id'] = message.message_id
+    return song_info
+
+def index_song(song_info):
+    """Song ko in-memory catalog, indexes aur search cache mein lagata hai; naya tha to True."""
+    previous = SONG_DB.get(song_info['message_id'])
+    if previous is not None: SEARCH_CACHE.invalidate_song(previous)
+    SEARCH_CACHE.invalidate_song(song_info)
+    is_new = SONG_DB.upsert(song_info)
+    for msg_id, song in SEARCH_INDEX.add(song_info).items():    # Duplicate group ki sirf preferred copy dikhti hai
+        if song is None: PREFIX_INDEX.remove(msg_id)
+        else: PREFIX_INDEX.add(song)
+    return is_new
+
+async def save_song(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Channel mein upload kiye gaye gaano ko database mein save karta hai."""
+    song_info = song_from_channel_post(update)
+    if song_info is None: return
+    await catalog_ready()
+    msg_id = song_info['message_id']
+
+    if index_song(song_info):
+        logger.info(f"✅ Saved: {song_info['artist']} - {song_info['song_title']}")
+    else:
+        logger.info(f"🔄 Updated: {song_info['artist']} - {song_info['song_title']}")
+    STORAGE.save_song(song_info)
+
+    # Is gaane ka intezaar kar rahe users ko batao
+    for label, user_ids in fulfil_missing_requests(MISSING_REQUESTS.matching(song_info)):
+        logger.info(f"📬 Request '{label}' fulfilled by upload {msg_id}, notifying {len(user_ids)} user(s).")
+        REQUEST_NOTIFIER.enqueue(label, user_ids)
+
+class MissingRequests:
+    """Pending song requests ka live aggregate: normalized key par counter aur near-duplicate clusters.
+
+    `MISSING_DB['requests']` hi durable list hai; yeh class startup par usse ek baar banti hai aur
+    phir har request/upload par incrementally update hoti hai. Ek cluster ek gaane ki saari
+    requests hai: same words (kisi bhi order mein) ya har word mein chhoti spelling galtiyan
+    ("tum hi ho" / "ho tum hi" / "tum hi hoo") ek hi cluster mein jaati hain. Cluster ka label pehli request ka text hai.
+    """
+
+    def __init__(self, requests=()):
+        self.clusters = {}      # cluster_id -> {'key', 'label', 'words', 'keys', 'requests': [request]}
+        self.keys = {}          # normalized key -> cluster_id
+        self.postings = {}      # word ke pehle 3 letters -> {cluster_id} (typo ke baad bhi milta hai)
+        self.next_id = 0
+        self._top = None        # Count ke hisaab se sorted cluster_ids (change hone par None)
+        for request in requests: self.add(request)
+
+    @staticmethod
+    def normalize(song_name):
+        return " ".join(sorted(normalize_words(song_name)))
+
+    @staticmethod
+    def _same_song(words, other):
+        """Dono (sorted) word lists ke har word mein search jitni hi spelling galtiyan (allowed_typos) hon."""
+        if len(words) != len(other): return False
+        return all(a == b or edit_distance(a, b, allowed_typos(a)) <= allowed_typos(a) for a, b in zip(words, other))
+
+    def _find_cluster(self, key, words):
+        cluster_id = self.keys.get(key)
+        if cluster_id is not None: return cluster_id
+        # Chhoti posting lists pehle; zyada se zyada MISSING_CLUSTER_CANDIDATES clusters compare hote hain.
+        lists = sorted((self.postings[p] for p in {word[:3] for word in words} if p in self.postings), key=len)
+        sorted_words = key.split()
+        checked = set()
+        for candidates in lists:
+            for candidate in candidates:
+                if candidate in checked: continue
+                if self._same_song(sorted_words, self.clusters[candidate]['key'].split()): return candidate
+                checked.add(candidate)
+                if len(checked) >= MISSING_CLUSTER_CANDIDATES: return None
+        return None
+
+    def add(self, request):
+        """Request ko uske cluster mein jodta hai; cluster_id deta hai."""
+        words = set(normalize_words(request.get('song_name', '')))
+        if not words: return None
+        key = " ".join(sorted(words))
+        cluster_id = self._find_cluster(key, words)
+        if cluster_id is None:
+            cluster_id, self.next_id = self.next_id, self.next_id + 1
+            self.clusters[cluster_id] = {'key': key, 'label': request['song_name'].strip(), 'words': words,
+                                         'keys': set(), 'requests': []}
+            for prefix in {word[:3] for word in words}: self.postings.setdefault(prefix, set()).add(cluster_id)
+        cluster = self.clusters[cluster_id]
+        if key not in self.keys:
+            self.keys[key] = cluster_id
+            cluster['keys'].add(key)
+        cluster['requests'].append(request)
+        self._top = None
+        return cluster_id
+
+    def pop(self, cluster_id):
+        """Cluster hata kar uski requests deta hai."""
+        cluster = self.clusters.pop(cluster_id)
+        for prefix in {word[:3] for word in cluster['words']}:
+            ids = self.postings.get(prefix)
+            if ids is not None:
+                ids.discard(cluster_id)
+                if not ids: del self.postings[prefix]
+        for key in cluster['keys']: del self.keys[key]
+        self._top = None
+        return cluster['requests']
+
+    @staticmethod
+    def _title_match(words, title):
+        """Request ke (artist hata kar) words ka MATCH_WORD_RATIO hissa title mein ho, chhoti spelling galtiyan maaf."""
+        if not words: return False
+        hits = sum(1 for word in words if word in title
+                   or any(edit_distance(word, other, allowed_typos(word)) <= allowed_typos(word) for other in title))
+        return hits / len(words) >= MATCH_WORD_RATIO
+
+    def matching(self, song):
+        """Woh clusters jinki request is song se poori hoti hai.
+
+        Sirf title ke words ginte hain: "Kesariya Arijit Singh" ya "arijit" jaisi requests Arijit ke kisi
+        bhi upload se poori nahi hoti, woh /notify ke liye pending rehti hain.
+        """
+        title = set(normalize_words(song.get('song_title', '')))
+        artist = set(normalize_words(song.get('artist', '')))
+        candidates = set()
+        for prefix in {word[:3] for word in title}: candidates.update(self.postings.get(prefix, ()))
+        return [cid for cid in candidates if self._title_match(self.clusters[cid]['words'] - artist, title)]
+
+    def find(self, song_name):
+        """Admin ke diye naam se cluster dhoondhta hai (exact key ya near-duplicate)."""
+        words = set(normalize_words(song_name))
+        return self._find_cluster(" ".join(sorted(words)), words) if words else None
+
+    def top(self):
+        """Precomputed top list (sabse zyada requests pehle), zarurat padne par hi dobara banti hai."""
+        if self._top is None:
+            self._top = sorted(self.clusters, key=lambda cid: (-len(self.clusters[cid]['requests']), cid))[:MISSING_TOP_N]
+        return self._top
+
+    def count(self, cluster_id):
+        return len(self.clusters[cluster_id]['requests'])
+
+    def total_requests(self):
+        return sum(len(cluster['requests']) for cluster in self.clusters.values())
+
+    def clear(self):
+        self.__init__()
+
+
+MISSING_REQUESTS = MissingRequests()   # open_storage() MISSING_DB se bharta hai
+
+@shard_call
+def add_missing_song(user_id, song_name):
+    """User ki song request ko missing list mein add karta hai (shard 0 par chalta hai)."""
+    if 'requests' not in MISSING_DB: MISSING_DB['requests'] = []
+    request = { 'user_id': user_id, 'song_name': song_name, 'request_date': datetime.now().isoformat() }
+    MISSING_DB['requests'].append(request)
+    MISSING_REQUESTS.add(request)
+    STORAGE.add_missing_request(request)
 
-    clean_name = re.sub(r'\.(mp3|m4a|wav|flac|aac|ogg)$', '', filename, flags=re.IGNORECASE)
-    clean_name = os.path.basename(clean_name)
-    clean_name = re.sub(r'\[.*?\]|\(.*?\)|\{.*?\}', '', clean_name).strip()
-    clean_name = re.sub(r'^\d+\s*[-._]\s*', '', clean_name).strip()
-    clean_name = re.sub(r'^\d+\s+', '', clean_name).strip()
-    clean_name = re.sub(r'\s{2,}', ' ', clean_name).strip()
+def fulfil_missing_requests(cluster_ids):
+    """Clusters ki requests store se hata kar (label, {user_id}) list deta hai."""
+    fulfilled, removed = [], set()
+    for cluster_id in cluster_ids:
+        label = MISSING_REQUESTS.clusters[cluster_id]['label']
+        requests = MISSING_REQUESTS.pop(cluster_id)
+        removed.update(map(id, requests))
+        fulfilled.append((label, {request['user_id'] for request in requests}))
+    if removed:
+        MISSING_DB['requests'] = [request for request in MISSING_DB.get('requests', []) if id(request) not in removed]
+        STORAGE.replace_missing_requests(MISSING_DB['requests'])
+    return fulfilled
 
-    separators = [' - ', ' – ', ' — ', ' | ', ' by ']
-    for sep in separators:
-        if sep in clean_name:
-            parts = clean_name.split(sep, 1)
-            if len(parts) == 2:
-                part1, part2 = parts[0].strip(), parts[1].strip()
-                if not part1 or not part2: continue
-                song_title, artist = determine_artist_and_song(part1, part2)
-                return {"song_title": song_title, "artist": artist, "format": file_format, "size_mb": size_mb, "original_filename": os.path.basename(filename)}
-    
-    return {"song_title": clean_name if clean_name else "Unknown Song", "artist": "Unknown Artist", "format": file_format, "size_mb": size_mb, "original_filename": os.path.basename(filename)}
 
-def fuzzy_search(query, song_data):
-    """Song ke title aur artist mein search karta hai."""
-    query = query.lower().strip()
-    song_name = song_data.get('song_title', '').lower()
-    artist_name = song_data.get('artist', '').lower()
+UTR_RE = re.compile(r'[A-Z0-9]{6,35}')    # UPI UTR 12 digits ka hota hai; bank/wallet ref IDs alphanumeric
 
-    if query in song_name or query in artist_name: return True
-    
-    query_words = set(re.sub(r'[^\w\s]', '', query).split())
-    all_song_words = set(re.sub(r'[^\w\s]', '', song_name).split()).union(set(re.sub(r'[^\w\s]', '', artist_name).split()))
-    
-    if not query_words: return False
-    return len(query_words.intersection(all_song_words)) / len(query_words) >= 0.6
+class PaymentQueue:
+    """/submit ki payment submissions ka store, UTR aur user_id par indexed.
 
+    Har UTR sirf ek baar submit ho sakta hai (pending, approved ya rejected kuch bhi ho), isliye wahi
+    payment dobara bhejna ek dict lookup mein pakda jaata hai. `pending` dict ka order hi admin queue
+    ka order hai (sabse purani pehle). Store shard 0 par rehta hai, jahan admins hain.
+    """
 
-# ==============================================================================
-# ==== SECTION 4: CORE BOT HANDLERS & USER DATA ====
-# ==============================================================================
+    def __init__(self, payments=()):
+        self.by_utr = {}        # utr -> payment
+        self.by_user = {}       # user_id -> [utr] (submission order)
+        self.pending = {}       # utr -> payment, sirf jo abhi decide nahi hue
+        self.in_flight = set()  # Jin UTRs ke points abhi credit ho rahe hain (doosra tap inhe dobara nahi le sakta)
+        for payment in payments: self._add(payment)
 
-def get_user_data(user_id, username=None):
-    """User ka data laata hai ya naya banata hai."""
-    user_id = str(user_id)
-    if user_id not in USERS_DB:
-        USERS_DB[user_id] = {
-            'points': FREE_POINTS_ON_START, 'join_date': datetime.now().isoformat(),
-            'username': username, 'total_downloaded': 0, 'total_purchased': 0, 'total_spent': 0.0,
-        }
-        if username: USERNAME_MAP[username.lower()] = user_id
-        save_db(USERS_DATA, USERS_FILE)
-    return USERS_DB[user_id]
+    @staticmethod
+    def normalize_utr(utr):
+        """Spaces/dashes hata kar uppercase: "1234 5678-9012" aur "123456789012" ek hi UTR hain."""
+        return re.sub(r'[\s-]', '', utr).upper()
 
-def update_user_data(user_id, **kwargs):
-    """User ke data ko update karta hai."""
-    user_id = str(user_id)
-    user_data = get_user_data(user_id)
-    user_data.update(kwargs)
-    if 'username' in kwargs and kwargs['username']: USERNAME_MAP[kwargs['username'].lower()] = user_id
-    save_db(USERS_DATA, USERS_FILE)
+    def _add(self, payment):
+        self.by_utr[payment['utr']] = payment
+        self.by_user.setdefault(payment['user_id'], []).append(payment['utr'])
+        if payment['status'] == 'pending': self.pending[payment['utr']] = payment
 
-async def save_song(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Channel mein upload kiye gaye gaano ko database mein save karta hai."""
-    global SONG_DB
-    if not (update.channel_post and update.channel_post.chat.id == CHANNEL_ID): return
+    def submit(self, user_id, utr, amount, points):
+        """Nayi submission queue mein daalta hai; (payment, naya tha?) deta hai. UTR pehle se ho to purani payment."""
+        existing = self.by_utr.get(utr)
+        if existing is not None: return existing, False
+        payment = {'utr': utr, 'user_id': user_id, 'amount': amount, 'points': points, 'status': 'pending',
+                   'submitted_at': datetime.now().isoformat()}
+        self._add(payment)
+        STORAGE.save_payment(payment)
+        return payment, True
 
-    message = update.channel_post
-    audio = message.audio or message.document
-    if not audio or not audio.file_name: return
+    def claim(self, utr):
+        """Pending payment ko decide karne ke liye le leta hai; pending na ho ya koi aur le chuka ho to None."""
+        payment = self.pending.get(utr)
+        if payment is None or utr in self.in_flight: return None
+        self.in_flight.add(utr)
+        return payment
 
-    filename, file_size, msg_id = audio.file_name, audio.file_size or 0, message.message_id
-    song_info = parse_song_info(filename, file_size)
-    song_info['message_id'] = msg_id
+    def release(self, utr):
+        """Claim chhod deta hai (credit fail hua): payment phir se pending queue mein decide ho sakti hai."""
+        self.in_flight.discard(utr)
 
-    existing_index = next((i for i, song in enumerate(SONG_DB) if song.get('message_id') == msg_id), -1)
-    
-    if existing_index != -1: 
-        SONG_DB[existing_index] = song_info
-        logger.info(f"🔄 Updated: {song_info['artist']} - {song_info['song_title']}")
-    else: 
-        SONG_DB.append(song_info)
-        logger.info(f"✅ Saved: {song_info['artist']} - {song_info['song_title']}")
-    
-    save_db(SONG_DB, DB_FILE)
+    def decide(self, utr, status, admin_id):
+        """Claimed payment ko 'approved' / 'rejected' karke queue se hata deta hai."""
+        self.in_flight.discard(utr)
+        payment = self.pending.pop(utr)
+        payment.update(status=status, decided_at=datetime.now().isoformat(), admin_id=admin_id)
+        STORAGE.save_payment(payment)
+        return payment
 
-def add_missing_song(user_id, song_name):
-    """User ki song request ko missing list mein add karta hai."""
-    if 'requests' not in MISSING_DB: MISSING_DB['requests'] = []
-    MISSING_DB['requests'].append({ 'user_id': user_id, 'song_name': song_name, 'request_date': datetime.now().isoformat() })
-    save_db(MISSING_DB, MISSING_FILE)
+    def pending_for(self, user_id):
+        """User ki pending payments, purani pehle."""
+        return [self.pending[utr] for utr in self.by_user.get(user_id, ()) if utr in self.pending]
+
+    def page(self, start, count):
+        return list(itertools.islice(self.pending.values(), start, start + count))
+
+    def to_list(self):
+        return list(self.by_utr.values())
+
+
+PAYMENTS = PaymentQueue()   # open_storage() storage se bharta hai
+
+@shard_call
+def submit_payment(user_id, utr, amount, points):
+    """User ki payment submission store mein daalta hai (shard 0 par chalta hai)."""
+    return PAYMENTS.submit(user_id, utr, amount, points)
 
 
 # ==============================================================================
@@ -205,7 +2642,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/start command ko handle karta hai."""
     user = update.effective_user
     user_data = get_user_data(user.id, username=user.username)
+    user_data.pop('blocked', None)  # Broadcast mein block mila tha, ab user wapas aa gaya
     update_user_data(user.id, username=user.username, first_name=user.first_name)
+    await LEDGER.sync()     # Signup ke free points durable hone ke baad hi batao
     
     command_guide = (
         "**Here are the commands you can use:**\n"
@@ -223,6 +2662,15 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         welcome_message = (f"🎵 **Welcome back, {user.first_name}!**\n\n💎 You have **{user_data['points']} points**.\n\n{command_guide}")
     await update.message.reply_text(welcome_message, parse_mode='Markdown')
 
+    # Inline result ke button se aaye hain (`/start song_<id>`): seedha us song ka download prompt
+    if context.args and context.args[0].startswith("song_") and context.args[0][5:].isdigit():
+        await catalog_ready()
+        song = SONG_DB.get(int(context.args[0][5:]))
+        if song is not None:
+            handle = store_search_results(song['song_title'], [song['message_id']])
+            text, keyboard = render_search_page(handle, song['song_title'], [song['message_id']], 0, available_points(user.id))
+            await update.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/help command ko handle karta hai."""
     await start_command(update, context) 
@@ -238,12 +2686,60 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(balance_message, parse_mode='Markdown')
 
+# --- SEARCH RESULT PAGES ---
+# Search ke ranked message_ids server par ek chhote handle ke peeche rakhe jaate hain. Buttons ke
+# callback_data mein sirf handle aur page number jaata hai (64 bytes ki limit), isliye next/prev
+# dabane par search dobara nahi chalti.
+SEARCH_RESULTS = OrderedDict()  # handle -> (expires_at, query, [message_id])
+SEARCH_RESULTS_MAX = 20000
+
+def store_search_results(query, msg_ids):
+    """Results ko naye handle ke saath save karta hai aur handle deta hai."""
+    now = time.monotonic()
+    while SEARCH_RESULTS and (len(SEARCH_RESULTS) >= SEARCH_RESULTS_MAX or next(iter(SEARCH_RESULTS.values()))[0] < now):
+        SEARCH_RESULTS.popitem(last=False)
+    handle = secrets.token_hex(4)
+    SEARCH_RESULTS[handle] = (now + SEARCH_HANDLE_TTL_SECONDS, query, msg_ids)
+    return handle
+
+def get_search_results(handle):
+    """Handle ke (query, msg_ids) deta hai, expire ho gaya ho to None."""
+    entry = SEARCH_RESULTS.get(handle)
+    if entry is None or entry[0] < time.monotonic(): return None
+    return entry[1], entry[2]
+
+def render_search_page(handle, query, msg_ids, page, points):
+    """Results ke ek page ka message text aur inline keyboard banata hai."""
+    pages = max(1, math.ceil(len(msg_ids) / SEARCH_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * SEARCH_PAGE_SIZE
+    lines, buttons = [], []
+    for number, msg_id in enumerate(msg_ids[start:start + SEARCH_PAGE_SIZE], start + 1):
+        song = SONG_DB.get(msg_id)
+        if song is None: continue
+        lines.append(f"{number}. **{escape_markdown(song['song_title'])}** — {escape_markdown(song['artist'])} "
+                     f"({song.get('size_mb', 0)} MB, {song.get('format', '').upper()})")
+        label = f"{number}. {song['song_title']} - {song['artist']}"
+        buttons.append([InlineKeyboardButton(f"⬇️ {label[:40]}", callback_data=f"download_{msg_id}")])
+    nav = []
+    if page > 0: nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"sp_{handle}_{page - 1}"))
+    if page < pages - 1: nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"sp_{handle}_{page + 1}"))
+    if nav: buttons.append(nav)
+    buttons.append([InlineKeyboardButton("❌ My song is not here", callback_data=f"wrong_{handle}")])
+    text = (
+        f"🎵 **Results for** `{escape_markdown(query)}` (page {page + 1}/{pages})\n\n"
+        + "\n".join(lines) +
+        f"\n\n💎 **Your Points:** {points}\n"
+        f"💰 **Cost:** {SONG_PRICE_POINTS} point per song\n\n"
+        f"Tap a song to download it."
+    )
+    return text, InlineKeyboardMarkup(buttons)
+
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/search command ko handle karta hai."""
     user_id = update.effective_user.id
-    user_data = get_user_data(user_id)
 
-    if user_data['points'] < SONG_PRICE_POINTS:
+    if available_points(user_id) < SONG_PRICE_POINTS:
         await update.message.reply_text(f"⚠️ **Out of Points!**\n\nYou need at least {SONG_PRICE_POINTS} point. Use `/buypoint` to get more.", parse_mode='Markdown')
         return
 
@@ -254,29 +2750,57 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = " ".join(context.args)
     search_msg = await update.message.reply_text(f"🔍 Searching for `{escape_markdown(query)}`...", parse_mode='Markdown')
 
-    found_songs = [song for song in SONG_DB if fuzzy_search(query, song)]
+    await catalog_ready()
+    found_songs = cached_search(query)
+    STATS.record('search')
+    STATS.record('search_hit' if found_songs else 'search_miss')
 
     if found_songs:
-        best_match = found_songs[0]
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Yes, Download", callback_data=f"download_{best_match['message_id']}")],
-            [InlineKeyboardButton("❌ No, Wrong Song", callback_data=f"wrong_song_{query}")]
-        ])
-        found_message = (
-            f"🎵 **Song Found!**\n\n"
-            f"🎶 **Song:** {escape_markdown(best_match['song_title'])}\n"
-            f"🎤 **Artist:** {escape_markdown(best_match['artist'])}\n"
-            f"📁 **Size:** {best_match['size_mb']} MB\n"
-            f"📄 **Format:** {best_match['format'].upper()}\n\n"
-            f"💎 **Your Points:** {user_data['points']}\n"
-            f"💰 **Cost:** 1 point\n\n"
-            f"Is this the correct song?"
-        )
+        msg_ids = [song['message_id'] for song in found_songs]
+        handle = store_search_results(query, msg_ids)
+        found_message, keyboard = render_search_page(handle, query, msg_ids, 0, available_points(user_id))
         await search_msg.edit_text(found_message, reply_markup=keyboard, parse_mode='Markdown')
     else:
-        add_missing_song(user_id, query)
+        await call_shard(0, 'add_missing_song', user_id, query)
         await search_msg.edit_text(f"😔 **Song Not Found**\n\nWe couldn't find `{escape_markdown(query)}`.", parse_mode='Markdown')
 
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """`@bot <song>` inline queries ka jawab prefix index se deta hai (har keystroke par aata hai).
+
+    Results sirf suggestions hain: download button bot ke private chat mein `/start song_<id>`
+    kholta hai, jahan normal points wala download flow chalta hai.
+    """
+    inline_query = update.inline_query
+    query = inline_query.query.strip()
+    await catalog_ready()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    if not query:
+        await inline_query.answer([], cache_time=INLINE_CACHE_SECONDS)
+        return
+
+    msg_ids = PREFIX_INDEX.search(query, limit=INLINE_RESULTS_PER_PAGE, offset=offset)
+    if not msg_ids and offset == 0:
+        # Prefix se kuch nahi mila (typo ya beech ka word) to cached fuzzy search par aate hain
+        msg_ids = [song['message_id'] for song in cached_search(query, limit=INLINE_RESULTS_PER_PAGE)]
+        next_offset = ""
+    else:
+        next_offset = str(offset + len(msg_ids)) if len(msg_ids) == INLINE_RESULTS_PER_PAGE else ""
+
+    results = []
+    for msg_id in msg_ids:
+        song = SONG_DB.get(msg_id)
+        if song is None: continue
+        link = f"https://t.me/{context.bot.username}?start=song_{msg_id}"
+        results.append(InlineQueryResultArticle(
+            id=str(msg_id),
+            title=song['song_title'],
+            description=f"{song['artist']} • {song.get('size_mb', 0)} MB • {song.get('format', '').upper()}",
+            input_message_content=InputTextMessageContent(
+                f"🎵 **{escape_markdown(song['song_title'])}** — {escape_markdown(song['artist'])}", parse_mode='Markdown'),
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬇️ Get this song", url=link)]]),
+        ))
+    await inline_query.answer(results, cache_time=INLINE_CACHE_SECONDS, next_offset=next_offset)
+
 async def buypoint_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """/buypoint command ko handle karta hai."""
     buttons = [[InlineKeyboardButton(f"🎵 {p} points for ₹{a}", callback_data=f"show_pay_{p}_{a}")] for p, a in PAYMENT_OPTIONS.items()]
@@ -290,32 +2814,41 @@ async def submit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("🚫 **Invalid format!**\nUse: `/submit <UTR_ID> <amount>`\nExample: `/submit 123456789012 35`", parse_mode='Markdown')
         return
 
-    utr_id, amount_str = context.args
+    utr_id, amount_str = PaymentQueue.normalize_utr(context.args[0]), context.args[1]
+    if not UTR_RE.fullmatch(utr_id):
+        await update.message.reply_text("❌ Invalid UTR/Ref ID. Please send the 12-digit UTR shown in your payment app."); return
     try: amount = int(amount_str)
     except ValueError:
         await update.message.reply_text("❌ The amount must be a number."); return
 
-    points_to_give = next((p for p, a in PAYMENT_OPTIONS.items() if a == amount), None)
+    points_to_give = POINTS_FOR_AMOUNT.get(amount)
     if points_to_give is None:
         await update.message.reply_text(f"❌ Invalid amount. No plan found for ₹{amount}."); return
 
-    approve_command = f"/admingive {user.id} {points_to_give}"
-    reject_command = f"/admingive {user.id} reject"
-    mail_command = f"/mail {user.id} "
+    payment, is_new = await call_shard(0, 'submit_payment', user.id, utr_id, amount, points_to_give)
+    if not is_new:
+        if payment['user_id'] == user.id and payment['status'] == 'pending':
+            await update.message.reply_text("⏳ This payment is already under review. You will be notified once it is approved.")
+        else:
+            await update.message.reply_text("🚫 This UTR/Ref ID has already been used.")
+        return
 
+    mail_command = f"/mail {user.id} "
     admin_notification = (
         f"**💰 New Payment Submission**\n\n"
         f"👤 **User:** {user.mention_markdown_v2()} (`{user.id}`)\n"
-        f"🔗 **UTR/Ref ID:** `{escape_markdown(utr_id)}`\n"
+        f"🔗 **UTR/Ref ID:** `{utr_id}`\n"
         f"💵 **Amount:** ₹{amount}\n"
         f"💎 **Points:** {points_to_give}\n\n"
-        f"**✅ To approve:** `{approve_command}`\n"
-        f"**❌ To reject:** `{reject_command}`\n"
-        f"**📨 To mail:** `{mail_command}`"
+        f"**📨 To mail:** `{mail_command}`\n"
+        f"**📋 Queue:** /payments"
     )
+    buttons = InlineKeyboardMarkup([[InlineKeyboardButton("✅ Approve", callback_data=f"pay_ok_{utr_id}"),
+                                     InlineKeyboardButton("❌ Reject", callback_data=f"pay_no_{utr_id}")]])
     for admin_id in ADMIN_IDS:
         try:
-            await context.bot.send_message(chat_id=admin_id, text=admin_notification, parse_mode='Markdown')
+            await context.bot.send_message(chat_id=admin_id, text=admin_notification, parse_mode='Markdown',
+                                           reply_markup=buttons, rate_limit_args='notify')
         except Exception as e:
             logger.error(f"Failed to send payment notification to admin {admin_id}: {e}")
 
@@ -324,24 +2857,28 @@ async def submit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def daily_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """User ko daily free points deta hai."""
     user_id = str(update.effective_user.id)
-    user_data = get_user_data(user_id)
     now = datetime.now()
+    time_left = None
+
+    async with user_lock(user_id):
+        user_data = get_user_data(user_id)
+        last_claim_str = user_data.get('last_daily_claim')
+        if last_claim_str:
+            last_claim_date = datetime.fromisoformat(last_claim_str)
+            if now - last_claim_date < timedelta(hours=24):
+                time_left = timedelta(hours=24) - (now - last_claim_date)
+        if time_left is None:
+            new_balance = change_points(user_id, DAILY_POINTS_GIFT, 'daily')
+            update_user_data(user_id, last_daily_claim=now.isoformat())
+
+    if time_left is not None:
+        hours, rem = divmod(int(time_left.total_seconds()), 3600)
+        minutes, _ = divmod(rem, 60)
+        await update.message.reply_text(f"🚫 **Already Claimed!** 🚫\n\nAap aaj ke free points le chuke hain.\n\n⏳ Please try again in **{hours} hours and {minutes} minutes**.", parse_mode='Markdown')
+        return
     
-    last_claim_str = user_data.get('last_daily_claim')
-    if last_claim_str:
-        last_claim_date = datetime.fromisoformat(last_claim_str)
-        if now - last_claim_date < timedelta(hours=24):
-            time_left = timedelta(hours=24) - (now - last_claim_date)
-            hours, rem = divmod(int(time_left.total_seconds()), 3600)
-            minutes, _ = divmod(rem, 60)
-            await update.message.reply_text(f"🚫 **Already Claimed!** 🚫\n\nAap aaj ke free points le chuke hain.\n\n⏳ Please try again in **{hours} hours and {minutes} minutes**.", parse_mode='Markdown')
-            return
-            
-    user_data['points'] = user_data.get('points', 0) + DAILY_POINTS_GIFT
-    user_data['last_daily_claim'] = now.isoformat()
-    update_user_data(user_id, **user_data)
-    
-    await update.message.reply_text(f"🎁 **Daily Gift Claimed!** 🎁\n\n🎉 Congratulations! Aapko **{DAILY_POINTS_GIFT}** free points mile hain.\n\n💎 **New Balance:** `{user_data['points']}` points.", parse_mode='Markdown')
+    await LEDGER.sync()
+    await update.message.reply_text(f"🎁 **Daily Gift Claimed!** 🎁\n\n🎉 Congratulations! Aapko **{DAILY_POINTS_GIFT}** free points mile hain.\n\n💎 **New Balance:** `{new_balance}` points.", parse_mode='Markdown')
 
 async def request_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """User ko song request karne ki anumati deta hai."""
@@ -349,7 +2886,7 @@ async def request_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please provide a song name.\n**Usage:** `/request <song name>`")
         return
     song_name = " ".join(context.args)
-    add_missing_song(update.effective_user.id, song_name)
+    await call_shard(0, 'add_missing_song', update.effective_user.id, song_name)
     await update.message.reply_text(f"✅ **Request Logged!**\n\nThank you for requesting '{escape_markdown(song_name)}'.", parse_mode='Markdown')
 
 # ==============================================================================
@@ -371,7 +2908,8 @@ async def receive_qr_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if not is_admin(update.effective_user.id): return ConversationHandler.END
     photo_file = update.message.photo[-1]
     BOT_CONFIG['qr_photo_file_id'] = photo_file.file_id
-    save_db(BOT_CONFIG, CONFIG_FILE)
+    STORAGE.save_config()
+    notify_other_shards('apply_config', BOT_CONFIG)
     await update.message.reply_photo(photo=photo_file.file_id, caption="✅ **Success!** New QR code saved.")
     return ConversationHandler.END
 
@@ -382,10 +2920,12 @@ async def broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return WAITING_BROADCAST_CONTENT
 
 async def receive_broadcast_content(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Broadcast message ko sabhi users ko bhejta hai."""
+    """Broadcast job banata hai jo background mein sabhi users ko message bhejta hai."""
     if not is_admin(update.effective_user.id): return ConversationHandler.END
-    await update.message.reply_text("⏳ **Broadcast initiated...** Please wait.")
-    
+    if ACTIVE_BROADCAST and not ACTIVE_BROADCAST.finished:
+        await update.message.reply_text("⚠️ A broadcast is already running. Use /cancelbroadcast to stop it first.")
+        return ConversationHandler.END
+
     photo, caption, text = None, None, None
     if update.message.photo:
         photo = update.message.photo[-1].file_id
@@ -395,51 +2935,199 @@ async def receive_broadcast_content(update: Update, context: ContextTypes.DEFAUL
     else:
         await update.message.reply_text("Unsupported type."); return ConversationHandler.END
 
-    success, failed = 0, 0
-    for user_id in list(USERS_DB.keys()):
-        try:
-            if photo: await context.bot.send_photo(chat_id=user_id, photo=photo, caption=caption, parse_mode='Markdown')
-            else: await context.bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown')
-            success += 1
-        except Exception as e:
-            failed += 1; logger.error(f"Broadcast failed for user {user_id}: {e}")
-    
-    await update.message.reply_text(f"✅ **Broadcast Complete!**\n\nSent: {success} | Failed: {failed}")
+    status_message = await update.message.reply_text("⏳ **Broadcast initiated...** Progress will be updated here.")
+    job = BroadcastJob.create(update.effective_chat.id, status_message.message_id, photo, caption, text)
+    start_broadcast(job, context.bot)
     return ConversationHandler.END
 
+async def cancelbroadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Chal rahe broadcast ko rokta hai."""
+    if not is_admin(update.effective_user.id): return
+    if not ACTIVE_BROADCAST or ACTIVE_BROADCAST.finished:
+        await update.message.reply_text("No broadcast is running."); return
+    ACTIVE_BROADCAST.cancelled = True
+    await update.message.reply_text("🛑 Broadcast is being cancelled...")
+
 async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Chalu conversation ko cancel karta hai."""
     if not is_admin(update.effective_user.id): return ConversationHandler.END
     await update.message.reply_text("Operation cancelled.")
     return ConversationHandler.END
 
+async def apply_purchase(user_id, points, amount_paid, admin_id, utr=None):
+    """Ledger entry, points aur purchase totals ek hi user lock ke andar badalta hai, beech mein koi `await` nahi."""
+    async with user_lock(user_id):
+        user_data = get_user_data(user_id)
+        change_points(user_id, points, 'admin_give', ref=f"admin:{admin_id}" + (f" utr:{utr}" if utr else ""))
+        user_data['total_purchased'] = user_data.get('total_purchased', 0) + points
+        user_data['total_spent'] = user_data.get('total_spent', 0.0) + amount_paid
+        update_user_data(user_id, **user_data)
+
+@shard_call
+async def credit_purchase(user_id, points, amount_paid, admin_id, utr=None):
+    """Khareede gaye points user ke account mein daalta hai (user ke owner shard par); ledger fsync ke baad lautta hai."""
+    await apply_purchase(user_id, points, amount_paid, admin_id, utr)
+    await LEDGER.sync()
+
+@shard_call
+async def credit_purchases(credits):
+    """Ek shard ke kai approvals ek hi call (aur ek ledger fsync) mein credit karta hai; jinke points lag gaye unke UTRs deta hai."""
+    credited = []
+    for user_id, points, amount_paid, admin_id, utr in credits:
+        try:
+            await apply_purchase(user_id, points, amount_paid, admin_id, utr)
+            credited.append(utr)
+        except Exception as e:
+            logger.error(f"Could not credit payment {utr} for user {user_id}: {e}")
+    await LEDGER.sync()
+    return credited
+
+def record_sale(points, amount_paid):
+    STATS.record('approval')
+    STATS.record('points_sold', points)
+    if amount_paid: STATS.record('revenue', amount_paid)
+
+async def send_payment_result(bot, user_id, points=None):
+    """User ko approve (points diye) ya reject ka message bhejta hai."""
+    text = (f"🎉 **Payment Approved!**\n\n💎 You have received **{points} points**." if points is not None
+            else "❌ **Payment Not Approved**\n\nYour recent payment could not be verified.")
+    try:
+        await bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown', rate_limit_args='notify')
+    except Forbidden:
+        mark_user_blocked(user_id)
+    except Exception as e:
+        logger.error(f"Failed to send payment result to user {user_id}: {e}")
+
+async def approve_payments(bot, utrs, admin_id):
+    """Pending payments approve karta hai aur approved payments ki list deta hai.
+
+    Points owner shard par credit hote hain, har shard ke saare approvals ek call mein. Jo UTR pending
+    nahi tha (pehle hi decide ho chuka, ya doosre admin ne saath mein dabaya) woh chhoot jaata hai;
+    jiska credit fail hua woh pending hi rehta hai. Decisions turant flush hote hain taaki restart ke
+    baad koi approved payment dobara queue mein na dikhe.
+    """
+    by_shard = {}
+    for payment in filter(None, map(PAYMENTS.claim, dict.fromkeys(utrs))):
+        by_shard.setdefault(user_shard(payment['user_id']), []).append(payment)
+    results = await asyncio.gather(*(
+        call_shard(shard, 'credit_purchases', [(p['user_id'], p['points'], p['amount'], admin_id, p['utr']) for p in batch])
+        for shard, batch in by_shard.items()), return_exceptions=True)
+    approved = []
+    for batch, credited in zip(by_shard.values(), results):
+        if isinstance(credited, BaseException):
+            logger.error(f"Crediting {len(batch)} payment(s) failed: {credited}")
+            credited = ()
+        credited = set(credited)
+        for payment in batch:
+            if payment['utr'] not in credited: PAYMENTS.release(payment['utr']); continue
+            approved.append(PAYMENTS.decide(payment['utr'], 'approved', admin_id))
+            record_sale(payment['points'], payment['amount'])
+    if approved: await PERSISTENCE.flush()
+    await asyncio.gather(*(send_payment_result(bot, p['user_id'], p['points']) for p in approved))
+    return approved
+
+async def reject_payments(bot, utrs, admin_id):
+    """Pending payments reject karke users ko batata hai; rejected payments ki list deta hai."""
+    rejected = [PAYMENTS.decide(p['utr'], 'rejected', admin_id) for p in filter(None, map(PAYMENTS.claim, dict.fromkeys(utrs)))]
+    if rejected: await PERSISTENCE.flush()
+    await asyncio.gather(*(send_payment_result(bot, p['user_id']) for p in rejected))
+    return rejected
+
 async def admingive_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """User ko points deta hai ya payment reject karta hai."""
+    """User ko points deta hai ya payment reject karta hai.
+
+    User ki pending submission (same points wali, ya reject mein sabse purani) ho to woh queue se decide
+    hoti hai; agar woh abhi doosre tap se decide ho rahi hai to uska haal bata diya jaata hai. Pending
+    submission na ho (ya sab pehle hi decide ho chuki hon) to points seedhe credit hote hain.
+    """
     if not is_admin(update.effective_user.id): return
     if len(context.args) != 2:
         await update.message.reply_text("Usage: `/admingive <user_id> <points_or_reject>`", parse_mode='Markdown'); return
     try:
         target_user_id = int(context.args[0])
         action = context.args[1]
+        pending = PAYMENTS.pending_for(target_user_id)
         try:
             points_to_add = int(action)
-            user_data = get_user_data(target_user_id)
-            user_data['points'] += points_to_add
-            user_data['total_purchased'] = user_data.get('total_purchased', 0) + points_to_add
-            amount_paid = next((a for p, a in PAYMENT_OPTIONS.items() if p == points_to_add), 0)
-            user_data['total_spent'] = user_data.get('total_spent', 0.0) + amount_paid
-            update_user_data(target_user_id, **user_data)
+            payment = next((p for p in pending if p['points'] == points_to_add), None)
+            if payment is not None:
+                if await approve_payments(context.bot, [payment['utr']], update.effective_user.id):
+                    await update.message.reply_text(f"✅ Success! Approved UTR `{payment['utr']}`: gave {points_to_add} points to user `{target_user_id}`.")
+                else:
+                    await update.message.reply_text(f"{payment_status_line(payment['utr'])}\nNo points given.", parse_mode='Markdown')
+                return
+            amount_paid = PAYMENT_OPTIONS.get(points_to_add, 0)
+            await call_shard(user_shard(target_user_id), 'credit_purchase', target_user_id, points_to_add, amount_paid,
+                             update.effective_user.id)
+            record_sale(points_to_add, amount_paid)
             await update.message.reply_text(f"✅ Success! Gave {points_to_add} points to user `{target_user_id}`.")
-            await context.bot.send_message(chat_id=target_user_id, text=f"🎉 **Payment Approved!**\n\n💎 You have received **{points_to_add} points**.", parse_mode='Markdown')
+            await send_payment_result(context.bot, target_user_id, points_to_add)
         except ValueError:
             if action.lower() == 'reject':
-                await context.bot.send_message(chat_id=target_user_id, text="❌ **Payment Not Approved**\n\nYour recent payment could not be verified.", parse_mode='Markdown')
+                if pending and not await reject_payments(context.bot, [pending[0]['utr']], update.effective_user.id):
+                    await update.message.reply_text(f"{payment_status_line(pending[0]['utr'])}\nNothing rejected.", parse_mode='Markdown'); return
+                if not pending: await send_payment_result(context.bot, target_user_id)
                 await update.message.reply_text(f"✅ Rejection message sent to user `{target_user_id}`.")
             else:
                 await update.message.reply_text("❌ Invalid action. Use points (e.g., 20) or 'reject'.")
     except ValueError: await update.message.reply_text("Invalid User ID.")
     except Exception as e: await update.message.reply_text(f"An error occurred: {e}")
 
+def render_payments_page(page, notice=""):
+    """Pending payments ka ek page (text, keyboard): har submission ke approve/reject buttons, sabse purani pehle."""
+    pages = max(1, math.ceil(len(PAYMENTS.pending) / PAYMENT_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * PAYMENT_PAGE_SIZE
+    payments = PAYMENTS.page(start, PAYMENT_PAGE_SIZE)
+    lines = [f"{n}. `{p['utr']}` ₹{p['amount']} → {p['points']} pts, user `{p['user_id']}` ({p['submitted_at'][:16].replace('T', ' ')})"
+             for n, p in enumerate(payments, start + 1)]
+    text = (f"{notice}\n\n" if notice else "") + (
+        f"💰 **Pending Payments** (page {page + 1}/{pages})\n{len(PAYMENTS.pending)} waiting for review\n\n"
+        + ("\n".join(lines) or "✅ Queue is empty.") + "\n\nBulk: `/approvepayments all` or `/approvepayments <UTR> <UTR> ...`")
+    rows = [[InlineKeyboardButton(f"✅ {n}. {p['utr'][-6:]}", callback_data=f"payq_ok_{page}_{p['utr']}"),
+             InlineKeyboardButton(f"❌ {n}", callback_data=f"payq_no_{page}_{p['utr']}")]
+            for n, p in enumerate(payments, start + 1)]
+    nav = []
+    if page > 0: nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"payq_{page - 1}"))
+    if page < pages - 1: nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"payq_{page + 1}"))
+    if nav: rows.append(nav)
+    return text, InlineKeyboardMarkup(rows) if rows else None
+
+def payment_status_line(utr):
+    """Ek submission ka haal ek line mein (button dabane ke baad admin ko dikhta hai)."""
+    p = PAYMENTS.by_utr.get(utr)
+    if p is None: return f"⚠️ UTR `{utr}` not found."
+    icon = {'approved': "✅", 'rejected': "❌"}.get(p['status'], "⏳")
+    status = "being processed" if utr in PAYMENTS.in_flight else p['status']
+    return f"{icon} UTR `{utr}` {status}: ₹{p['amount']} → {p['points']} points, user `{p['user_id']}`."
+
+async def decide_payment(bot, utr, approve, admin_id):
+    """Button se ek payment approve/reject karke uski status line deta hai."""
+    await (approve_payments if approve else reject_payments)(bot, [utr], admin_id)
+    return payment_status_line(utr)
+
+async def payments_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pending payment submissions ki queue dikhata hai (buttons se approve/reject)."""
+    if not is_admin(update.effective_user.id): return
+    page = int(context.args[0]) - 1 if context.args and context.args[0].isdigit() else 0
+    text, keyboard = render_payments_page(page)
+    await update.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
+async def approvepayments_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Kai payments ek saath approve karta hai: `all` (poori pending queue) ya bank statement se UTRs ki list."""
+    if not is_admin(update.effective_user.id): return
+    if not context.args:
+        await update.message.reply_text("Usage: `/approvepayments all` or `/approvepayments <UTR> <UTR> ...`", parse_mode='Markdown'); return
+    if [arg.lower() for arg in context.args] == ['all']: utrs = list(PAYMENTS.pending)
+    else: utrs = [PaymentQueue.normalize_utr(arg) for arg in context.args]
+    started = time.perf_counter()
+    approved = await approve_payments(context.bot, utrs, update.effective_user.id)
+    skipped = len(set(utrs)) - len(approved)
+    await update.message.reply_text(
+        f"✅ Approved {len(approved)} payment(s), {sum(p['points'] for p in approved)} points, ₹{sum(p['amount'] for p in approved)} "
+        f"in {time.perf_counter() - started:.1f}s." + (f"\n⚠️ {skipped} UTR(s) skipped (not pending or credit failed)." if skipped else "")
+        + f"\n{len(PAYMENTS.pending)} still pending.")
+
 async def mail_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin ko user ko custom message bhejne ki anumati deta hai."""
     if not is_admin(update.effective_user.id): return
@@ -454,45 +3142,138 @@ async def mail_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError: await update.message.reply_text("❌ Invalid User ID.")
     except Exception as e: await update.message.reply_text(f"❌ Could not send message. Error: {e}")
 
+@shard_call
+def apply_config(config):
+    """Shard 0 par badla config (UPI, QR) baaki shards ki memory mein lagata hai."""
+    BOT_CONFIG.clear()
+    BOT_CONFIG.update(config)
+
 async def setupi_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Payment ke liye UPI ID set karta hai."""
     if not is_admin(update.effective_user.id): return
     if len(context.args) != 1:
         await update.message.reply_text("Usage: `/setupi <your_upi_id>`", parse_mode='Markdown'); return
     BOT_CONFIG['upi_id'] = context.args[0]
-    save_db(BOT_CONFIG, CONFIG_FILE)
+    STORAGE.save_config()
+    notify_other_shards('apply_config', BOT_CONFIG)
     await update.message.reply_text(f"✅ UPI ID updated to: `{BOT_CONFIG['upi_id']}`", parse_mode='Markdown')
 
+@shard_call
+async def export_stats():
+    """Shard ke stats deta hai; pehle pending users flush karta hai taaki /stats ka SQLite count poora ho."""
+    await PERSISTENCE.flush()
+    return STATS.export()
+
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Bot ke statistics dikhata hai."""
     if not is_admin(update.effective_user.id): return
-    total_spent = sum(u.get('total_spent', 0.0) for u in USERS_DB.values())
-    stats_text = (f"📈 **Bot Stats**\n👥 Users: {len(USERS_DB)}\n🎵 Songs: {len(SONG_DB)}\n💰 Revenue: ₹{total_spent}")
+    stats, user_count = STATS, len(USERS_DB)
+    if SHARD_COUNT > 1:
+        exports = await asyncio.gather(*(call_shard(shard, 'export_stats') for shard in range(SHARD_COUNT)))
+        stats, user_count = BotStats.combined(exports), STORAGE.count_users()
+    t = stats.totals
+    downloads = stats.daily_series('download', 7)
+    signups = stats.daily_series('signup', 7)
+    revenue = stats.daily_series('revenue', 14)
+    searches, hits = sum(stats.daily_series('search', 7)), sum(stats.daily_series('search_hit', 7))
+    hit_rate = f"{hits / searches * 100:.1f}%" if searches else "n/a"
+    days = [(datetime.now() - timedelta(days=6 - i)).strftime('%a') for i in range(7)]
+    stats_text = (
+        f"📈 **Bot Stats**\n👥 Users: {user_count} (+{signups[-1]} today, +{sum(signups)} this week)\n"
+        f"🎵 Songs: {len(SONG_DB)}\n💰 Revenue: ₹{t['revenue']} (7d: ₹{sum(revenue[7:])}, previous 7d: ₹{sum(revenue[:7])})\n"
+        f"✅ Approvals: {t['approval']} (7d: {sum(stats.daily_series('approval', 7))})\n\n"
+        f"📥 **Downloads** ({t['download']} total, {sum(stats.hourly_series('download', 24))} in 24h)\n"
+        + " · ".join(f"{day} {count}" for day, count in zip(days, downloads)) +
+        f"\n\n🔍 **Searches (7d):** {searches} | Hit rate: {hit_rate} | Misses: {searches - hits}"
+    )
     await update.message.reply_text(stats_text, parse_mode='Markdown')
 
+async def cachestats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Search result cache ke hit/miss counters dikhata hai."""
+    if not is_admin(update.effective_user.id): return
+    c = SEARCH_CACHE
+    lookups = c.hits + c.misses
+    hit_rate = f"{c.hits / lookups * 100:.1f}%" if lookups else "n/a"
+    await update.message.reply_text(
+        f"🗂 **Search Cache**\n"
+        f"Entries: {len(c.entries)}/{c.max_entries} (TTL {c.ttl}s)\n"
+        f"Hits: {c.hits} | Misses: {c.misses} | Hit rate: {hit_rate}\n"
+        f"Invalidations: {c.invalidations} | Evictions: {c.evictions}",
+        parse_mode='Markdown'
+    )
+
+def perf_lines(title, name, scale=1000, unit="ms", limit=12):
+    """Ek histogram ke label sets ko count ke hisaab se `count | p50 | p99` lines mein badalta hai."""
+    series = sorted(METRICS.series(name), key=lambda item: item[1].count, reverse=True)[:limit]
+    if not series: return []
+    lines = [title]
+    for labels, h in series:
+        label = ",".join(str(v) for v in labels.values()) or "all"
+        lines.append(f"  {label}: n={h.count} p50={h.quantile(0.5) * scale:.1f}{unit} p99={h.quantile(0.99) * scale:.1f}{unit}")
+    return lines
+
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handlers, Bot API, disk writes aur search ki latency ka summary (METRICS se)."""
+    if not is_admin(update.effective_user.id): return
+    lines = ["⏱ Performance (since start)"]
+    lines += perf_lines("\nHandlers:", "handler_seconds")
+    lines += perf_lines("\nBot API:", "bot_api_seconds")
+    lines += perf_lines("\nSend queue wait:", "send_wait_seconds")
+    depth = METRICS.gauge_series("send_queue_depth")
+    if depth: lines.append("Send queue depth: " + ", ".join(f"{labels['lane']} {value}" for labels, value in depth))
+    inbound = METRICS.counter_series("inbound_updates_total")
+    if inbound: lines.append("\nInbound throttle: " + ", ".join(
+        f"{labels['kind']} {labels['outcome']} {value}" for labels, value in sorted(inbound, key=lambda item: tuple(item[0].values()))))
+    lines += perf_lines("\nDisk writes:", "disk_write_seconds")
+    lines += perf_lines("\nPersistence flush:", "persistence_flush_seconds")
+    lines += perf_lines("\nSearch:", "search_seconds")
+    lines += perf_lines("Search candidates:", "search_candidates", scale=1, unit="")
+    written = METRICS.counter_series("disk_write_bytes_total")
+    if written: lines.append("\nBytes written: " + ", ".join(f"{labels['file']} {b / 1024:,.0f} KB" for labels, b in written))
+    errors = sum(value for name in ("handler_errors_total", "bot_api_errors_total", "persistence_flush_errors_total")
+                 for _, value in METRICS.counter_series(name))
+    lines.append(f"\nErrors: {errors}" + (f" | Metrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics" if METRICS_SERVER else ""))
+    await update.message.reply_text("\n".join(lines)[:4000])
+
+def render_missing_page(page):
+    """Precomputed top list ka ek page (text, keyboard) banata hai; text 4096 chars se kam rehta hai."""
+    top = MISSING_REQUESTS.top()
+    pages = max(1, math.ceil(len(top) / MISSING_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * MISSING_PAGE_SIZE
+    lines = [f"{rank}. `{escape_markdown(MISSING_REQUESTS.clusters[cid]['label'][:80])}` (x{MISSING_REQUESTS.count(cid)})"
+             for rank, cid in enumerate(top[start:start + MISSING_PAGE_SIZE], start + 1)]
+    text = (f"📝 **Pending Song Requests** (page {page + 1}/{pages})\n"
+            f"{len(MISSING_REQUESTS.clusters)} songs, {MISSING_REQUESTS.total_requests()} requests\n\n" + "\n".join(lines))
+    nav = []
+    if page > 0: nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"missing_{page - 1}"))
+    if page < pages - 1: nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"missing_{page + 1}"))
+    return text, InlineKeyboardMarkup([nav]) if nav else None
+
 async def missing_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Sabhi pending song requests dikhata hai."""
+    """Sabhi pending song requests dikhata hai (sabse zyada maange gaye pehle, pages mein)."""
     if not is_admin(update.effective_user.id): return
-    requests = MISSING_DB.get('requests', [])
-    if not requests:
+    if not MISSING_REQUESTS.clusters:
         await update.message.reply_text("✅ No pending song requests."); return
-    song_counts = {}
-    for req in requests: song_counts[req['song_name']] = song_counts.get(req['song_name'], 0) + 1
-    sorted_reqs = sorted(song_counts.items(), key=lambda item: item[1], reverse=True)
-    message = "📝 **Pending Song Requests:**\n\n"
-    for song, count in sorted_reqs: message += f"• `{escape_markdown(song)}` (x{count})\n"
-    await update.message.reply_text(message, parse_mode='Markdown')
+    page = int(context.args[0]) - 1 if context.args and context.args[0].isdigit() else 0
+    text, keyboard = render_missing_page(page)
+    await update.message.reply_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
 async def clearmissing_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Missing songs ki list ko saaf karta hai."""
     if not is_admin(update.effective_user.id): return
     MISSING_DB['requests'] = []
-    save_db(MISSING_DB, MISSING_FILE)
+    MISSING_REQUESTS.clear()
+    STORAGE.replace_missing_requests(MISSING_DB['requests'])
     await update.message.reply_text("✅ Success! Missing songs list cleared.")
     
 
 async def notify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Notifies users that a requested song has been added and clears the request."""
+    """Notifies users that a requested song has been added and clears the request.
+
+    Uploads par yeh apne aap hota hai; yeh command un cases ke liye hai jahan gaana kisi aur naam
+    se upload hua. Naam ki chhoti spelling galtiyan aur words ka order maaf hai.
+    """
     if not is_admin(update.effective_user.id): return
 
     if not context.args:
@@ -503,58 +3284,242 @@ async def notify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     song_name_to_notify = " ".join(context.args)
-    song_name_lower = song_name_to_notify.lower()
-    
-    all_requests = MISSING_DB.get('requests', [])
-    if not all_requests:
+    if not MISSING_REQUESTS.clusters:
         await update.message.reply_text("The request list is already empty.")
         return
 
-    users_to_notify = []
-    remaining_requests = []
-
-    # Separate the requests for the notified song from the rest
-    for request in all_requests:
-        if request.get('song_name', '').lower() == song_name_lower:
-            users_to_notify.append(request['user_id'])
-        else:
-            remaining_requests.append(request)
-
-    if not users_to_notify:
+    cluster_id = MISSING_REQUESTS.find(song_name_to_notify)
+    if cluster_id is None:
         await update.message.reply_text(f"No pending requests found for '{escape_markdown(song_name_to_notify)}'.", parse_mode='Markdown')
         return
 
-    # Use set() to avoid sending multiple notifications to the same user
-    unique_user_ids = set(users_to_notify)
-    success_count = 0
-    
-    notification_message = (
-        f"🎉 **Good News!**\n\n"
-        f"The song you requested, **{escape_markdown(song_name_to_notify)}**, is now available.\n\n"
-        f"Use `/search {escape_markdown(song_name_to_notify)}` to download it!"
-    )
-
-    # Send notification to each user
-    for user_id in unique_user_ids:
-        try:
-            await context.bot.send_message(chat_id=user_id, text=notification_message, parse_mode='Markdown')
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Failed to notify user {user_id} for song '{song_name_to_notify}': {e}")
-    
-    # Update the missing songs list by removing the fulfilled requests
-    MISSING_DB['requests'] = remaining_requests
-    save_db(MISSING_DB, MISSING_FILE)
+    (label, user_ids), = fulfil_missing_requests([cluster_id])
+    REQUEST_NOTIFIER.enqueue(song_name_to_notify, user_ids)
 
     await update.message.reply_text(
-        f"✅ **Notification Sent!**\n\n"
-        f"Message sent to **{success_count} user(s)** for the song '{escape_markdown(song_name_to_notify)}'.\n"
+        f"✅ **Notification Queued!**\n\n"
+        f"**{len(user_ids)} user(s)** who asked for '{escape_markdown(label)}' will be told that "
+        f"'{escape_markdown(song_name_to_notify)}' is available.\n"
         f"The request has been cleared from the list."
     , parse_mode='Markdown')
 
 
 # ==============================================================================
-# ==== SECTION 7: MAIN CALLBACK HANDLER ====
+# ==== SECTION 7: BROADCAST ENGINE ====
+# ==============================================================================
+
+class BroadcastJob:
+    """Resumable broadcast: bounded concurrency, SendScheduler ki 'bulk' lane aur disk par checkpoint.
+
+    Recipients ki list job shuru hote hi BROADCAST_RECIPIENTS_FILE mein freeze ho jaati hai.
+    Progress (`cursor` = is index tak sab complete) BROADCAST_FILE mein baar-baar save hota hai,
+    taaki restart ke baad job wahin se chale. Restart par zyada se zyada BROADCAST_CONCURRENCY
+    in-flight messages dobara ja sakte hain.
+    """
+
+    def __init__(self, state, recipients):
+        self.state = state
+        self.recipients = recipients
+        self.done = set()       # `cursor` ke aage ke woh indices jo complete ho chuke hain
+        self.cancelled = False
+        self.task = None
+        self._last_report = None
+
+    @property
+    def finished(self):
+        return self.state['status'] != 'running'
+
+    @classmethod
+    def create(cls, admin_chat_id, status_message_id, photo, caption, text):
+        """Naya job banata hai aur recipients ki list freeze karta hai."""
+        recipients = [uid for uid, data in USERS_DB.items() if not data.get('blocked')]
+        state = {
+            'id': datetime.now().strftime('%Y%m%d%H%M%S'), 'status': 'running',
+            'admin_chat_id': admin_chat_id, 'status_message_id': status_message_id,
+            'photo': photo, 'caption': caption, 'text': text,
+            'total': len(recipients), 'cursor': 0, 'sent': 0, 'failed': 0, 'blocked': 0,
+            'started_at': datetime.now().isoformat(),
+        }
+        save_db(recipients, BROADCAST_RECIPIENTS_FILE)
+        job = cls(state, recipients)
+        job.checkpoint()
+        return job
+
+    @classmethod
+    def load(cls):
+        """Disk se adhoora (running) job laata hai, agar koi ho."""
+        state = load_db(BROADCAST_FILE)
+        if state.get('status') != 'running': return None
+        recipients = load_db(BROADCAST_RECIPIENTS_FILE)
+        if not isinstance(recipients, list): return None
+        return cls(state, recipients)
+
+    def checkpoint(self):
+        save_db(self.state, BROADCAST_FILE)
+
+    def _mark_done(self, index):
+        self.done.add(index)
+        while self.state['cursor'] in self.done:
+            self.done.remove(self.state['cursor'])
+            self.state['cursor'] += 1
+
+    async def _send(self, bot, user_id):
+        """Ek user ko message bhejta hai; 'sent', 'failed' ya 'blocked' deta hai."""
+        network_errors = 0
+        while network_errors < 3:
+            try:
+                if self.state['photo']:
+                    await bot.send_photo(chat_id=user_id, photo=self.state['photo'], caption=self.state['caption'], parse_mode='Markdown', rate_limit_args='bulk')
+                else:
+                    await bot.send_message(chat_id=user_id, text=self.state['text'], parse_mode='Markdown', rate_limit_args='bulk')
+                return 'sent'
+            except RetryAfter:
+                pass    # SendScheduler retries ke baad bhi flood control: bucket pause ho chuka hai, dobara bhejo
+            except Forbidden:
+                return 'blocked'
+            except BadRequest as e:
+                if 'chat not found' in str(e).lower(): return 'blocked'
+                logger.error(f"Broadcast failed for user {user_id}: {e}"); return 'failed'
+            except NetworkError as e:
+                network_errors += 1
+                logger.warning(f"Broadcast network error for user {user_id} (attempt {network_errors}): {e}")
+            except Exception as e:
+                logger.error(f"Broadcast failed for user {user_id}: {e}"); return 'failed'
+        return 'failed'
+
+    async def _worker(self, bot, indices):
+        for index in indices:
+            if self.cancelled: return
+            user_id = self.recipients[index]
+            result = await self._send(bot, user_id)
+            self.state[result] += 1
+            if result == 'blocked': mark_user_blocked(user_id)
+            self._mark_done(index)
+
+    async def _report(self, bot):
+        """Admin ke status message mein live progress likhta hai."""
+        s = self.state
+        title = {'running': '📣 Broadcast Running', 'done': '✅ Broadcast Complete!', 'cancelled': '🛑 Broadcast Cancelled'}[s['status']]
+        text = (f"{title}\n\nProgress: {s['cursor']}/{s['total']}\n"
+                f"Sent: {s['sent']} | Failed: {s['failed']} | Blocked: {s['blocked']}")
+        if text == self._last_report: return
+        self._last_report = text
+        try:
+            await bot.edit_message_text(chat_id=s['admin_chat_id'], message_id=s['status_message_id'], text=text)
+        except Exception as e:
+            if 'not modified' not in str(e).lower(): logger.warning(f"Broadcast progress update failed: {e}")
+
+    async def _reporter(self, bot):
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_SECONDS)
+            self.checkpoint()
+            await self._report(bot)
+
+    async def run(self, bot):
+        """Saare bache hue recipients ko bhejta hai; cancel hone par checkpoint karke rukta hai."""
+        indices = iter(range(self.state['cursor'], len(self.recipients)))
+        reporter = asyncio.create_task(self._reporter(bot))
+        try:
+            await asyncio.gather(*(self._worker(bot, indices) for _ in range(BROADCAST_CONCURRENCY)))
+        except asyncio.CancelledError:
+            self.checkpoint()   # Shutdown: status 'running' rehta hai, restart par resume hoga
+            raise
+        finally:
+            reporter.cancel()
+        self.state['status'] = 'cancelled' if self.cancelled else 'done'
+        self.checkpoint()
+        await self._report(bot)
+        logger.info(f"Broadcast {self.state['id']} {self.state['status']}: sent {self.state['sent']}, "
+                    f"failed {self.state['failed']}, blocked {self.state['blocked']}")
+
+
+ACTIVE_BROADCAST = None
+
+def start_broadcast(job, bot):
+    """Job ko background task mein chalata hai."""
+    global ACTIVE_BROADCAST
+    ACTIVE_BROADCAST = job
+    job.task = asyncio.create_task(job.run(bot))
+
+async def resume_broadcast(bot):
+    """Restart se pehle adhoora reh gaya broadcast dobara shuru karta hai."""
+    job = BroadcastJob.load()
+    if job is None: return
+    logger.info(f"Resuming broadcast {job.state['id']} from {job.state['cursor']}/{job.state['total']}.")
+    start_broadcast(job, bot)
+    try:
+        await bot.send_message(chat_id=job.state['admin_chat_id'], text=f"♻️ Resuming broadcast after restart ({job.state['cursor']}/{job.state['total']} done).")
+    except Exception as e:
+        logger.warning(f"Could not notify admin about broadcast resume: {e}")
+
+async def stop_broadcast():
+    """Shutdown par chal rahe broadcast ko checkpoint karke rokta hai."""
+    if ACTIVE_BROADCAST and ACTIVE_BROADCAST.task and not ACTIVE_BROADCAST.task.done():
+        ACTIVE_BROADCAST.task.cancel()
+        try: await ACTIVE_BROADCAST.task
+        except asyncio.CancelledError: pass
+
+
+class RequestNotifier:
+    """Fulfilled song requests ke notifications ek queue se SendScheduler ki 'notify' lane mein bhejta hai.
+
+    Uploads (aur /notify) sirf queue mein daalte hain, taaki channel post handler bhejne ka
+    intezaar na kare aur kisi popular gaane ke sau requesters se flood limit na tute.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()    # (user_id, song_name)
+        self.task = None
+        self.sent = self.failed = 0
+
+    def enqueue(self, song_name, user_ids):
+        for user_id in user_ids: self.queue.put_nowait((user_id, song_name))
+
+    async def _send(self, bot, user_id, song_name):
+        text = (
+            f"🎉 **Good News!**\n\n"
+            f"The song you requested, **{escape_markdown(song_name)}**, is now available.\n\n"
+            f"Use `/search {escape_markdown(song_name)}` to download it!"
+        )
+        for attempt in range(3):
+            try:
+                await bot.send_message(chat_id=user_id, text=text, parse_mode='Markdown', rate_limit_args='notify')
+                self.sent += 1
+                return
+            except RetryAfter:
+                pass
+            except Forbidden:
+                mark_user_blocked(user_id)
+                break
+            except BadRequest as e:
+                logger.error(f"Failed to notify user {user_id} for song '{song_name}': {e}"); break
+            except NetworkError as e:
+                logger.warning(f"Request notification network error for {user_id} (attempt {attempt + 1}): {e}")
+            except Exception as e:
+                logger.error(f"Failed to notify user {user_id} for song '{song_name}': {e}"); break
+        self.failed += 1
+
+    async def _run(self, bot):
+        while True:
+            user_id, song_name = await self.queue.get()
+            await self._send(bot, user_id, song_name)
+
+    def start(self, bot):
+        self.task = asyncio.create_task(self._run(bot))
+
+    async def stop(self):
+        if self.task is None: return
+        self.task.cancel()
+        try: await self.task
+        except asyncio.CancelledError: pass
+        if self.queue.qsize(): logger.warning(f"{self.queue.qsize()} request notification(s) were not sent before shutdown.")
+
+
+REQUEST_NOTIFIER = RequestNotifier()
+
+
+# ==============================================================================
+# ==== SECTION 8: MAIN CALLBACK HANDLER ====
 # ==============================================================================
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -563,27 +3528,65 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     user_id = query.from_user.id
     data = query.data
+    await catalog_ready()
 
     if data.startswith("download_"):
-        user_data = get_user_data(user_id)
-        if user_data['points'] < SONG_PRICE_POINTS:
-            await query.edit_message_text("⚠️ You don't have enough points!", parse_mode='Markdown'); return
         msg_id = int(data.split('_')[1])
+        # Points pehle reserve hote hain; copy_message ke dauraan doosra tap unhe dobara kharch nahi kar sakta.
+        reservation = await reserve_points(user_id, SONG_PRICE_POINTS, 'download', ref=msg_id)
+        if reservation is None:
+            await query.edit_message_text("⚠️ You don't have enough points!", parse_mode='Markdown'); return
         try:
             await query.edit_message_text("⏳ Preparing your song...", parse_mode='Markdown')
             await context.bot.copy_message(chat_id=user_id, from_chat_id=CHANNEL_ID, message_id=msg_id)
-            user_data['points'] -= SONG_PRICE_POINTS
-            user_data['total_downloaded'] += 1
-            update_user_data(user_id, **user_data)
-            await query.edit_message_text(f"✅ **Download complete!**\nYour new balance: **{user_data['points']}** points.", parse_mode='Markdown')
         except Exception as e:
+            await reservation.rollback()
             logger.error(f"Error sending song {msg_id} to user {user_id}: {e}")
             await query.edit_message_text("❌ An error occurred. Please try again.", parse_mode='Markdown')
+            return
+        new_balance = await reservation.commit()
+        user_data = get_user_data(user_id)
+        update_user_data(user_id, total_downloaded=user_data.get('total_downloaded', 0) + 1)
+        STATS.record('download')
+        await query.edit_message_text(f"✅ **Download complete!**\nYour new balance: **{new_balance}** points.", parse_mode='Markdown')
+
+    elif data.startswith("sp_"):
+        _, handle, page = data.split('_')
+        results = get_search_results(handle)
+        if results is None:
+            await query.edit_message_text("⌛ These results have expired. Please use `/search` again.", parse_mode='Markdown'); return
+        search_query, msg_ids = results
+        text, keyboard = render_search_page(handle, search_query, msg_ids, int(page), available_points(user_id))
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
 
     elif data.startswith("wrong_song_"):
-        add_missing_song(user_id, data.replace("wrong_song_", "", 1))
+        # Purane messages ke buttons jinme poori query callback_data mein hoti thi.
+        await call_shard(0, 'add_missing_song', user_id, data.replace("wrong_song_", "", 1))
         await query.edit_message_text("Thanks for the feedback!", parse_mode='Markdown')
 
+    elif data.startswith("wrong_"):
+        results = get_search_results(data.replace("wrong_", "", 1))
+        if results is not None: await call_shard(0, 'add_missing_song', user_id, results[0])
+        await query.edit_message_text("Thanks for the feedback! We've noted your request.", parse_mode='Markdown')
+
+    elif data.startswith("missing_"):
+        if not is_admin(user_id): return
+        text, keyboard = render_missing_page(int(data.split('_')[1]))
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
+    elif data.startswith(("pay_ok_", "pay_no_")):
+        if not is_admin(user_id): return
+        _, action, utr = data.split('_')
+        await query.edit_message_text(await decide_payment(context.bot, utr, action == "ok", user_id), parse_mode='Markdown')
+
+    elif data.startswith("payq_"):
+        if not is_admin(user_id): return
+        parts = data.split('_')
+        notice = ""
+        if len(parts) == 4: notice = await decide_payment(context.bot, parts[3], parts[1] == "ok", user_id)
+        text, keyboard = render_payments_page(int(parts[2] if len(parts) == 4 else parts[1]), notice)
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode='Markdown')
+
     elif data.startswith("show_pay_"):
         parts = data.split('_')
         points, amount = int(parts[2]), int(parts[3])
@@ -603,11 +3606,268 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ==============================================================================
-# ==== SECTION 8: MAIN FUNCTION ====
+# ==== SECTION 9: BULK CATALOG IMPORT ====
 # ==============================================================================
-def main():
-    """Starts the bot."""
-    application = Application.builder().token(BOT_TOKEN).build()
+
+def read_catalog_export(path):
+    """Channel export file ko stream karke (message_id, filename, file_size) entries deta hai.
+
+    Do format chalte hain: JSON lines ({"message_id", "file_name", "file_size"}) ya header wali
+    CSV/TSV file (columns: message_id, file_name, file_size).
+    """
+    with open(path, "r", encoding='utf-8', newline='') as f:
+        first_line = f.readline()
+        f.seek(0)
+        if first_line.lstrip().startswith('{'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f, delimiter='\t' if '\t' in first_line else ',')
+        for row in rows:
+            msg_id = row.get('message_id', row.get('id'))
+            filename = row.get('file_name') or row.get('filename')
+            if msg_id in (None, '') or not filename: continue
+            yield int(msg_id), filename, int(row.get('file_size') or row.get('size') or 0)
+
+def chunked(iterable, size):
+    """Iterable ko `size` ki lists mein todta hai."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+def import_catalog(path, workers=IMPORT_WORKERS, chunk_size=IMPORT_CHUNK_SIZE):
+    """Export file se songs parse karke (process pool mein) index karta hai aur catalog mein ek bulk write se daalta hai."""
+    started = time.perf_counter()
+    imported, parsed_count, new_count, chunks_done = {}, 0, 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = []
+        chunks = chunked(read_catalog_export(path), chunk_size)
+        while True:
+            # Sirf kuch chunks hi ek saath pool mein rakhte hain taaki poori file memory mein na aaye.
+            while len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None: break
+                in_flight.append(executor.submit(parse_song_batch, chunk))
+            if not in_flight: break
+            for song in in_flight.pop(0).result():
+                imported[song['message_id']] = song     # Same message_id dobara aaye to aakhri wala jeet-ta hai
+                parsed_count += 1
+            chunks_done += 1
+            if chunks_done % 20 == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  parsed {parsed_count:,} entries ({parsed_count / elapsed:,.0f}/s)")
+    parse_seconds = time.perf_counter() - started
+
+    # Search keys (folded text, phonetic keys) yahin ingest par bante hain aur snapshot mein jaate hain,
+    # taaki agla bot start poora index dobara na banaye.
+    index_started = time.perf_counter()
+    for song in imported.values():
+        if index_song(song): new_count += 1
+    index_seconds = time.perf_counter() - index_started
+    write_started = time.perf_counter()
+    STORAGE.bulk_save_songs(list(imported.values()))
+    save_catalog_snapshot()
+    write_seconds = time.perf_counter() - write_started
+
+    total_seconds = time.perf_counter() - started
+    print(f"Imported {parsed_count:,} entries from {path}: {len(imported):,} unique songs "
+          f"({new_count:,} new, {len(imported) - new_count:,} updated, {parsed_count - len(imported):,} duplicates).")
+    print(f"Parse: {parse_seconds:.2f}s ({parsed_count / max(parse_seconds, 1e-9):,.0f} entries/s with {workers} workers) | "
+          f"Index: {index_seconds:.2f}s | Write: {write_seconds:.2f}s | Total: {total_seconds:.2f}s | Catalog size: {len(SONG_DB):,}")
+    return len(imported)
+
+def import_command_line(argv):
+    """`python Player.py import <export_file>` ko handle karta hai."""
+    parser = argparse.ArgumentParser(prog="Player.py import", description="Channel export se song catalog bharta hai.")
+    parser.add_argument("export_file", help="JSON lines ya CSV/TSV (message_id, file_name, file_size)")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    open_storage()
+    load_catalog_now()
+    import_catalog(args.export_file, workers=args.workers, chunk_size=args.chunk_size)
+
+def export_json(directory):
+    """Poora data purane JSON format (users.json, songs.json, ...) mein `directory` mein likhta hai."""
+    load_catalog_now()
+    os.makedirs(directory, exist_ok=True)
+    users = {uid: data.to_dict() for uid, data in USERS_DB.items()}
+    username_map = {data['username'].lower(): uid for uid, data in users.items() if data.get('username')}
+    for data, filename in (({'users': users, 'username_map': username_map}, USERS_FILE), (SONG_DB.to_list(), DB_FILE),
+                           (MISSING_DB, MISSING_FILE), (BOT_CONFIG, CONFIG_FILE)):
+        save_db(data, os.path.join(directory, filename))
+    print(f"Exported {len(users):,} users and {len(SONG_DB):,} songs to {directory}.")
+
+def export_command_line(argv):
+    """`python Player.py export <directory>` ko handle karta hai."""
+    parser = argparse.ArgumentParser(prog="Player.py export", description="Data ko JSON files mein export karta hai.")
+    parser.add_argument("directory", help="jahan users.json, songs.json, missing_songs.json, config.json likhni hain")
+    args = parser.parse_args(argv)
+    open_storage()
+    export_json(args.directory)
+
+def dedupe_catalog(rebuild=False, show=10):
+    """Catalog ke duplicate groups ka summary; `rebuild` par poora catalog storage se dobara group karke snapshot likhta hai."""
+    if rebuild:
+        started = time.perf_counter()
+        STORAGE.catalog_applied = STORAGE.catalog_version()    # Catalog padhne se pehle (CatalogSnapshot.load jaisa)
+        catalog = STORAGE.load_catalog()
+        search_index = SearchIndex(catalog)
+        install_catalog(catalog, search_index, PrefixIndex(search_index.songs.values()))
+        save_catalog_snapshot()
+        print(f"Regrouped {len(SONG_DB):,} uploads in {time.perf_counter() - started:.2f}s.")
+    else:
+        load_catalog_now()
+    print(f"{len(SONG_DB):,} uploads -> {len(SEARCH_INDEX):,} searchable songs: {len(SEARCH_INDEX.groups):,} songs have "
+          f"duplicates, {len(SEARCH_INDEX.canonical):,} extra copies are hidden from search.")
+    for msg_id, copies in heapq.nlargest(show, SEARCH_INDEX.groups.items(), key=lambda item: len(item[1])):
+        song = SEARCH_INDEX.songs[msg_id]
+        hidden = ", ".join(f"#{copy['message_id']} ({copy['format']}, {copy['size_mb']} MB)" for copy in sorted(copies, key=copy_rank))
+        print(f"  {song['song_title']} - {song['artist']}: shows #{msg_id} ({song['format']}, {song['size_mb']} MB), hides {hidden}")
+
+def dedupe_command_line(argv):
+    """`python Player.py dedupe` ko handle karta hai."""
+    parser = argparse.ArgumentParser(prog="Player.py dedupe", description="Duplicate uploads ko group karke report deta hai.")
+    parser.add_argument("--rebuild", action="store_true", help="snapshot ke bajaye poore catalog (songs.json/SQLite) ko dobara group karo")
+    parser.add_argument("--show", type=int, default=10, help="sabse bade kitne groups dikhane hain")
+    args = parser.parse_args(argv)
+    open_storage()
+    dedupe_catalog(rebuild=args.rebuild, show=args.show)
+
+
+# ==============================================================================
+# ==== SECTION 10: MAIN FUNCTION ====
+# ==============================================================================
+
+# --- INSTRUMENTATION ---
+class InstrumentedRequest(HTTPXRequest):
+    """Har Bot API call (copy_message, send_message, ...) ka time aur error METRICS mein likhta hai."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, request_data, **kwargs)
+        except Exception:
+            METRICS.inc("bot_api_errors_total", method=api_method, code="network")
+            raise
+        finally:
+            METRICS.observe("bot_api_seconds", time.perf_counter() - started, method=api_method)
+        if code != 200: METRICS.inc("bot_api_errors_total", method=api_method, code=code)
+        return code, payload
+
+def timed_callback(callback):
+    """Handler callback ko wrap karke uski latency `handler_seconds{handler=...}` mein likhta hai."""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        label = callback.__name__
+        if isinstance(update, Update) and update.callback_query and update.callback_query.data:
+            label += ":" + update.callback_query.data.split('_')[0]   # download, sp, wrong, show, ...
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            METRICS.inc("handler_errors_total", handler=label)
+            raise
+        finally:
+            METRICS.observe("handler_seconds", time.perf_counter() - started, handler=label)
+    return wrapper
+
+def wrap_handlers(application, wrapper):
+    """Application ke saare registered handlers (ConversationHandler ke andar wale bhi) ke callbacks `wrapper` se lapet-ta hai."""
+    pending = [handler for group in application.handlers.values() for handler in group]
+    while pending:
+        handler = pending.pop()
+        if isinstance(handler, ConversationHandler):
+            pending.extend(handler.entry_points)
+            pending.extend(handler.fallbacks)
+            for state_handlers in handler.states.values(): pending.extend(state_handlers)
+        else:
+            handler.callback = wrapper(handler.callback)
+
+async def serve_metrics(reader, writer):
+    """Chhota HTTP/1.1 server: GET /metrics par Prometheus text deta hai."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""): pass
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[1].split(b"?")[0] == b"/metrics":
+            status, body = "200 OK", METRICS.prometheus_text().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+METRICS_SERVER = None
+
+async def start_metrics_server():
+    global METRICS_SERVER
+    if not METRICS_PORT: return
+    port = METRICS_PORT + SHARD_INDEX   # Har shard process ka apna port
+    try:
+        METRICS_SERVER = await asyncio.start_server(serve_metrics, METRICS_HOST, port)
+        logger.info(f"📊 Metrics available at http://{METRICS_HOST}:{port}/metrics")
+    except OSError as e:
+        logger.warning(f"Metrics server could not start on {METRICS_HOST}:{port}: {e}")
+
+async def stop_metrics_server():
+    if METRICS_SERVER is not None:
+        METRICS_SERVER.close()
+        await METRICS_SERVER.wait_closed()
+
+CATALOG_LOADER = None
+
+async def post_init(application: Application):
+    """Bot start hone ke baad background kaam shuru karta hai."""
+    global CATALOG_LOADER
+    if not CATALOG_READY.is_set(): CATALOG_LOADER = asyncio.create_task(load_catalog_in_background())
+    await PERSISTENCE.start()
+    await start_metrics_server()
+    if SHARD_INDEX == 0: await resume_broadcast(application.bot)
+    REQUEST_NOTIFIER.start(application.bot)
+
+async def post_shutdown(application: Application):
+    """Bot band hone par background kaam rok kar data flush karta hai."""
+    await stop_broadcast()
+    await REQUEST_NOTIFIER.stop()
+    await PERSISTENCE.stop()
+    LEDGER.close()
+    save_catalog_snapshot()
+    await stop_metrics_server()
+
+def parse_run_options(argv):
+    """Serving mode ke command-line overrides (defaults SERVING SETTINGS se)."""
+    parser = argparse.ArgumentParser(prog="Player.py", description="Music bot chalata hai.")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default=RUN_MODE)
+    parser.add_argument("--workers", type=int, default=CONCURRENT_UPDATES, help="ek saath process hone wale updates")
+    parser.add_argument("--processes", type=int, default=SHARD_PROCESSES, help="worker processes (users inme shard hote hain)")
+    parser.add_argument("--send-rate", type=float, default=GLOBAL_SEND_RATE, help="global outbound messages/second (0 = band)")
+    parser.add_argument("--api-url", default=BOT_API_URL, help="Bot API server (fake_telegram.py ke liye http://127.0.0.1:8081)")
+    parser.add_argument("--webhook-url", default=WEBHOOK_URL)
+    parser.add_argument("--listen", default=WEBHOOK_LISTEN)
+    parser.add_argument("--port", type=int, default=WEBHOOK_PORT)
+    return parser.parse_args(argv)
+
+def build_application(options, updater=True):
+    """Application banakar saare handlers register karta hai (`updater=False`: updates bahar se aayenge)."""
+    builder = (
+        Application.builder().token(BOT_TOKEN)
+        .base_url(f"{options.api_url}/bot").base_file_url(f"{options.api_url}/file/bot")
+        .request(InstrumentedRequest(connection_pool_size=max(256, options.workers * 2)))
+        .concurrent_updates(options.workers)
+        .rate_limiter(SendScheduler(global_rate=options.send_rate / SHARD_COUNT))   # Telegram ki limit poore bot ki hai
+        .post_init(post_init).post_shutdown(post_shutdown)
+    )
+    if not updater: builder = builder.updater(None)
+    application = builder.build()
 
     # ConversationHandlers
     setqr_conv = ConversationHandler(
@@ -637,21 +3897,279 @@ def main():
 
     # Admin Commands
     application.add_handler(CommandHandler("admingive", admingive_command))
+    application.add_handler(CommandHandler("payments", payments_command))
+    application.add_handler(CommandHandler("approvepayments", approvepayments_command))
     application.add_handler(CommandHandler("setupi", setupi_command))
     application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(CommandHandler("mail", mail_command))
     application.add_handler(CommandHandler("missing", missing_command))
     application.add_handler(CommandHandler("clearmissing", clearmissing_command))
     application.add_handler(CommandHandler("notify", notify_command)) # <-- YEH NAYA COMMAND
+    application.add_handler(CommandHandler("cancelbroadcast", cancelbroadcast_command))
+    application.add_handler(CommandHandler("cachestats", cachestats_command))
+    application.add_handler(CommandHandler("perf", perf_command))
 
     # Core Handlers
     application.add_handler(MessageHandler(filters.Chat(CHANNEL_ID) & (filters.AUDIO | filters.Document.ALL), save_song))
     application.add_handler(CallbackQueryHandler(handle_callback))
+    application.add_handler(InlineQueryHandler(inline_query_handler))
+    wrap_handlers(application, timed_callback)
+    # Throttle sabse bahar: rok diye gaye updates handler_seconds mein nahi gine jaate.
+    wrap_handlers(application, InboundThrottle(shards=SHARD_COUNT).wrap)
+    return application
+
+def claim_process_layout(processes):
+    """Storage mein process layout (shards ki ginti) likhta hai; pichhli baar se alag ho to True."""
+    previous = STORAGE.get_meta('process_layout') or "1"
+    STORAGE.set_meta('process_layout', str(processes))
+    return previous != str(processes)
+
+
+# --- MULTI-PROCESS MODE ---
+class ShardLink:
+    """Worker process mein front process ki pipe: updates, ingest aur doosre shards ki calls yahin aati hain."""
+
+    def __init__(self, conn, application):
+        self.conn = conn
+        self.application = application
+        self.pending = {}       # call_id -> Future (doosre shard ke jawab ka intezaar)
+        self.next_id = 0
+        self.closed = asyncio.Event()
+
+    def send(self, message):
+        self.conn.send(message)
+
+    async def call(self, shard, name, args):
+        self.next_id += 1
+        call_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[call_id] = future
+        self.send(('call', call_id, SHARD_INDEX, shard, name, args))
+        try:
+            return await asyncio.wait_for(future, SHARD_CALL_TIMEOUT)
+        finally:
+            self.pending.pop(call_id, None)
+
+    def on_readable(self):
+        try:
+            while self.conn.poll(): self.handle(self.conn.recv())
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            self.closed.set()   # Front process chala gaya
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == 'update':
+            self.application.update_queue.put_nowait(Update.de_json(message[1], self.application.bot))
+        elif kind == 'catalog':     # Shard 0 ne song save kiya; yahan sirf in-memory catalog/index update
+            song_info = song_from_channel_post(Update.de_json(message[1], self.application.bot))
+            if song_info is not None: index_song(song_info)
+        elif kind == 'call':
+            task = asyncio.get_running_loop().create_task(self._serve(*message[1:]))
+            SHARD_TASKS.add(task)
+            task.add_done_callback(SHARD_TASKS.discard)
+        elif kind == 'reply':
+            _, call_id, _, result, error = message
+            future = self.pending.get(call_id)
+            if future is None or future.done(): return
+            if error is None: future.set_result(result)
+            else: future.set_exception(RuntimeError(error))
+        elif kind == 'stop':
+            self.closed.set()
+
+    async def _serve(self, call_id, origin, target, name, args):
+        try:
+            result, error = await run_shard_call(name, args), None
+        except Exception as e:
+            logger.error(f"Shard call {name} failed: {e}")
+            result, error = None, f"{type(e).__name__}: {e}"
+        if call_id is not None: self.send(('reply', call_id, origin, result, error))
+
+def become_shard(index, count, reseed):
+    """Fork ke baad worker mein: apni SQLite connections, ledger aur stats kholta hai.
+
+    Catalog aur indexes front process se copy-on-write mein mile hain aur waise hi rehte hain.
+    """
+    global SHARD_INDEX, SHARD_COUNT
+    SHARD_INDEX, SHARD_COUNT = index, count
+    open_storage(reseed)
+
+async def serve_shard(application, conn):
+    """Worker process: Application bina updater ke chalta hai; updates front ki pipe se aate hain."""
+    global SHARD_LINK
+    loop = asyncio.get_running_loop()
+    SHARD_LINK = ShardLink(conn, application)
+    loop.add_signal_handler(signal.SIGTERM, SHARD_LINK.closed.set)
+    loop.add_reader(conn.fileno(), SHARD_LINK.on_readable)
+    async with application:
+        await post_init(application)
+        await application.start()
+        SHARD_LINK.send(('ready', SHARD_INDEX))
+        await SHARD_LINK.closed.wait()
+        loop.remove_reader(conn.fileno())
+        await application.stop()
+    await post_shutdown(application)
+
+def run_shard_worker(index, count, reseed, conn, inherited, options):
+    """Fork hue worker process ka entry point."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)     # Ctrl+C front sambhalta hai aur workers ko 'stop' bhejta hai
+    for other in inherited: other.close()           # Doosre shards ki front-side pipes
+    become_shard(index, count, reseed)
+    logger.info(f"Shard {index + 1}/{count} started (pid {os.getpid()}).")
+    asyncio.run(serve_shard(build_application(options, updater=False), conn))
+
+
+class ShardFront:
+    """Front process: Telegram se updates (polling/webhook) leta hai aur user ke shard wale worker ko bhejta hai.
+
+    Har worker ki ek pipe aur ek sender thread hai, taaki koi dheema worker front ka loop na roke.
+    Channel posts shard 0 par save hote hain aur baaki shards ko 'catalog' message se index hone
+    jaate hain. Workers ki aapas ki calls (`call_shard`) bhi front hi aage bhejta hai.
+    """
+
+    def __init__(self, options, processes, conns):
+        self.options = options
+        self.processes = processes
+        self.conns = conns
+        self.outboxes = [queue.SimpleQueue() for _ in conns]
+        self.stopping = None
+        self.waiting = set(range(len(conns)))   # Jo shards abhi start ho rahe hain
+        self.all_ready = None
+
+    def _sender(self, index):
+        conn, outbox = self.conns[index], self.outboxes[index]
+        while True:
+            message = outbox.get()
+            try: conn.send(message)
+            except OSError: return
+            if message[0] == 'stop': return
+
+    def send(self, shard, message):
+        self.outboxes[shard].put(message)
+
+    def dispatch(self, update):
+        data = update.to_dict()
+        user = update.effective_user
+        shard = user_shard(user.id) if user else 0     # Channel posts aur bina user wale updates shard 0 par
+        self.send(shard, ('update', data))
+        METRICS.inc("shard_updates_total", shard=shard)
+        if update.channel_post:
+            for other in range(1, len(self.conns)): self.send(other, ('catalog', data))
+
+    def on_message(self, index):
+        conn = self.conns[index]
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == 'ready':
+                    self.waiting.discard(index)
+                    if not self.waiting: self.all_ready.set()
+                else:
+                    self.send(message[3] if message[0] == 'call' else message[2], message)
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+
+    def on_worker_exit(self, index):
+        asyncio.get_running_loop().remove_reader(self.processes[index].sentinel)
+        if not self.stopping.is_set():
+            logger.error(f"Shard {index + 1} exited unexpectedly (code {self.processes[index].exitcode}), shutting down.")
+            self.stopping.set()
+
+    async def _forward(self, updates):
+        while True: self.dispatch(await updates.get())
+
+    async def _serve_updates(self, updater, updates):
+        options = self.options
+        if options.mode == "webhook":
+            await updater.start_webhook(
+                listen=options.listen, port=options.port, url_path=WEBHOOK_PATH,
+                webhook_url=f"{options.webhook_url.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None, max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        else:
+            await updater.start_polling()
+        logger.info(f"Bot started successfully! {options.mode.title()} front, {len(self.processes)} shard processes "
+                    f"x {options.workers} workers.")
+        forwarder = asyncio.create_task(self._forward(updates))
+        await self.stopping.wait()
+        await updater.stop()
+        forwarder.cancel()
+        while not updates.empty(): self.dispatch(updates.get_nowait())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.stopping, self.all_ready = asyncio.Event(), asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM): loop.add_signal_handler(signum, self.stopping.set)
+        for index, conn in enumerate(self.conns):
+            threading.Thread(target=self._sender, args=(index,), name=f"shard-{index}-sender", daemon=True).start()
+            loop.add_reader(conn.fileno(), self.on_message, index)
+            loop.add_reader(self.processes[index].sentinel, self.on_worker_exit, index)
+
+        options = self.options
+        bot = Bot(BOT_TOKEN, base_url=f"{options.api_url}/bot", base_file_url=f"{options.api_url}/file/bot")
+        updates = asyncio.Queue()
+        updater = Updater(bot, updates)
+        # Updates tabhi lene shuru karo jab saare shards tayyar hon (ya koi shard start hote hi gir jaaye).
+        ready, stopped = asyncio.create_task(self.all_ready.wait()), asyncio.create_task(self.stopping.wait())
+        await asyncio.wait((ready, stopped), return_when=asyncio.FIRST_COMPLETED)
+        ready.cancel()
+        stopped.cancel()
+        if not self.stopping.is_set():
+            async with updater: await self._serve_updates(updater, updates)
+        for index in range(len(self.conns)): self.send(index, ('stop',))
+        await asyncio.to_thread(lambda: [process.join() for process in self.processes])
+
+def run_sharded(options):
+    """Catalog ek baar load karke `options.processes` shard workers fork karta hai aur front chalata hai."""
+    global SHARD_COUNT
+    if not isinstance(STORAGE, SqliteStorage):
+        raise SystemExit('--processes needs STORAGE_BACKEND = "sqlite".')
+    reseed = claim_process_layout(options.processes)
+    load_catalog_now()
+    STORAGE.close()     # Workers apni connections kholte hain
+    LEDGER.close()
+    # Catalog aur indexes permanent generation mein: workers ka GC unhe scan nahi karta, isliye fork
+    # ke baad unke memory pages (copy-on-write) saare processes mein shared rehte hain.
+    gc.collect()
+    gc.freeze()
+    SHARD_COUNT = options.processes
+    context = multiprocessing.get_context("fork")
+    processes, conns = [], []
+    for index in range(options.processes):
+        front_end, worker_end = context.Pipe()
+        process = context.Process(target=run_shard_worker, name=f"shard-{index}",
+                                  args=(index, options.processes, reseed, worker_end, list(conns), options))
+        process.start()
+        worker_end.close()
+        processes.append(process)
+        conns.append(front_end)
+    asyncio.run(ShardFront(options, processes, conns).run())
+
+def main(argv=()):
+    """Starts the bot."""
+    options = parse_run_options(argv)
+    if options.mode == "webhook" and not options.webhook_url:
+        raise SystemExit("Webhook mode needs WEBHOOK_URL (or --webhook-url).")
+    open_storage()
+    if options.processes > 1: return run_sharded(options)
+    if claim_process_layout(1): LEDGER.reseed(USERS_DB)
+    application = build_application(options)
     
-    logger.info("Bot started successfully!")
-    application.run_polling()
+    if options.mode == "webhook":
+        logger.info(f"Bot started successfully! Webhook on {options.listen}:{options.port}/{WEBHOOK_PATH}, {options.workers} workers.")
+        application.run_webhook(
+            listen=options.listen, port=options.port, url_path=WEBHOOK_PATH,
+            webhook_url=f"{options.webhook_url.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None, max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    else:
+        logger.info(f"Bot started successfully! Long polling, {options.workers} workers.")
+        application.run_polling()
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["import"]: import_command_line(sys.argv[2:])
+    elif sys.argv[1:2] == ["export"]: export_command_line(sys.argv[2:])
+    elif sys.argv[1:2] == ["dedupe"]: dedupe_command_line(sys.argv[2:])
+    else: main(sys.argv[1:])
 
@@ -0,0 +1,232 @@
+# ==============================================================================
+# ==== MICRO-BENCHMARKS FOR PLAYER.PY HOT PATHS ====
+# ==============================================================================
+#
+# Synthetic catalog (Bollywood-style filenames) aur user base bana kar parsing, search
+# aur persistence ke hot paths time karta hai. Results JSON mein save hote hain taaki
+# change se pehle aur baad ke runs compare ho sakein:
+#
+#   python benchmarks.py --songs 10000 100000 --users 10000 100000 --output before.json
+#   python benchmarks.py --songs 10000 100000 --users 10000 100000 --compare before.json
+#
+# `--memory 1000000` 1M songs aur 1M users ka retained memory (tracemalloc) purane dict records
+# aur naye compact records (SongRecord/UserTable) ke saath naapta hai.
+#
+# Bot ka koi data file chhua nahi jaata: Player.py ek temporary directory ke andar import hota hai.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ARTISTS = [
+    "Arijit Singh", "Shreya Ghoshal", "Atif Aslam", "Neha Kakkar", "Badshah", "Sonu Nigam",
+    "Lata Mangeshkar", "Kishore Kumar", "A.R. Rahman", "Jubin Nautiyal", "Sunidhi Chauhan",
+    "Mohit Chauhan", "KK", "Udit Narayan", "Alka Yagnik", "Vishal-Shekhar", "Pritam", "Armaan Malik",
+    "Darshan Raval", "B Praak", "Honey Singh", "Diljit Dosanjh", "Guru Randhawa", "Asees Kaur",
+]
+TITLE_WORDS = [
+    "tum", "hi", "ho", "dil", "pyaar", "ishq", "mohabbat", "tera", "mera", "yaar", "zindagi",
+    "sajna", "mahi", "kesariya", "channa", "mereya", "raabta", "tujhe", "kitna", "chahne", "lage",
+    "hum", "gallan", "diyan", "naina", "jeena", "kaise", "bina", "saiyaan", "rang", "barse", "o",
+]
+MOVIES = ["Aashiqui 2", "Brahmastra", "Ae Dil Hai Mushkil", "Kabir Singh", "Rockstar", "Jab We Met"]
+FORMATS = ["mp3", "mp3", "mp3", "m4a", "flac"]
+
+
+def synthetic_filename(rng):
+    """Channel uploads jaisa ek random filename banata hai."""
+    title = " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4))).title()
+    artist = rng.choice(ARTISTS)
+    if rng.random() < 0.2: artist += f" ft. {rng.choice(ARTISTS)}"
+    ext = rng.choice(FORMATS)
+    pattern = rng.randrange(5)
+    if pattern == 0: return f"{rng.randint(1, 20):02d} - {title} - {artist} (From \"{rng.choice(MOVIES)}\") [320kbps].{ext}"
+    if pattern == 1: return f"{artist} - {title}.{ext}"
+    if pattern == 2: return f"{title} | {artist}.{ext}"
+    if pattern == 3: return f"{title} by {artist}.{ext}"
+    return f"{title} ({rng.choice(MOVIES)}).{ext}"
+
+
+def synthetic_catalog(player, size, rng):
+    """`size` songs ka catalog (parse_song_info se) banata hai."""
+    songs = []
+    for msg_id in range(1, size + 1):
+        song = player.parse_song_info(synthetic_filename(rng), rng.randint(2, 12) * 1024 * 1024)
+        song['message_id'] = msg_id
+        songs.append(song)
+    return songs
+
+
+def synthetic_users(size, rng):
+    """USERS_DATA jaisa `size` users ka dict banata hai."""
+    users, username_map = {}, {}
+    for i in range(size):
+        user_id = str(100000000 + i)
+        username = f"user{i}" if rng.random() < 0.7 else None
+        users[user_id] = {
+            'points': rng.randint(0, 50), 'join_date': datetime.now().isoformat(), 'username': username,
+            'total_downloaded': rng.randint(0, 200), 'total_purchased': rng.randint(0, 60),
+            'total_spent': float(rng.choice([0, 10, 20, 35, 60])), 'first_name': f"Name{i}",
+        }
+        if username: username_map[username] = user_id
+    return {'users': users, 'username_map': username_map}
+
+
+def synthetic_queries(songs, count, rng):
+    """Asli searches jaisi queries: title/artist ke hisse, kuch typos aur kuch miss."""
+    queries = []
+    for _ in range(count):
+        song = rng.choice(songs)
+        roll = rng.random()
+        if roll < 0.5: queries.append(song['song_title'].lower())
+        elif roll < 0.7: queries.append(song['artist'].split(" ft.")[0].lower())
+        elif roll < 0.9: queries.append(" ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(2, 3))))
+        else: queries.append("zxqv " + rng.choice(TITLE_WORDS))
+    return queries
+
+
+def measure(fn, inputs, budget_seconds):
+    """Har input par `fn` chala kar latency samples leta hai (budget khatam hone par ruk jaata hai)."""
+    samples = []
+    deadline = time.perf_counter() + budget_seconds
+    for item in inputs:
+        start = time.perf_counter_ns()
+        fn(item)
+        samples.append(time.perf_counter_ns() - start)
+        if time.perf_counter() > deadline: break
+    samples.sort()
+    total_seconds = sum(samples) / 1e9
+    return {
+        'ops': len(samples),
+        'ops_per_sec': round(len(samples) / total_seconds, 2) if total_seconds else None,
+        'mean_us': round(statistics.fmean(samples) / 1e3, 2),
+        'p50_us': round(samples[len(samples) // 2] / 1e3, 2),
+        'p99_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3, 2),
+    }
+
+
+def run_song_benchmarks(player, size, rng, budget):
+    """Ek catalog size ke liye parsing aur search benchmarks chalata hai."""
+    print(f"\n== Catalog: {size:,} songs ==")
+    results = {}
+    filenames = [synthetic_filename(rng) for _ in range(min(size, 50000))]
+    results['parse_song_info'] = measure(lambda name: player.parse_song_info(name, 5 * 1024 * 1024), filenames, budget)
+
+    songs = synthetic_catalog(player, size, rng)
+    queries = synthetic_queries(songs, 200, rng)
+    pairs = [(rng.choice(queries), rng.choice(songs)) for _ in range(50000)]
+    results['fuzzy_search'] = measure(lambda pair: player.fuzzy_search(*pair), pairs, budget)
+    results['search_full_scan'] = measure(lambda q: [s for s in songs if player.fuzzy_search(q, s)], queries, budget)
+
+    start = time.perf_counter()
+    index = player.SearchIndex(songs)
+    results['search_index_build'] = {'seconds': round(time.perf_counter() - start, 3)}
+    results['search_index'] = measure(lambda q: index.search(q, limit=player.SEARCH_RESULT_LIMIT), queries, budget)
+
+    texts = [f"{s['artist']} - {s['song_title']}" for s in songs[:50000]]
+    results['escape_markdown'] = measure(player.escape_markdown, texts, budget)
+    for name, stats in results.items(): print(f"  {name:<22} {stats}")
+    return results
+
+
+def run_user_benchmarks(player, size, rng, budget, workdir):
+    """Ek user base size ke liye save_db (poori users.json rewrite) time karta hai."""
+    print(f"\n== Users: {size:,} ==")
+    users_data = synthetic_users(size, rng)
+    path = os.path.join(workdir, f"users_{size}.json")
+    results = {'save_db': measure(lambda _: player.save_db(users_data, path), range(20), budget)}
+    results['save_db']['bytes'] = os.path.getsize(path)
+    for name, stats in results.items(): print(f"  {name:<22} {stats}")
+    return results
+
+
+def retained_bytes(build):
+    """`build()` ka result jitni memory rok kar rakhta hai (temporary objects chhod kar) woh bytes deta hai."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run_memory_benchmarks(player, size, rng):
+    """Ek size ke liye songs aur users ki memory: JSON se load hue dicts bana compact records."""
+    print(f"\n== Memory: {size:,} songs / {size:,} users ==")
+    songs_json = json.dumps([song.to_dict() for song in synthetic_catalog(player, size, rng)])
+    users_json = json.dumps(synthetic_users(size, rng))
+    results = {
+        # Pehle startup par load_db yahi banata tha: har song/user ek dict, har string ki alag copy.
+        'songs_dicts': retained_bytes(lambda: json.loads(songs_json)),
+        'songs_records': retained_bytes(lambda: player.SongCatalog(json.loads(songs_json))),
+        'users_dicts': retained_bytes(lambda: json.loads(users_json)['users']),
+        'users_records': retained_bytes(lambda: player.UserTable(json.loads(users_json)['users'])),
+    }
+    del songs_json, users_json
+    for kind in ('songs', 'users'):
+        before, after = results[f'{kind}_dicts'], results[f'{kind}_records']
+        print(f"  {kind:<6} dicts {before / 2**20:>9.1f} MB -> records {after / 2**20:>9.1f} MB  "
+              f"({after / size:.0f} B/record, x{after / before:.2f})")
+    return {name: {'bytes': value} for name, value in results.items()}
+
+
+def compare(current, baseline_path):
+    """Purane results ke saath p50 aur ops/sec ka ratio print karta hai."""
+    with open(baseline_path, "r", encoding='utf-8') as f: baseline = json.load(f)
+    print(f"\n== Compared with {baseline_path} (p50 ratio: <1 is faster) ==")
+    for group in ('songs', 'users'):
+        for size, benches in current[group].items():
+            for name, stats in benches.items():
+                old = baseline.get(group, {}).get(size, {}).get(name)
+                if not old or 'p50_us' not in stats or not old.get('p50_us'): continue
+                print(f"  {group}[{size}] {name:<22} p50 {old['p50_us']:>12} -> {stats['p50_us']:>12} us  "
+                      f"(x{stats['p50_us'] / old['p50_us']:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player.py hot paths ke micro-benchmarks.")
+    parser.add_argument("--songs", type=int, nargs="*", default=[10000], help="catalog sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--users", type=int, nargs="*", default=[10000], help="user base sizes, e.g. 10000 1000000")
+    parser.add_argument("--memory", type=int, nargs="*", default=[], help="memory benchmark sizes, e.g. 1000000")
+    parser.add_argument("--budget", type=float, default=5.0, help="har benchmark ka max time (seconds)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="results JSON file (default: benchmark_results_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="purani results file jisse compare karna hai")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or f"benchmark_results_{datetime.now():%Y%m%d_%H%M%S}.json")
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="player_bench_")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import Player as player
+    player.logger.setLevel("WARNING")
+
+    rng = random.Random(args.seed)
+    results = {
+        'meta': {'timestamp': datetime.now().isoformat(), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'seed': args.seed, 'budget_seconds': args.budget},
+        'songs': {str(size): run_song_benchmarks(player, size, rng, args.budget) for size in args.songs},
+        'users': {str(size): run_user_benchmarks(player, size, rng, args.budget, workdir) for size in args.users},
+        'memory': {str(size): run_memory_benchmarks(player, size, rng) for size in args.memory},
+    }
+    with open(output, "w", encoding='utf-8') as f: json.dump(results, f, indent=4)
+    print(f"\nResults saved to {output}")
+    if baseline: compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
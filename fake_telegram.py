@@ -0,0 +1,271 @@
+# ==============================================================================
+# ==== FAKE TELEGRAM BOT API SERVER (OFFLINE LOAD TESTS) ====
+# ==============================================================================
+#
+# Asli Bot API ki jagah ek local server jo Player.py ke saare outbound calls (sendMessage,
+# copyMessage, editMessageText, ...) record karta hai, chahe to Telegram jaisi 429 flood limits
+# simulate karta hai, aur synthetic users ke updates bot ko bhejta hai. Sirf stdlib (asyncio).
+#
+#   python fake_telegram.py --port 8081 --updates 5000 --users 1000
+#   python Player.py --api-url http://127.0.0.1:8081                        # long polling
+#   python Player.py --api-url http://127.0.0.1:8081 --mode webhook \
+#       --webhook-url http://127.0.0.1:8443 --port 8443 --workers 128       # webhook
+#
+# Har command (/start, /balance, /search) ka bot exactly ek sendMessage se jawab deta hai, isliye
+# jab utne sendMessage aa jaate hain jitne updates bheje the, run poora maana jaata hai.
+# Player.py ka data (users/songs) usi directory mein banta hai jahan se bot chalaya gaya.
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qsl, urlsplit
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendAudio", "sendDocument", "copyMessage"}
+QUERY_WORDS = ["tum", "hi", "ho", "kesariya", "channa", "mereya", "raabta", "arijit", "shreya", "dil", "ishq", "zxqv"]
+BOT_USER = {"id": 1000001, "is_bot": True, "first_name": "Fake Player", "username": "fake_player_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True}
+
+
+class RateLimiter:
+    """Telegram jaisi flood limits: global messages/second aur per-chat messages/second."""
+
+    def __init__(self, global_rate, chat_rate):
+        self.global_rate, self.chat_rate = global_rate, chat_rate
+        self.global_sends = deque()     # Pichhle 1 second ke send timestamps
+        self.chat_last = {}             # chat_id -> aakhri send ka time
+
+    def check(self, chat_id):
+        """Send allowed ho to None, warna retry_after seconds."""
+        now = time.monotonic()
+        if self.global_rate:
+            while self.global_sends and now - self.global_sends[0] >= 1: self.global_sends.popleft()
+            if len(self.global_sends) >= self.global_rate: return 1
+        if self.chat_rate and chat_id is not None:
+            last = self.chat_last.get(chat_id)
+            if last is not None and now - last < 1 / self.chat_rate: return 1
+            self.chat_last[chat_id] = now
+        if self.global_rate: self.global_sends.append(now)
+        return None
+
+
+class FakeTelegram:
+    """Bot API ke zaroori methods ka in-memory implementation + load generator."""
+
+    def __init__(self, args):
+        self.args = args
+        self.limiter = RateLimiter(args.global_rate, args.chat_rate)
+        self.rng = random.Random(args.seed)
+        self.updates = asyncio.Queue()      # Long polling ke liye
+        self.webhook = None                 # (url, secret_token, max_connections)
+        self.ready = asyncio.Event()
+        self.done = asyncio.Event()
+        self.next_message_id = 1
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.sent = []                      # (time, method, chat_id, text) agar --record diya ho
+        self.pending = {}                   # chat_id -> deque(inject time), latency ke liye
+        self.latencies = []
+        self.replies = 0
+        self.started = None
+
+    # --- Bot API methods ---
+    def _message(self, chat_id, text=None):
+        self.next_message_id += 1
+        message = {"message_id": self.next_message_id, "date": int(time.time()), "from": BOT_USER,
+                   "chat": {"id": chat_id, "type": "private"}}
+        if text is not None: message["text"] = text
+        return message
+
+    async def call(self, method, params):
+        """(status, response dict) deta hai."""
+        self.calls[method] += 1
+        chat_id = params.get("chat_id")
+        if method in SEND_METHODS:
+            retry_after = self.limiter.check(chat_id)
+            if retry_after:
+                self.rate_limited[method] += 1
+                return 429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                             "parameters": {"retry_after": retry_after}}
+            if self.args.record: self.sent.append((time.time(), method, chat_id, params.get("text") or params.get("caption")))
+            if method == "sendMessage": self._reply_seen(chat_id)
+
+        if method == "getMe": result = BOT_USER
+        elif method == "getUpdates": result = await self._get_updates(params)
+        elif method == "setWebhook":
+            self.webhook = (params["url"], params.get("secret_token"), int(params.get("max_connections") or 40))
+            self.ready.set()
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook = None
+            result = True
+        elif method == "getWebhookInfo":
+            result = {"url": self.webhook[0] if self.webhook else "", "has_custom_certificate": False, "pending_update_count": 0}
+        elif method == "copyMessage": result = {"message_id": self._message(chat_id)["message_id"]}
+        elif method in ("sendMessage", "editMessageText"): result = self._message(chat_id, params.get("text", ""))
+        elif method in SEND_METHODS: result = self._message(chat_id)
+        else: result = True     # answerCallbackQuery, answerInlineQuery, setMyCommands, ...
+        return 200, {"ok": True, "result": result}
+
+    async def _get_updates(self, params):
+        self.ready.set()
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < limit and not self.updates.empty(): batch.append(self.updates.get_nowait())
+        return batch
+
+    def _reply_seen(self, chat_id):
+        queue = self.pending.get(chat_id)
+        if queue:
+            self.latencies.append(time.perf_counter() - queue.popleft())
+        self.replies += 1
+        if self.replies >= self.args.updates: self.done.set()
+
+    # --- HTTP ---
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 keep-alive: ek connection par kai requests (httpx connections reuse karta hai)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line: break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                path = urlsplit(request_line.split()[1].decode()).path
+                status, response = await self.route(path, headers, body)
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass    # Client ne connection band kiya ya server band ho raha hai
+        finally:
+            writer.close()
+
+    async def route(self, path, headers, body):
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        content_type = headers.get("content-type", "")
+        params = {}
+        if "json" in content_type and body: params = json.loads(body)
+        elif "form-urlencoded" in content_type:
+            for key, value in parse_qsl(body.decode()):
+                try: params[key] = json.loads(value)
+                except ValueError: params[key] = value
+        return await self.call(parts[1], params)
+
+    # --- Load generator ---
+    def make_update(self, update_id, user_id):
+        roll = self.rng.random()
+        if roll < 0.5: text = "/search " + " ".join(self.rng.choice(QUERY_WORDS) for _ in range(self.rng.randint(1, 3)))
+        elif roll < 0.8: text = "/balance"
+        else: text = "/start"
+        command_length = len(text.split()[0])
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "from": user,
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]}, "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": command_length}]}}
+
+    async def post_webhook(self, update, semaphore):
+        url, secret, _ = self.webhook
+        target = urlsplit(url)
+        body = json.dumps(update).encode()
+        headers = f"POST {target.path or '/'} HTTP/1.1\r\nHost: {target.hostname}\r\nContent-Type: application/json\r\n"
+        if secret: headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+        async with semaphore:
+            for attempt in range(5):
+                try:
+                    reader, writer = await asyncio.open_connection(target.hostname, target.port or 80)
+                    writer.write(f"{headers}Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+                    await writer.drain()
+                    await reader.read()
+                    writer.close()
+                    return
+                except ConnectionError:
+                    await asyncio.sleep(0.2 * (attempt + 1))
+        self.calls["webhook_delivery_failed"] += 1
+
+    async def generate_load(self):
+        await self.ready.wait()
+        await asyncio.sleep(self.args.warmup)
+        print(f"Bot connected ({'webhook ' + self.webhook[0] if self.webhook else 'long polling'}), "
+              f"sending {self.args.updates:,} updates from {self.args.users:,} users...")
+        user_ids = [200000000 + i for i in range(self.args.users)]
+        self.started = time.perf_counter()
+        deliveries = []
+        semaphore = asyncio.Semaphore(self.webhook[2] if self.webhook else 1)
+        for update_id in range(1, self.args.updates + 1):
+            user_id = self.rng.choice(user_ids)
+            update = self.make_update(update_id, user_id)
+            self.pending.setdefault(user_id, deque()).append(time.perf_counter())
+            if self.webhook: deliveries.append(asyncio.create_task(self.post_webhook(update, semaphore)))
+            else: self.updates.put_nowait(update)
+            if self.args.inject_rate: await asyncio.sleep(1 / self.args.inject_rate)
+        await asyncio.gather(*deliveries)
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout=self.args.timeout)
+        except asyncio.TimeoutError:
+            print(f"Timed out after {self.args.timeout}s waiting for replies.")
+        self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        print(f"\n== {self.replies:,}/{self.args.updates:,} replies in {elapsed:.2f}s "
+              f"({self.replies / elapsed:,.1f} updates/s) ==")
+        if latencies:
+            print(f"  reply latency: mean {statistics.fmean(latencies) * 1000:.1f} ms | "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms | "
+                  f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms")
+        print("  calls: " + ", ".join(f"{method} {count:,}" for method, count in self.calls.most_common()))
+        if self.rate_limited: print("  429s: " + ", ".join(f"{method} {count:,}" for method, count in self.rate_limited.items()))
+        if self.args.record:
+            with open(self.args.record, "w", encoding="utf-8") as f:
+                for ts, method, chat_id, text in self.sent:
+                    f.write(json.dumps({"ts": ts, "method": method, "chat_id": chat_id, "text": text}, ensure_ascii=False) + "\n")
+            print(f"  recorded {len(self.sent):,} sends to {self.args.record}")
+
+
+async def run(args):
+    fake = FakeTelegram(args)
+    server = await asyncio.start_server(fake.handle_connection, args.host, args.port)
+    print(f"Fake Bot API listening on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    async with server:
+        await fake.generate_load()
+        if not args.exit: await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load tests ke liye fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--updates", type=int, default=1000, help="kitne synthetic updates bhejne hain")
+    parser.add_argument("--users", type=int, default=200, help="kitne alag synthetic users")
+    parser.add_argument("--inject-rate", type=float, default=0, help="updates/second (0 = jitni jaldi ho sake)")
+    parser.add_argument("--global-rate", type=int, default=0, help="simulate: max sends/second (Telegram ~30), 0 = band")
+    parser.add_argument("--chat-rate", type=float, default=0, help="simulate: max sends/second per chat (Telegram ~1), 0 = band")
+    parser.add_argument("--warmup", type=float, default=1.0, help="bot connect hone ke baad load se pehle wait (seconds)")
+    parser.add_argument("--timeout", type=float, default=120, help="replies ka max intezaar (seconds)")
+    parser.add_argument("--record", default=None, help="saare sends JSON lines mein is file mein likho")
+    parser.add_argument("--exit", action="store_true", help="report ke baad server band kar do")
+    parser.add_argument("--seed", type=int, default=42)
+    try:
+        asyncio.run(run(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
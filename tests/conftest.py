@@ -0,0 +1,118 @@
+# Tests Player.py ko fake_telegram.py ke saamne asli process ki tarah chalate hain (temp directory mein),
+# ya seedhe handlers ko fake Update/Context ke saath bulaate hain.
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_telegram  # noqa: E402
+
+ADMIN = 5168899073
+
+
+def message_update(update_id, user_id, text):
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else []
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text, "entities": entities,
+        "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"},
+        "chat": {"id": user_id, "type": "private"}}}
+
+
+def callback_update(update_id, user_id, data):
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "data": data, "chat_instance": "test",
+        "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"},
+        "message": {"message_id": 1, "date": int(time.time()), "text": "x", "chat": {"id": user_id, "type": "private"}}}}
+
+
+class RecordingTelegram(fake_telegram.FakeTelegram):
+    """Har sendMessage/editMessageText ko (chat_id, text) ke roop mein yaad rakhta hai."""
+
+    def __init__(self):
+        args = type("Args", (), dict(global_rate=0, chat_rate=0, seed=1, record=False, updates=1 << 30))
+        super().__init__(args)
+        self.texts = []
+        self.next_update_id = 0
+
+    async def call(self, method, params):
+        if method in ("sendMessage", "editMessageText"): self.texts.append((int(params.get("chat_id") or 0), params.get("text", "")))
+        return await super().call(method, params)
+
+    def send(self, user_id, text):
+        self.next_update_id += 1
+        self.updates.put_nowait(message_update(self.next_update_id, user_id, text))
+
+    def tap(self, user_id, data):
+        self.next_update_id += 1
+        self.updates.put_nowait(callback_update(self.next_update_id, user_id, data))
+
+    async def wait_for(self, chat_id, needle, timeout=20):
+        """`chat_id` ko bheja gaya pehla text jisme `needle` ho."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for chat, text in self.texts:
+                if chat == chat_id and needle in text: return text
+            await asyncio.sleep(0.1)
+        raise AssertionError(f"{needle!r} never sent to {chat_id}; got {self.texts}")
+
+
+@pytest.fixture
+def run_bot(tmp_path):
+    """`run_bot(scenario, processes)`: bot ko temp dir mein chala kar `await scenario(telegram)` karta hai."""
+    def run(scenario, processes=1):
+        async def main():
+            telegram = RecordingTelegram()
+            server = await asyncio.start_server(telegram.handle_connection, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            bot = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(ROOT, "Player.py"), "--api-url", f"http://127.0.0.1:{port}",
+                "--processes", str(processes), cwd=tmp_path,
+                stdout=asyncio.subprocess.DEVNULL, stderr=open(tmp_path / "bot.log", "w"))
+            try:
+                await asyncio.wait_for(telegram.ready.wait(), 30)
+                await asyncio.sleep(1)
+                await scenario(telegram)
+            finally:
+                bot.terminate()
+                try: await asyncio.wait_for(bot.wait(), 15)
+                except asyncio.TimeoutError: bot.kill(); await bot.wait()
+                server.close()
+        asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def player(tmp_path, monkeypatch):
+    """Temp directory ke storage ke saath khula Player module (handlers seedhe bulaane ke liye)."""
+    monkeypatch.chdir(tmp_path)
+    import Player
+    Player.CATALOG_READY.clear()
+    Player.CATALOG_SNAPSHOT.version = None
+    Player.open_storage()
+    yield Player
+    Player.LEDGER.close()
+
+
+class FakeChat:
+    """Handlers ke liye Update/Context: jo bhi reply ya message bheja jaata hai woh `texts` mein aata hai."""
+
+    def __init__(self, user_id):
+        self.texts = []
+        self.effective_user = type("User", (), {"id": user_id})()
+        self.message = self
+        self.bot = self
+
+    async def reply_text(self, text, **kwargs):
+        self.texts.append(text)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.texts.append(text)
+
+    def context(self, *args):
+        return type("Context", (), {"args": list(args), "bot": self})()
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def reload_catalog(player):
+    player.CATALOG_READY.clear()
+    player.load_catalog_now()
+    return len(player.SONG_DB)
+
+
+def test_stale_catalog_is_not_snapshotted_after_import(player, tmp_path):
+    player.load_catalog_now()
+    (tmp_path / "export.jsonl").write_text("".join(json.dumps({"message_id": n, "file_name": name, "file_size": 4 << 20}) + "\n"
+                                                   for n, name in ((11, "Arijit Singh - Kesariya.mp3"), (12, "KK - Tadap Tadap.mp3"))))
+    subprocess.run([sys.executable, f"{ROOT}/Player.py", "import", "export.jsonl"], cwd=tmp_path, check=True, capture_output=True)
+    player.save_catalog_snapshot()      # Bot ka shutdown: uska catalog abhi bhi 0 songs ka hai
+    assert reload_catalog(player) == 2
+
+
+def test_local_song_writes_keep_snapshot_current(player):
+    player.load_catalog_now()
+    song = player.SongRecord(player.parse_song_info("KK - Tadap Tadap.mp3"), message_id=21)
+    player.index_song(song)
+    player.STORAGE.save_song(song)
+    player.PERSISTENCE.flush_now()
+    player.save_catalog_snapshot()
+    assert player.CATALOG_SNAPSHOT.version == player.STORAGE.catalog_version()
+    assert reload_catalog(player) == 1
@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+
+def test_failed_commit_is_retried_without_losing_entries(player, tmp_path, monkeypatch):
+    ledger = player.PointsLedger(str(tmp_path / "ledger.log"), str(tmp_path / "snapshot.json"))
+    ledger.load(player.UserTable())
+    real_fsync, failures = os.fsync, [OSError(28, "No space left on device")]
+
+    def flaky_fsync(fd):
+        if failures: raise failures.pop()
+        real_fsync(fd)
+
+    async def scenario():
+        ledger.record(1, 10, 'signup')
+        ledger.record(2, 5, 'signup')
+        monkeypatch.setattr(player.os, "fsync", flaky_fsync)
+        with pytest.raises(OSError): await ledger.sync()
+        assert ledger.synced_seq == 0 and len(ledger._buffer) == 2
+        ledger.record(1, -1, 'download')
+        await ledger.sync()
+
+    asyncio.run(scenario())
+    assert ledger.synced_seq == 3
+    ledger.close()
+    assert len((tmp_path / "ledger.log").read_text().splitlines()) == 3
+    replayed = player.PointsLedger(str(tmp_path / "ledger.log"), str(tmp_path / "snapshot.json"))
+    replayed.load(player.UserTable())
+    assert replayed.balances == ledger.balances == {'1': 9, '2': 5}
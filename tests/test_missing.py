@@ -0,0 +1,9 @@
+def requests_for(player, *names):
+    return player.MissingRequests([{'user_id': n, 'song_name': name} for n, name in enumerate(names)])
+
+
+def test_upload_does_not_fulfil_artist_only_requests(player):
+    missing = requests_for(player, "Kesariya Arijit Singh", "arijit", "Channa Mereya Arijit", "chana mereya song")
+    song = player.parse_song_info("Arijit Singh - Channa Mereya.mp3")
+    labels = {missing.clusters[cid]['label'] for cid in missing.matching(song)}
+    assert labels == {"Channa Mereya Arijit", "chana mereya song"}
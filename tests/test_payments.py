@@ -0,0 +1,45 @@
+import asyncio
+
+from conftest import ADMIN, FakeChat
+
+USER = 200000007
+UTR = "123456789012"
+
+
+def test_admingive_during_approval_does_not_credit_twice(player):
+    async def scenario():
+        await player.PERSISTENCE.start()
+        player.submit_payment(USER, UTR, 35, 10)
+        balance = player.get_user_data(USER)['points']
+        button, command = FakeChat(ADMIN), FakeChat(ADMIN)
+        async with player.user_lock(USER):     # Approve ka credit isi lock par ruka rehta hai
+            approving = asyncio.create_task(player.approve_payments(button.bot, [UTR], ADMIN))
+            await asyncio.sleep(0)
+            assert UTR in player.PAYMENTS.in_flight
+            giving = asyncio.create_task(player.admingive_command(command, command.context(str(USER), "10")))
+            await asyncio.sleep(0.1)
+        approved, _ = await asyncio.gather(approving, giving)
+        assert [p['utr'] for p in approved] == [UTR]
+        assert "being processed" in command.texts[-1]
+        await player.PERSISTENCE.stop()
+        return balance
+
+    balance = asyncio.run(scenario())
+    assert player.get_user_data(USER)['points'] == balance + 10
+    assert player.PAYMENTS.by_utr[UTR]['status'] == 'approved'
+
+
+def test_admingive_after_approval_credits_repeat_purchase(player):
+    async def scenario():
+        await player.PERSISTENCE.start()
+        player.submit_payment(USER, UTR, 35, 10)
+        await player.approve_payments(FakeChat(ADMIN).bot, [UTR], ADMIN)
+        balance = player.get_user_data(USER)['points']
+        command = FakeChat(ADMIN)
+        await player.admingive_command(command, command.context(str(USER), "10"))
+        await player.PERSISTENCE.stop()
+        return balance, command.texts
+
+    balance, texts = asyncio.run(scenario())
+    assert player.get_user_data(USER)['points'] == balance + 10
+    assert any(text.startswith("✅ Success! Gave 10 points") for text in texts)
@@ -0,0 +1,12 @@
+TITLES = ["Kesariya", "Channa Mereya", "Tum Hi Ho", "Raabta", "Agar Tum Saath Ho", "Phir Le Aaya Dil", "Hamari Adhuri Kahani",
+          "Muskurane", "Sooraj Dooba Hai", "Khairiyat", "Ae Dil Hai Mushkil", "Gerua", "Janam Janam", "Tera Yaar Hoon Main",
+          "Ilahi", "Kabira", "Laal Ishq", "Samjhawan", "Hawayein", "Tujhe Kitna Chahne Lage", "Shayad", "Apna Bana Le",
+          "Heeriye", "Chaleya", "Zaalima"]
+
+
+def test_short_limit_does_not_shrink_cached_results(player):
+    player.load_catalog_now()
+    for n, title in enumerate(TITLES, 1):
+        player.index_song(player.SongRecord(player.parse_song_info(f"Arijit Singh - {title}.mp3"), message_id=n))
+    assert len(player.cached_search("arijit", limit=20)) == 20
+    assert len(player.cached_search("arijit")) == len(TITLES)
@@ -0,0 +1,26 @@
+from conftest import ADMIN
+
+USER_ON_SHARD_1 = 200000001
+
+
+def test_search_miss_on_other_shard_shows_in_missing(run_bot):
+    async def scenario(telegram):
+        telegram.send(USER_ON_SHARD_1, "/start")
+        await telegram.wait_for(USER_ON_SHARD_1, "Welcome")
+        telegram.send(USER_ON_SHARD_1, "/search zxqv nahi milega")
+        await telegram.wait_for(USER_ON_SHARD_1, "Song Not Found")
+        telegram.send(ADMIN, "/missing")
+        assert "zxqv nahi milega" in await telegram.wait_for(ADMIN, "zxqv")
+
+    run_bot(scenario, processes=2)
+
+
+def test_stats_counts_users_from_every_shard(run_bot):
+    async def scenario(telegram):
+        for user_id in (200000001, 200000002, 200000003):
+            telegram.send(user_id, "/start")
+            await telegram.wait_for(user_id, "Welcome")
+        telegram.send(ADMIN, "/stats")
+        assert "Users: 3 " in await telegram.wait_for(ADMIN, "Bot Stats")
+
+    run_bot(scenario, processes=3)
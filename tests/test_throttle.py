@@ -0,0 +1,18 @@
+import asyncio
+
+USER = 200000011
+
+
+def test_every_dropped_callback_is_answered(run_bot):
+    async def scenario(telegram):
+        telegram.send(USER, "/start")
+        await telegram.wait_for(USER, "Welcome")
+        taps = 15       # 'download' ka burst 5 hai, baaki taps throttle hote hain
+        for n in range(taps): telegram.tap(USER, f"download_{n}")
+        for _ in range(100):
+            if telegram.calls["answerCallbackQuery"] >= taps: break
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5)
+        assert telegram.calls["answerCallbackQuery"] == taps
+
+    run_bot(scenario)